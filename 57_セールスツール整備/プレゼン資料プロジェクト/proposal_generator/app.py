@@ -295,6 +295,102 @@ def load_electricity_master() -> list[dict]:
         return []
 
 
+@st.cache_data(ttl=None)
+def parse_ipals_csv(raw: bytes) -> dict | None:
+    """Parse an iPals output CSV into annual totals and hourly columns.
+
+    Cols: 月,日,時,発電量(kWh),需要量(kWh),不足電力量(kWh),余剰電力量(kWh),
+    自家消費電力量(kWh),自家消費率(%),消費率(%),モジュール出力(kWh)
+
+    Returns:
+        dict with row_count, total_gen, total_demand, total_surplus,
+        total_self_consume, monthly_gen (12) and hourly (demand_calc.hourly_arrays
+        columns); None when no row parses
+    """
+    import csv
+    import io
+
+    from proposal_generator.demand_calc import hourly_arrays
+
+    # Try cp932 (Shift_JIS) first, then utf-8
+    for enc in ("cp932", "utf-8-sig", "utf-8"):
+        try:
+            text = raw.decode(enc)
+            break
+        except (UnicodeDecodeError, LookupError):
+            continue
+    else:
+        text = raw.decode("utf-8", errors="replace")
+
+    reader = csv.reader(io.StringIO(text))
+    next(reader, [])  # header
+    totals = {"total_gen": 0.0, "total_demand": 0.0, "total_surplus": 0.0, "total_self_consume": 0.0}
+    monthly_gen = [0.0] * 12
+    row_count = 0
+    hourly = {k: [] for k in ("month", "day", "hour", "gen_kw", "demand_kw", "surplus_kw", "self_consumption_kw")}
+    for row in reader:
+        if len(row) < 8:
+            continue
+        try:
+            month = int(row[0])
+            day = int(row[1])
+            hour = int(row[2])
+            gen = float(row[3]) if row[3] and row[3] != "-" else 0.0
+            demand = float(row[4]) if row[4] and row[4] != "-" else 0.0
+            surplus = float(row[6]) if row[6] and row[6] != "-" else 0.0
+            self_c = float(row[7]) if row[7] and row[7] != "-" else 0.0
+        except (ValueError, IndexError):
+            continue
+        totals["total_gen"] += gen
+        totals["total_demand"] += demand
+        totals["total_surplus"] += surplus
+        totals["total_self_consume"] += self_c
+        if 1 <= month <= 12:
+            monthly_gen[month - 1] += gen
+        for k, v in zip(hourly, (month, day, hour, gen, demand, surplus, self_c)):
+            hourly[k].append(v)
+        row_count += 1
+
+    if row_count == 0:
+        return None
+    # Hourly columns (1h kWh = average kW) for the demand / billing engines
+    return {"row_count": row_count, **totals, "monthly_gen": monthly_gen, "hourly": hourly_arrays(hourly)}
+
+
+def uploaded_ipals_hourly() -> dict | None:
+    """Hourly columns of the CSV currently in the iPals uploader (None without one).
+
+    Read from the widget state, so blocks rendered above the uploader see the
+    upload of this rerun rather than the previous one.
+    """
+    upload = st.session_state.get("ipals_upload")
+    if upload is None:
+        return None
+    parsed = parse_ipals_csv(upload.getvalue())
+    return parsed["hourly"] if parsed is not None else None
+
+
+@st.cache_data(ttl=None, show_spinner="蓄電池ディスパッチ計算中...")
+def battery_sweep(
+    hourly: dict, sizes_kwh: tuple, c_rate: float, round_trip_efficiency: float,
+    basic_rate_kw: float, power_factor_pct: int,
+) -> dict:
+    """simulate_battery() over a size sweep, cached per iPals upload and settings.
+
+    Only the per-size columns are kept (the hourly SoC / dispatch arrays are
+    not shown and would be copied on every cache hit).
+    """
+    import numpy as np
+    from proposal_generator.battery_calc import simulate_battery
+
+    sizes = np.asarray(sizes_kwh, dtype=float)
+    sim = simulate_battery(
+        hourly, sizes, power_kw=sizes * c_rate, round_trip_efficiency=round_trip_efficiency,
+        basic_rate_kw=basic_rate_kw, power_factor_pct=power_factor_pct,
+    )
+    return {k: v for k, v in sim.items() if v.ndim == 1}
+
+
 def load_equipment_master() -> tuple[dict[str, list[dict]], str]:
     """Load active equipment records from Salesforce, grouped by MachineType__c.
 
@@ -920,6 +1016,9 @@ with tab2:
         # ----- Current Electricity Cost (contract master based) -----
         st.markdown("**現在の電気料金**")
         _elec_master = load_electricity_master()
+        _tou_bill = None  # time-of-use bill over the iPals load (master row + hourly data)
+        _energy_unit_price = None  # 従量 price a PV kWh avoids (yen/kWh, basic charge excluded)
+        _basic_rate_kw = None  # contract basic charge (yen/kW/month) for the demand-cut saving
         if _elec_master:
             _companies = sorted(set(r["company"] for r in _elec_master))
             _companies_with_manual = _companies + ["その他（新電力・手入力）"]
@@ -949,18 +1048,44 @@ with tab2:
                             _annual_kwh = st.number_input("年間使用電力量 (kWh)", min_value=0, step=1000, key="annual_kwh")
 
                         # Calculate annual cost
+                        _basic_rate_kw = float(_sel["basic"] or 0) or None
                         _basic_annual = float(_sel["basic"]) * _contract_kw * 12
-                        # Weighted average: summer 4 months, other 8 months
-                        _summer_rate = float(_sel["summer"] or _sel["other"] or 0)
-                        _other_rate = float(_sel["other"] or _sel["summer"] or 0)
-                        _avg_unit = (_summer_rate * 4 + _other_rate * 8) / 12
+                        # The iPals uploader is further down the page: read this rerun's upload
+                        _tou_hourly = uploaded_ipals_hourly()
+                        if _tou_hourly is not None:
+                            # Time-of-use: each iPals hour billed at its band rate
+                            from proposal_generator.tariff_calc import calc_tou_bill
+                            # Laid on the proposal year: 土日祝 billed in the night band
+                            _tou_bill = calc_tou_bill(_tou_hourly, _sel, year=proposal_date.year)
+                        if _tou_bill is not None and _tou_bill["avg_unit_price"] > 0:
+                            _avg_unit = _tou_bill["avg_unit_price"]
+                            _avg_label = "時間帯別加重単価（iPals負荷）"
+                        else:
+                            # Weighted average: summer 4 months, other 8 months
+                            _summer_rate = float(_sel["summer"] or _sel["other"] or 0)
+                            _other_rate = float(_sel["other"] or _sel["summer"] or 0)
+                            _avg_unit = (_summer_rate * 4 + _other_rate * 8) / 12
+                            _avg_label = "加重平均単価"
                         _usage_annual = _avg_unit * _annual_kwh
+                        # Band-weighted over the hours PV actually displaces when iPals data is loaded
+                        _energy_unit_price = (
+                            _tou_bill["pv_unit_price"]
+                            if _tou_bill is not None and _tou_bill["pv_unit_price"] > 0 else _avg_unit
+                        )
                         annual_elec_cost = int(_basic_annual + _usage_annual)
                         st.caption(
                             f"年間電気代（概算）: **¥{annual_elec_cost:,.0f}**　"
                             f"（基本: ¥{_basic_annual:,.0f} + 従量: ¥{_usage_annual:,.0f}　"
-                            f"加重平均単価: ¥{_avg_unit:.2f}/kWh）"
+                            f"{_avg_label}: ¥{_avg_unit:.2f}/kWh）"
                         )
+                        if _tou_bill is not None and _tou_bill["self_consumption_kwh"] > 0:
+                            st.caption(
+                                f"PV導入後の従量料金削減（iPals負荷・時間帯別）: "
+                                f"**¥{_tou_bill['energy_saving']:,.0f}/年**　"
+                                f"（¥{_tou_bill['energy_charge_before']:,.0f} → "
+                                f"¥{_tou_bill['energy_charge_after']:,.0f}　"
+                                f"自家消費1kWhあたり ¥{_tou_bill['pv_unit_price']:.2f}）"
+                            )
                     else:
                         annual_elec_cost = 0
                 else:
@@ -976,6 +1101,8 @@ with tab2:
                 _manual_kwh = st.number_input("年間使用電力量 (kWh)", min_value=0, step=1000, key="manual_annual_kwh")
                 _basic_annual = _manual_basic * _manual_kw * 12
                 _usage_annual = _manual_rate * _manual_kwh
+                _energy_unit_price = _manual_rate
+                _basic_rate_kw = _manual_basic or None
                 annual_elec_cost = int(_basic_annual + _usage_annual)
                 if annual_elec_cost > 0:
                     st.caption(f"年間電気代（概算）: **¥{annual_elec_cost:,.0f}**")
@@ -1164,23 +1291,19 @@ with tab2:
     # ----- Lease (PPA only) -----
     if not is_epc:
         with st.expander("📋 リース情報", expanded=False):
-            _lease_companies = [
-                "シーエナジー",
-                "みずほリース",
-                "NTTファイナンス",
-                "オリックス",
-                "三井住友ファイナンス&リース",
-                "その他",
-            ]
+            from proposal_generator.finance_products import get_finance_product, load_finance_products
+
+            # Companies come from finance_products.yaml
+            _lease_companies = list(load_finance_products()) + ["その他"]
             lease_company = st.selectbox("リース会社", _lease_companies, key="lease_company")
 
             # Show fixed-rate notice for known companies
-            from proposal_generator.ppa_calc import LEASE_RATE_MAP
-            _known_rate = LEASE_RATE_MAP.get(lease_company)
+            _product = get_finance_product(lease_company)
+            _known_rate = _product.rate
             if _known_rate is not None:
                 st.info(
                     f"**{lease_company}** の適用金利: **{_known_rate*100:.2f}%**"
-                    + (" (CE IRR目標)" if lease_company == "シーエナジー" else " (固定)")
+                    + (f" ({_product.rate_label})" if _product.rate_label else "")
                 )
                 lease_rate = _known_rate * 100  # store as % for display
             else:
@@ -1198,50 +1321,20 @@ with tab2:
             "iPals出力CSVをアップロード（任意）",
             type=["csv"],
             help="iPals自家消費発電量CSVをアップロード → 年間発電量等を自動計算",
+            key="ipals_upload",
         )
-        if ipals_file is not None:
-            import csv
-            import io
-            # Try cp932 (Shift_JIS) first, then utf-8
-            _raw = ipals_file.getvalue()
-            for _enc in ("cp932", "utf-8-sig", "utf-8"):
-                try:
-                    _text = _raw.decode(_enc)
-                    break
-                except (UnicodeDecodeError, LookupError):
-                    continue
-            else:
-                _text = _raw.decode("utf-8", errors="replace")
-
-            _reader = csv.reader(io.StringIO(_text))
-            _headers = next(_reader, [])
-            # Cols: 月,日,時,発電量(kWh),需要量(kWh),不足電力量(kWh),余剰電力量(kWh),自家消費電力量(kWh),自家消費率(%),消費率(%),モジュール出力(kWh)
-            _total_gen = 0.0
-            _total_demand = 0.0
-            _total_surplus = 0.0
-            _total_self_consume = 0.0
-            _monthly_gen = [0.0] * 12
-            _row_count = 0
-            for _row in _reader:
-                if len(_row) < 8:
-                    continue
-                try:
-                    _month = int(_row[0])
-                    _gen = float(_row[3]) if _row[3] and _row[3] != "-" else 0.0
-                    _demand = float(_row[4]) if _row[4] and _row[4] != "-" else 0.0
-                    _surplus = float(_row[6]) if _row[6] and _row[6] != "-" else 0.0
-                    _self_c = float(_row[7]) if _row[7] and _row[7] != "-" else 0.0
-                except (ValueError, IndexError):
-                    continue
-                _total_gen += _gen
-                _total_demand += _demand
-                _total_surplus += _surplus
-                _total_self_consume += _self_c
-                if 1 <= _month <= 12:
-                    _monthly_gen[_month - 1] += _gen
-                _row_count += 1
-
+        if ipals_file is None:
+            # Removed upload: stop billing / analysing the previous profile
+            st.session_state.pop("ipals_hourly", None)
+        else:
+            _parsed = parse_ipals_csv(ipals_file.getvalue())
+            _row_count = _parsed["row_count"] if _parsed is not None else 0
             if _row_count > 0:
+                _total_gen = _parsed["total_gen"]
+                _total_demand = _parsed["total_demand"]
+                _total_surplus = _parsed["total_surplus"]
+                _total_self_consume = _parsed["total_self_consume"]
+                _monthly_gen = _parsed["monthly_gen"]
                 _self_rate = (_total_self_consume / _total_gen * 100) if _total_gen > 0 else 0.0
                 _co2_t = _total_gen * 0.000453  # t-CO2/kWh (2023 grid emission factor)
 
@@ -1266,9 +1359,249 @@ with tab2:
                     "co2_annual_t": round(_co2_t, 1),
                     "monthly_gen_kwh": [round(m) for m in _monthly_gen],
                 }
+                st.session_state["ipals_hourly"] = _parsed["hourly"]
             else:
+                st.session_state.pop("ipals_hourly", None)
                 st.error("CSVのパースに失敗しました。iPals出力形式を確認してください。")
 
+    # ----- Monthly max demand / 12-month ratchet (needs iPals hourly data) -----
+    _ipals_hourly = st.session_state.get("ipals_hourly")
+    if ipals_file is not None and _ipals_hourly is not None:
+        with st.expander("🔻 月別最大需要電力・基本料金（12ヶ月ラチェット）", expanded=False):
+            from proposal_generator.demand_calc import calc_ratchet_billing
+
+            _master_row = next(
+                (r for r in (_elec_master or [])
+                 if r["company"] == st.session_state.get("elec_company")
+                 and r["contract"] == st.session_state.get("elec_contract")),
+                None,
+            )
+            _rb_col1, _rb_col2, _rb_col3 = st.columns(3)
+            with _rb_col1:
+                _rb_rate = st.number_input(
+                    "基本料金単価 (円/kW/月)", min_value=0.0, step=10.0,
+                    value=float(_master_row["basic"]) if _master_row else 1800.0,
+                    key="ratchet_basic_rate",
+                    help="契約電力マスタの基本料金（未選択時は手入力）",
+                )
+            with _rb_col2:
+                _rb_pf = st.number_input("力率 (%)", min_value=50, max_value=100, value=85, step=1, key="ratchet_pf")
+            with _rb_col3:
+                _rb_start = st.selectbox(
+                    "運転開始月", list(range(1, 13)), index=3, key="ratchet_start_month",
+                    format_func=lambda m: f"{m}月",
+                )
+
+            _rb = calc_ratchet_billing(_ipals_hourly, _rb_rate, _rb_pf, _rb_start)
+            _rm1, _rm2, _rm3 = st.columns(3)
+            _rm1.metric("初年度 基本料金削減", f"¥{_rb['annual_saving_y1']:,.0f}")
+            _rm2.metric("2年目以降 基本料金削減", f"¥{_rb['annual_saving']:,.0f}")
+            _rm3.metric(
+                "ラチェットによる初年度減少", f"¥{_rb['ratchet_loss']:,.0f}",
+                delta=(f"{_rb['full_saving_month']}月から満額" if _rb["full_saving_month"] else None),
+                delta_color="off",
+            )
+
+            import pandas as pd
+            _rdf = pd.DataFrame({
+                "月": [f"{m}月" for m in _rb["month"]],
+                "最大需要 導入前(kW)": _rb["peak_before_kw"],
+                "最大需要 導入後(kW)": _rb["peak_after_kw"],
+                "契約電力 導入前(kW)": _rb["billing_kw_before"],
+                "契約電力 初年度(kW)": _rb["billing_kw_after_y1"],
+                "契約電力 2年目以降(kW)": _rb["billing_kw_after"],
+                "削減額 初年度(円)": _rb["saving_y1"],
+                "削減額 2年目以降(円)": _rb["saving"],
+            })
+            st.dataframe(
+                _rdf.style.format(
+                    {c: ("{:,.0f}" if "(円)" in c else "{:,.1f}") for c in _rdf.columns if c != "月"},
+                    na_rep="—",
+                ),
+                use_container_width=True,
+            )
+            st.caption(
+                "契約電力 = 当月を含む過去12ヶ月の最大需要電力。導入前11ヶ月のピークが残るため、"
+                "初年度は削減が段階的に効きます（iPalsの1時間値で30分デマンドを近似）"
+            )
+
+            # Weekday vs 土日祝 load, with the profile laid on the proposal year
+            from proposal_generator.demand_calc import calc_demand_cut
+            _dc = calc_demand_cut(_ipals_hourly, _rb_rate, _rb_pf, year=proposal_date.year)
+            if _dc:
+                st.caption(
+                    f"{proposal_date.year}年暦　年間ピーク: {_dc['peak_before_date']} {_dc['peak_before_kw']:,.1f}kW"
+                    f"{'（土日祝）' if _dc['peak_before_offday'] else ''}　"
+                    f"平日 最大{_dc['weekday_peak_kw']:,.1f}kW・平均{_dc['weekday_avg_kw']:,.1f}kW ／ "
+                    f"土日祝 最大{_dc['offday_peak_kw']:,.1f}kW・平均{_dc['offday_avg_kw']:,.1f}kW"
+                )
+
+        with st.expander("📈 負荷持続曲線・ピーク日ランキング", expanded=False):
+            from proposal_generator.peak_calc import peak_analytics
+
+            _pk_col1, _pk_col2 = st.columns(2)
+            with _pk_col1:
+                _pk_n = st.number_input("表示件数", min_value=3, max_value=30, value=10, step=1, key="peak_top_n")
+            with _pk_col2:
+                _pk_basis = st.selectbox("順位の基準", ["導入前需要", "導入後需要"], key="peak_basis")
+
+            # Cached per upload: PP9 / EP5 read the same result
+            _pk = peak_analytics(_ipals_hourly, top_n=int(_pk_n), year=proposal_date.year)
+
+            import pandas as pd
+            _ldc = pd.DataFrame({
+                "PV導入前 (kW)": _pk["duration_before_kw"],
+                "PV導入後 (kW)": _pk["duration_after_kw"],
+            }, index=pd.Index(_pk["duration_hours"], name="超過時間 (h)"))
+            st.line_chart(_ldc)
+            st.caption(
+                f"負荷持続曲線: 需要を大きい順に並べた{_pk['n_hours']:,}時間の分布"
+                "（横軸 = その値以上となる時間数）。PV導入後は昼間の高負荷帯が下がります"
+            )
+
+            _ev = _pk["events_before"] if _pk_basis == "導入前需要" else _pk["events_after"]
+            _evdf = pd.DataFrame({
+                "順位": range(1, len(_ev["label"]) + 1),
+                "日時": _ev["label"],
+                "月": _ev["month"],
+                "導入前需要(kW)": _ev["demand_kw"],
+                "PV自家消費(kW)": _ev["pv_kw"],
+                "PV寄与率(%)": _ev["pv_share"] * 100,
+                "導入後需要(kW)": _ev["net_demand_kw"],
+                "土日祝": ["○" if o else "" for o in _ev["offday"]],
+            })
+            st.dataframe(
+                _evdf.style.format(
+                    {"導入前需要(kW)": "{:,.1f}", "PV自家消費(kW)": "{:,.1f}",
+                     "PV寄与率(%)": "{:.1f}", "導入後需要(kW)": "{:,.1f}"},
+                    na_rep="—",
+                ),
+                use_container_width=True,
+            )
+            st.caption(f"1日1件（その日の最大需要時刻）で集計。{proposal_date.year}年暦で曜日・祝日を判定")
+
+        with st.expander("🔋 蓄電池ピークカット試算（容量スイープ）", expanded=False):
+            from proposal_generator.battery_calc import (
+                DEFAULT_C_RATE,
+                DEFAULT_ROUND_TRIP_EFFICIENCY,
+            )
+
+            _bt_col1, _bt_col2, _bt_col3 = st.columns(3)
+            with _bt_col1:
+                _bt_max = st.number_input(
+                    "最大容量 (kWh)", min_value=10.0, step=50.0,
+                    value=float(max(total_battery_kwh * 2, 200.0)), key="battery_sweep_max",
+                )
+            with _bt_col2:
+                _bt_c_rate = st.number_input(
+                    "出力/容量 (kW/kWh)", min_value=0.1, max_value=2.0,
+                    value=DEFAULT_C_RATE, step=0.1, key="battery_c_rate",
+                )
+            with _bt_col3:
+                _bt_eff = st.number_input(
+                    "往復効率 (%)", min_value=50.0, max_value=100.0,
+                    value=DEFAULT_ROUND_TRIP_EFFICIENCY * 100, step=1.0, key="battery_rte_pct",
+                )
+
+            import numpy as np
+            _bt_sizes = np.unique(np.append(np.linspace(0.0, _bt_max, 21), total_battery_kwh))
+            # Cached: reruns from unrelated widgets do not repeat the dispatch
+            _bt = battery_sweep(
+                _ipals_hourly, tuple(_bt_sizes.tolist()), _bt_c_rate, _bt_eff / 100, _rb_rate, _rb_pf,
+            )
+            if total_battery_kwh > 0:
+                _bi = int(np.searchsorted(_bt_sizes, total_battery_kwh))
+                _bm1, _bm2, _bm3 = st.columns(3)
+                _bm1.metric(
+                    f"見積の蓄電池 {total_battery_kwh:,.1f}kWh 導入後ピーク",
+                    f"{_bt['peak_after_kw'][_bi]:,.1f} kW",
+                    delta=f"▲{_bt['demand_cut_kw'][_bi]:,.1f} kW", delta_color="inverse",
+                )
+                _bm2.metric("追加の基本料金削減", f"¥{_bt['annual_basic_saving'][_bi]:,.0f}/年")
+                _bm3.metric("余剰PVの蓄電量", f"{_bt['avoided_surplus_kwh'][_bi]:,.0f} kWh/年")
+
+            import pandas as pd
+            _bdf = pd.DataFrame({
+                "容量(kWh)": _bt["capacity_kwh"],
+                "出力(kW)": _bt["power_kw"],
+                "導入後ピーク(kW)": _bt["peak_after_kw"],
+                "追加削減(kW)": _bt["demand_cut_kw"],
+                "追加基本料金削減(円/年)": _bt["annual_basic_saving"],
+                "余剰PV蓄電(kWh/年)": _bt["avoided_surplus_kwh"],
+                "等価サイクル(回/年)": _bt["equivalent_cycles"],
+            })
+            st.line_chart(_bdf.set_index("容量(kWh)")[["追加基本料金削減(円/年)"]])
+            st.dataframe(
+                _bdf.style.format({
+                    "容量(kWh)": "{:,.1f}", "出力(kW)": "{:,.1f}", "導入後ピーク(kW)": "{:,.1f}",
+                    "追加削減(kW)": "{:,.1f}", "追加基本料金削減(円/年)": "{:,.0f}",
+                    "余剰PV蓄電(kWh/年)": "{:,.0f}", "等価サイクル(回/年)": "{:.1f}",
+                }, na_rep="—"),
+                use_container_width=True,
+            )
+            st.caption(
+                "余剰PVで充電し、PV後の負荷が閾値を超える時間に放電（閾値は年間を通じて維持できる最小値）。"
+                "基本料金単価・力率は上の月別最大需要電力の設定を使用します"
+            )
+
+    # ----- Generation profile (shared by the PPA calc and PP8 / EP4) -----
+    with st.expander("📉 発電量プロファイル（LID・劣化保証・出力抑制）", expanded=False):
+        from proposal_generator.generation_profile import (
+            DEGRADATION_RATE,
+            PROFILE_YEARS,
+            WARRANTY_CURVES,
+            generation_profile,
+        )
+
+        st.caption("PPA単価試算と経済効果試算スライド（PP8 / EP4）で同じ年次発電量を使用します")
+        _gp_col1, _gp_col2 = st.columns(2)
+        with _gp_col1:
+            _gp_model = st.selectbox("劣化モデル", ["年率一定"] + list(WARRANTY_CURVES), key="yield_model")
+            _gp_deg_pct = st.number_input(
+                "経年劣化率 (%/年)",
+                min_value=0.0, max_value=3.0, value=DEGRADATION_RATE * 100, step=0.05,
+                key="yield_degradation_pct", disabled=_gp_model != "年率一定",
+            )
+        with _gp_col2:
+            _gp_lid_pct = st.number_input(
+                "初年度LID (%)", min_value=0.0, max_value=5.0, value=0.0, step=0.5,
+                key="yield_lid_pct", help="光劣化（Light Induced Degradation）による初年度の出力低下",
+            )
+            _gp_curtail_pct = st.number_input(
+                "出力抑制率 (%/年)", min_value=0.0, max_value=30.0, value=0.0, step=0.5,
+                key="yield_curtailment_pct",
+            )
+
+        _gp_is_default = (
+            _gp_model == "年率一定" and _gp_deg_pct == DEGRADATION_RATE * 100
+            and _gp_lid_pct == 0 and _gp_curtail_pct == 0
+        )
+        if _gp_is_default:
+            _yield_profile = None
+            st.session_state.pop("yield_profile", None)
+            st.session_state.pop("yield_profile_label", None)
+        else:
+            _yield_profile = generation_profile(
+                max(PROFILE_YEARS, int(contract_years), int(lease_years)),
+                degradation=_gp_deg_pct / 100,
+                lid=_gp_lid_pct / 100,
+                warranty=None if _gp_model == "年率一定" else _gp_model,
+                curtailment=_gp_curtail_pct / 100,
+            )
+            _gp_base = f"年▲{_gp_deg_pct:.2f}%低減" if _gp_model == "年率一定" else _gp_model
+            st.session_state["yield_profile"] = _yield_profile.tolist()
+            st.session_state["yield_profile_label"] = (
+                f"発電量は{_gp_base}・LID {_gp_lid_pct:.1f}%・出力抑制 {_gp_curtail_pct:.1f}%で試算"
+            )
+            import pandas as pd
+            st.line_chart(
+                pd.DataFrame(
+                    {"発電量係数": _yield_profile[:int(contract_years)]},
+                    index=pd.RangeIndex(1, int(contract_years) + 1, name="年"),
+                ),
+                height=180,
+            )
+
     # ----- Layout image & Load calculation upload -----
     with st.expander("📐 設備レイアウト・積載荷重", expanded=False):
         st.caption("PP5 / EP3 スライドに使用します")
@@ -1403,6 +1736,7 @@ with tab2:
                     target_dscr=_target_dscr,
                     maintenance_yen_per_kw=_maint_per_kw,
                     insurance_yen_fixed=_insure_fixed,
+                    yield_profile=_yield_profile,
                 )
                 st.session_state["ppa_calc_result"] = _result
 
@@ -1435,30 +1769,613 @@ with tab2:
                     st.rerun()
 
                 # Cashflow table
-                _cf = _calc_res.get("cashflow_table", [])
+                _cf = _calc_res.get("cashflow_table")
                 if _cf:
+                    _df = _cf.to_pandas(labels=True)
+                    st.dataframe(
+                        _df.style.format(
+                            {c: "{:,.0f}" for c in _df.columns if c.endswith(("(kWh)", "(円)"))}
+                            | {"DSCR": "{:.3f}"},
+                            na_rep="—",
+                        ),
+                        use_container_width=True,
+                        height=300,
+                    )
+
+                # Monthly DSCR (seasonal shape from iPals monthly generation)
+                _monthly_gen_now = _ipals_now.get("monthly_gen_kwh")
+                if _monthly_gen_now and _sc_y1 > 0 and selling_price > subsidy_amount:
+                    with st.expander("月次DSCR（季節変動・冬季の最小月）", expanded=False):
+                        from proposal_generator.ppa_calc import calc_monthly_cashflow
+
+                        _start_month = st.selectbox(
+                            "契約開始月", list(range(1, 13)), index=3,
+                            format_func=lambda m: f"{m}月", key="ppa_monthly_start",
+                        )
+                        _mres = calc_monthly_cashflow(
+                            self_consumption_y1_kwh=_sc_y1,
+                            surplus_y1_kwh=_sur_y1,
+                            selling_price=selling_price,
+                            subsidy_amount=subsidy_amount,
+                            lease_company=lease_company,
+                            lease_rate_pct=lease_rate,
+                            lease_years=int(lease_years),
+                            contract_years=int(contract_years),
+                            monthly_gen_kwh=_monthly_gen_now,
+                            ppa_unit_price=_calc_res["min_ppa_price"],
+                            system_kw=system_capacity,
+                            fit_price=surplus_price,
+                            include_surplus=_include_sur,
+                            maintenance_yen_per_kw=_maint_per_kw,
+                            insurance_yen_fixed=_insure_fixed,
+                            yield_profile=_yield_profile,
+                            start_month=_start_month,
+                        )
+                        _mm1, _mm2, _mm3 = st.columns(3)
+                        with _mm1:
+                            _mr = _mres["min_rolling_dscr"]
+                            st.metric("最小DSCR（12ヶ月移動）", f"{_mr:.3f}" if _mr else "—")
+                        with _mm2:
+                            _mmd = _mres["min_monthly_dscr"]
+                            st.metric("最小月次DSCR", f"{_mmd:.3f}" if _mmd else "—")
+                        with _mm3:
+                            _wm = _mres["weakest_month"]
+                            st.metric("最小月", f"{_wm['year']}年目 {_wm['month']}月" if _wm else "—")
+                        import pandas as pd
+                        st.dataframe(
+                            pd.DataFrame({
+                                "月": [f"{m}月" for m in range(1, 13)],
+                                "最小月次DSCR": _mres["min_dscr_by_month"],
+                            }).style.format({"最小月次DSCR": "{:.3f}"}, na_rep="—"),
+                            use_container_width=True,
+                        )
+
+            # Reverse calculation: target PPA price -> maximum selling price
+            with st.expander("目標PPA単価から販売価格を逆算", expanded=False):
+                from proposal_generator.ppa_calc import calc_max_selling_price
+
+                _rv_col1, _rv_col2 = st.columns(2)
+                with _rv_col1:
+                    _rv_target = st.number_input(
+                        "顧客の希望PPA単価 (円/kWh)",
+                        min_value=0.0, max_value=50.0, value=14.0, step=0.5,
+                        key="ppa_reverse_target_price",
+                        help="この単価で目標DSCRを全期間満たす最大の販売価格を算出します",
+                    )
+                if _sc_y1 > 0 and _rv_target > 0:
+                    _rv = calc_max_selling_price(
+                        target_ppa_price=_rv_target,
+                        self_consumption_y1_kwh=_sc_y1,
+                        surplus_y1_kwh=_sur_y1,
+                        subsidy_amount=subsidy_amount,
+                        lease_company=lease_company,
+                        lease_rate_pct=lease_rate,
+                        lease_years=int(lease_years),
+                        contract_years=int(contract_years),
+                        system_kw=system_capacity,
+                        fit_price=surplus_price,
+                        include_surplus=_include_sur,
+                        target_dscr=_target_dscr,
+                        maintenance_yen_per_kw=_maint_per_kw,
+                        insurance_yen_fixed=_insure_fixed,
+                        yield_profile=_yield_profile,
+                        raw_cost=raw_cost if raw_cost > 0 else None,
+                    )
+                    with _rv_col2:
+                        if _rv["feasible"]:
+                            st.metric("最大販売価格", f"¥{_rv['max_selling_price']:,.0f}")
+                            if _rv["gross_margin_pct"] is not None:
+                                st.metric(
+                                    "想定粗利（粗利率）",
+                                    f"¥{_rv['gross_profit']:,.0f}",
+                                    delta=f"{_rv['gross_margin_pct']:.1f}%",
+                                )
+                            st.caption(
+                                f"元本 ¥{_rv['principal']:,.0f} / リース年額 ¥{_rv['annual_lease_payment']:,.0f}"
+                                + (f" / 最小DSCR {_rv['min_dscr']:.3f}" if _rv["min_dscr"] is not None else "")
+                            )
+                        else:
+                            st.warning("この単価では目標DSCRを満たす販売価格がありません")
+                else:
+                    st.caption("iPalsデータをアップロードすると逆算できます")
+
+            # Monte Carlo risk analysis (P50/P90 DSCR, IRR distribution)
+            with st.expander("リスク分析（モンテカルロ：P50/P90 DSCR・IRR分布）", expanded=False):
+                from proposal_generator.ppa_risk import (
+                    simulate_ppa_risk,
+                    DEFAULT_N_PATHS,
+                    DEFAULT_SHORTFALL_SD_PCT,
+                    DEFAULT_OM_INFLATION_MEAN_PCT,
+                )
+
+                _mc_col1, _mc_col2, _mc_col3 = st.columns(3)
+                with _mc_col1:
+                    _mc_price = st.number_input(
+                        "試算PPA単価 (円/kWh)",
+                        min_value=0.0, max_value=50.0,
+                        value=float((_calc_res or {}).get("min_ppa_price", 0.0) or 0.0), step=0.5,
+                        key="ppa_mc_price",
+                        help="0の場合は最小PPA単価（DSCR達成）で試算します",
+                    )
+                with _mc_col2:
+                    _mc_shortfall_sd = st.number_input(
+                        "自家消費量のばらつき σ (%)",
+                        min_value=0.0, max_value=30.0, value=DEFAULT_SHORTFALL_SD_PCT, step=1.0,
+                        key="ppa_mc_shortfall_sd",
+                    )
+                with _mc_col3:
+                    _mc_om_infl = st.number_input(
+                        "O&Mインフレ率 平均 (%/年)",
+                        min_value=0.0, max_value=10.0, value=DEFAULT_OM_INFLATION_MEAN_PCT, step=0.5,
+                        key="ppa_mc_om_inflation",
+                    )
+                if st.button(
+                    f"シミュレーション実行（{DEFAULT_N_PATHS:,}パス）",
+                    key="calc_ppa_mc_btn",
+                    disabled=(_sc_y1 <= 0 or selling_price <= subsidy_amount),
+                ):
+                    st.session_state["ppa_mc_result"] = simulate_ppa_risk(
+                        ppa_unit_price=_mc_price if _mc_price > 0 else None,
+                        seed=0,
+                        breach_dscr=_target_dscr,
+                        shortfall_sd_pct=_mc_shortfall_sd,
+                        om_inflation_mean_pct=_mc_om_infl,
+                        self_consumption_y1_kwh=_sc_y1,
+                        surplus_y1_kwh=_sur_y1,
+                        selling_price=selling_price,
+                        subsidy_amount=subsidy_amount,
+                        lease_company=lease_company,
+                        lease_rate_pct=lease_rate,
+                        lease_years=int(lease_years),
+                        contract_years=int(contract_years),
+                        system_kw=system_capacity,
+                        fit_price=surplus_price,
+                        include_surplus=_include_sur,
+                        target_dscr=_target_dscr,
+                        maintenance_yen_per_kw=_maint_per_kw,
+                        insurance_yen_fixed=_insure_fixed,
+                        yield_profile=_yield_profile,
+                    )
+
+                _mc = st.session_state.get("ppa_mc_result")
+                if _mc:
+                    import pandas as pd
+                    _m1, _m2, _m3, _m4 = st.columns(4)
+                    with _m1:
+                        st.metric(f"DSCR<{_target_dscr:.2f} 発生確率", f"{_mc['breach_prob'] * 100:.1f}%")
+                    with _m2:
+                        st.metric("最小DSCR P50 / P90",
+                                  f"{_mc['min_dscr_percentiles']['P50']:.3f} / {_mc['min_dscr_percentiles']['P90']:.3f}")
+                    with _m3:
+                        st.metric("IRR P50 / P90",
+                                  f"{_mc['irr_percentiles']['P50']:.2f}% / {_mc['irr_percentiles']['P90']:.2f}%")
+                    with _m4:
+                        st.metric("試算PPA単価", f"{_mc['ppa_unit_price']:.1f} 円/kWh")
+                    _mcdf = pd.DataFrame({
+                        "年": _mc["years"],
+                        "DSCR 平均": _mc["dscr_mean"],
+                        "DSCR P50": _mc["dscr_percentiles"]["P50"],
+                        "DSCR P90": _mc["dscr_percentiles"]["P90"],
+                        "下回る確率": _mc["breach_prob_by_year"],
+                    })
+                    st.dataframe(
+                        _mcdf.style.format({
+                            "DSCR 平均": "{:.3f}",
+                            "DSCR P50": "{:.3f}",
+                            "DSCR P90": "{:.3f}",
+                            "下回る確率": "{:.1%}",
+                        }, na_rep="—"),
+                        use_container_width=True,
+                        height=300,
+                    )
+
+            # Best finance option (all registered companies × allowed terms)
+            with st.expander("最適ファイナンス比較（全リース会社 × 期間）", expanded=False):
+                from proposal_generator.finance_products import load_finance_products
+                from proposal_generator.ppa_batch import best_finance_options
+
+                # Energy-only price: a PPA kWh does not avoid the basic charge
+                _bf_tariff = _energy_unit_price or None
+                # Lessors without a fixed rate are compared only at a rate entered here
+                _bf_open = [n for n, p in load_finance_products().items() if p.rate is None]
+                _bf_rates = {}
+                if _bf_open:
+                    st.caption("固定金利のないリース会社は金利を入力した場合のみ比較します（0 = 比較しない）")
+                    for _bf_col, _bf_name in zip(st.columns(len(_bf_open)), _bf_open):
+                        with _bf_col:
+                            _bf_rate = st.number_input(
+                                f"{_bf_name} 金利 (%)", min_value=0.0, step=0.1,
+                                value=float(lease_rate) if _bf_name == lease_company else 0.0,
+                                key=f"ppa_best_rate_{_bf_name}",
+                            )
+                        if _bf_rate > 0:
+                            _bf_rates[_bf_name] = _bf_rate
+                if _sc_y1 > 0 and selling_price > subsidy_amount:
+                    import pandas as pd
+                    _bf = best_finance_options(
+                        current_tariff=_bf_tariff,
+                        lease_rates=_bf_rates,
+                        self_consumption_y1_kwh=_sc_y1,
+                        surplus_y1_kwh=_sur_y1,
+                        selling_price=selling_price,
+                        subsidy_amount=subsidy_amount,
+                        contract_years=int(contract_years),
+                        system_kw=system_capacity,
+                        fit_price=surplus_price,
+                        include_surplus=_include_sur,
+                        target_dscr=_target_dscr,
+                        maintenance_yen_per_kw=_maint_per_kw,
+                        insurance_yen_fixed=_insure_fixed,
+                        yield_profile=_yield_profile,
+                    )
+                    _only_pareto = st.checkbox("パレート最適のみ表示", value=True, key="ppa_best_pareto_only")
+                    _bfdf = pd.DataFrame({
+                        "リース会社": _bf["lease_company"],
+                        "期間(年)": _bf["lease_years"],
+                        "最小PPA単価": _bf["min_ppa_price"],
+                        "IRR(%)": _bf["irr_pct"],
+                        "顧客削減額累計(円)": _bf["total_customer_savings"],
+                        "単価順位": _bf["rank_price"],
+                        "IRR順位": _bf["rank_irr"],
+                        "パレート": _bf["pareto"],
+                    })[_bf["valid"] & (_bf["pareto"] | (not _only_pareto))]
+                    if _bf_tariff is None:
+                        st.caption("電気料金を入力すると顧客削減額も比較できます")
+                    st.dataframe(
+                        _bfdf.style.format({
+                            "最小PPA単価": "{:.1f}",
+                            "IRR(%)": "{:.2f}",
+                            "顧客削減額累計(円)": "{:,.0f}",
+                        }, na_rep="—"),
+                        use_container_width=True,
+                        height=300,
+                    )
+                else:
+                    st.caption("iPalsデータと販売価格を入力すると比較できます")
+
+            # Contract-term sweep (break-even per term)
+            with st.expander("契約期間比較（10〜20年の損益分岐）", expanded=False):
+                from proposal_generator.ppa_batch import sweep_contract_terms
+
+                # Energy-only price: a PPA kWh does not avoid the basic charge
+                _ts_tariff = _energy_unit_price or None
+                if _sc_y1 > 0 and selling_price > subsidy_amount:
+                    import pandas as pd
+                    _ts = sweep_contract_terms(
+                        current_tariff=_ts_tariff,
+                        self_consumption_y1_kwh=_sc_y1,
+                        surplus_y1_kwh=_sur_y1,
+                        selling_price=selling_price,
+                        subsidy_amount=subsidy_amount,
+                        lease_company=lease_company,
+                        lease_rate_pct=lease_rate,
+                        system_kw=system_capacity,
+                        fit_price=surplus_price,
+                        include_surplus=_include_sur,
+                        target_dscr=_target_dscr,
+                        maintenance_yen_per_kw=_maint_per_kw,
+                        insurance_yen_fixed=_insure_fixed,
+                        yield_profile=_yield_profile,
+                    )
+                    st.dataframe(
+                        pd.DataFrame({
+                            "契約期間(年)": _ts["contract_years"],
+                            "最小PPA単価": _ts["min_ppa_price"],
+                            "顧客削減額累計(円)": _ts["cumulative_savings"],
+                            "EPC回収年": _ts["epc_payback_year"],
+                            "NPV(円)": _ts["lessor_npv_yen"],
+                        }).style.format({
+                            "最小PPA単価": "{:.1f}",
+                            "顧客削減額累計(円)": "{:,.0f}",
+                            "NPV(円)": "{:,.0f}",
+                        }, na_rep="—"),
+                        use_container_width=True,
+                    )
+                    if _ts_tariff is None:
+                        st.caption("電気料金を入力すると顧客削減額・EPC回収年も表示されます")
+                else:
+                    st.caption("iPalsデータと販売価格を入力すると比較できます")
+
+            # Tornado sensitivity (which input moves the min price most)
+            with st.expander("感度分析（トルネード：最小PPA単価への影響）", expanded=False):
+                from proposal_generator.ppa_batch import tornado_sensitivity
+
+                if _sc_y1 > 0 and selling_price > subsidy_amount:
+                    import pandas as pd
+                    _tn = tornado_sensitivity(
+                        self_consumption_y1_kwh=_sc_y1,
+                        surplus_y1_kwh=_sur_y1,
+                        selling_price=selling_price,
+                        subsidy_amount=subsidy_amount,
+                        lease_company=lease_company,
+                        lease_rate_pct=lease_rate,
+                        lease_years=int(lease_years),
+                        contract_years=int(contract_years),
+                        system_kw=system_capacity,
+                        fit_price=surplus_price,
+                        include_surplus=_include_sur,
+                        target_dscr=_target_dscr,
+                        maintenance_yen_per_kw=_maint_per_kw,
+                        insurance_yen_fixed=_insure_fixed,
+                        yield_profile=_yield_profile,
+                    )
+                    st.caption(
+                        f"基準: 最小PPA単価 {_tn['base_price']:.1f} 円/kWh"
+                        f"（損益分岐 {_tn['base_break_even']:.2f} 円/kWh）。"
+                        "金利±0.5pt・劣化率±0.25pt・その他±10%"
+                    )
+                    st.bar_chart(
+                        pd.DataFrame(
+                            {"下振れ": _tn["impact_low"], "上振れ": _tn["impact_high"]},
+                            index=pd.Index(_tn["label"], name="入力"),
+                        ),
+                    )
+                    st.dataframe(
+                        pd.DataFrame({
+                            "入力": _tn["label"],
+                            "下振れ時単価": _tn["price_low"],
+                            "上振れ時単価": _tn["price_high"],
+                            "影響(下)": _tn["impact_low"],
+                            "影響(上)": _tn["impact_high"],
+                            "振れ幅": _tn["swing"],
+                        }).style.format({
+                            "下振れ時単価": "{:.1f}",
+                            "上振れ時単価": "{:.1f}",
+                            "影響(下)": "{:+.2f}",
+                            "影響(上)": "{:+.2f}",
+                            "振れ幅": "{:.2f}",
+                        }, na_rep="—"),
+                        use_container_width=True,
+                    )
+                else:
+                    st.caption("iPalsデータと販売価格を入力すると分析できます")
+
+            # PV capacity sizing (scales the iPals hourly generation)
+            with st.expander("PV容量最適化（容量スイープ：自家消費・最小PPA単価・顧客削減額）", expanded=False):
+                from proposal_generator.sizing_calc import sizing_sweep
+
+                _sz_hourly = _ipals_hourly if ipals_file is not None else None
+                if _sz_hourly is not None and system_capacity > 0 and selling_price > subsidy_amount:
+                    import numpy as np
+                    import pandas as pd
+                    _sz_col1, _sz_col2 = st.columns(2)
+                    with _sz_col1:
+                        _sz_min = st.number_input(
+                            "最小容量 (kW)", min_value=1.0, step=10.0,
+                            value=float(max(round(system_capacity * 0.5), 1)), key="sizing_min_kw",
+                        )
+                    with _sz_col2:
+                        _sz_max = st.number_input(
+                            "最大容量 (kW)", min_value=1.0, step=10.0,
+                            value=float(round(system_capacity * 2)), key="sizing_max_kw",
+                        )
+                    # Energy-only price: the basic-charge saving is added from the demand cut
+                    _sz_tariff = _energy_unit_price or None
+                    _sz = sizing_sweep(
+                        _sz_hourly,
+                        np.unique(np.append(np.linspace(_sz_min, max(_sz_max, _sz_min), 25), system_capacity)),
+                        base_kw=system_capacity,
+                        current_tariff=_sz_tariff,
+                        basic_rate_kw=st.session_state.get("ratchet_basic_rate", 0.0),
+                        power_factor_pct=st.session_state.get("ratchet_pf", 85),
+                        selling_price=selling_price,
+                        subsidy_amount=subsidy_amount,
+                        lease_company=lease_company,
+                        lease_rate_pct=lease_rate,
+                        lease_years=int(lease_years),
+                        contract_years=int(contract_years),
+                        fit_price=surplus_price,
+                        include_surplus=_include_sur,
+                        target_dscr=_target_dscr,
+                        maintenance_yen_per_kw=_maint_per_kw,
+                        insurance_yen_fixed=_insure_fixed,
+                        consumption_correction_pct=_correction_pct,
+                        yield_profile=_yield_profile,
+                    )
+                    _szdf = pd.DataFrame({
+                        "容量(kW)": _sz["size_kw"],
+                        "自家消費量(kWh)": _sz["self_consumption_kwh"],
+                        "余剰(kWh)": _sz["surplus_kwh"],
+                        "自家消費率(%)": _sz["self_consumption_pct"] * 100,
+                        "デマンド削減(kW)": _sz["demand_cut_kw"],
+                        "最小PPA単価": _sz["min_ppa_price"],
+                    })
+                    if _sz_tariff is not None:
+                        _szdf["顧客削減額(円/年)"] = _sz["customer_saving"]
+                        st.line_chart(_szdf.set_index("容量(kW)")[["顧客削減額(円/年)"]])
+                        if _sz["optimum_kw"] is not None:
+                            st.success(
+                                f"顧客削減額が最大となる容量: **{_sz['optimum_kw']:,.0f} kW**"
+                                f"（現在 {system_capacity:,.1f} kW）"
+                            )
+                    else:
+                        st.line_chart(_szdf.set_index("容量(kW)")[["自家消費量(kWh)", "余剰(kWh)"]])
+                        st.caption("電気料金を入力すると顧客削減額と最適容量も表示されます")
+                    _sz_fmt = {
+                        "容量(kW)": "{:,.1f}", "自家消費量(kWh)": "{:,.0f}", "余剰(kWh)": "{:,.0f}",
+                        "自家消費率(%)": "{:.1f}", "デマンド削減(kW)": "{:,.1f}",
+                        "最小PPA単価": "{:.1f}", "顧客削減額(円/年)": "{:,.0f}",
+                    }
+                    st.dataframe(
+                        _szdf.style.format({c: f for c, f in _sz_fmt.items() if c in _szdf.columns}, na_rep="—"),
+                        use_container_width=True,
+                    )
+                    st.caption("販売価格・補助金は容量に比例、発電量は iPals の時間値を容量比で拡縮して試算")
+                else:
+                    st.caption("iPals CSV・システム容量・販売価格を入力すると試算できます")
+
+            # Grid calculation (finance company × term × subsidy × correction)
+            with st.expander("グリッド試算（リース会社 × 期間 × 補助金 × 補正係数）", expanded=False):
+                from proposal_generator.ppa_batch import calc_ppa_grid
+                from proposal_generator.finance_products import load_finance_products
+
+                _g_companies = st.multiselect(
+                    "リース会社",
+                    list(dict.fromkeys([*load_finance_products(), lease_company])),
+                    default=[lease_company] if lease_company else [],
+                    key="ppa_grid_companies",
+                )
+                _g_years = st.multiselect(
+                    "リース期間 (年)", list(range(10, 21)),
+                    default=[int(lease_years)] if 10 <= int(lease_years) <= 20 else [],
+                    key="ppa_grid_years",
+                )
+                _g_subsidies = st.multiselect(
+                    "補助金額 (円)", sorted({0, int(subsidy_amount)}),
+                    default=sorted({0, int(subsidy_amount)}),
+                    key="ppa_grid_subsidies",
+                )
+                _g_corrections = st.multiselect(
+                    "自家消費補正係数 (%)", [0.0, 2.5, 5.0, 7.5, 10.0],
+                    default=[_correction_pct] if _correction_pct in (0.0, 2.5, 5.0, 7.5, 10.0) else [5.0],
+                    key="ppa_grid_corrections",
+                )
+                _grid_ready = _sc_y1_raw > 0 and selling_price > 0 and all(
+                    (_g_companies, _g_years, _g_subsidies, _g_corrections)
+                )
+                if st.button("グリッド試算する", key="calc_ppa_grid_btn", disabled=not _grid_ready):
                     import pandas as pd
-                    _df = pd.DataFrame(_cf)
-                    _df.columns = ["年", "自家消費(kWh)", "余剰(kWh)", "PPA収入(円)",
-                                   "余剰収入(円)", "収入合計(円)", "リース料(円)", "O&M(円)",
-                                   "費用合計(円)", "純CF(円)", "DSCR"]
+                    _grid = calc_ppa_grid(
+                        {
+                            "lease_company": _g_companies,
+                            "lease_years": _g_years,
+                            "subsidy_amount": _g_subsidies,
+                            "consumption_correction_pct": _g_corrections,
+                        },
+                        self_consumption_y1_kwh=_sc_y1_raw,
+                        surplus_y1_kwh=_sur_y1,
+                        selling_price=selling_price,
+                        lease_rate_pct=lease_rate,
+                        contract_years=int(contract_years),
+                        system_kw=system_capacity,
+                        fit_price=surplus_price,
+                        include_surplus=_include_sur,
+                        target_dscr=_target_dscr,
+                        maintenance_yen_per_kw=_maint_per_kw,
+                        insurance_yen_fixed=_insure_fixed,
+                        yield_profile=_yield_profile,
+                    )
+                    _gdf = pd.DataFrame({
+                        "リース会社": _grid["lease_company"],
+                        "期間(年)": _grid["lease_years"],
+                        "補助金(円)": _grid["subsidy_amount"],
+                        "補正(%)": _grid["consumption_correction_pct"],
+                        "最小PPA単価": _grid["min_ppa_price"],
+                        "最小DSCR": _grid["min_dscr"],
+                        "IRR(%)": _grid["irr_pct"],
+                        "NPV(円)": _grid["npv_yen"],
+                    })
                     st.dataframe(
-                        _df.style.format({
-                            "自家消費(kWh)": "{:,.0f}",
-                            "余剰(kWh)": "{:,.0f}",
-                            "PPA収入(円)": "{:,.0f}",
-                            "余剰収入(円)": "{:,.0f}",
-                            "収入合計(円)": "{:,.0f}",
-                            "リース料(円)": "{:,.0f}",
-                            "O&M(円)": "{:,.0f}",
-                            "費用合計(円)": "{:,.0f}",
-                            "純CF(円)": "{:,.0f}",
-                            "DSCR": lambda x: f"{x:.3f}" if x else "—",
-                        }),
+                        _gdf.style.format({
+                            "補助金(円)": "{:,.0f}",
+                            "最小PPA単価": "{:.1f}",
+                            "最小DSCR": "{:.3f}",
+                            "IRR(%)": "{:.2f}",
+                            "NPV(円)": "{:,.0f}",
+                        }, na_rep="—"),
                         use_container_width=True,
                         height=300,
                     )
 
+    # ----- EPC investor returns (EPC only) -----
+    if is_epc:
+        with st.expander("💴 投資回収・税効果試算（EPC：減価償却・法人税）", expanded=False):
+            from proposal_generator.epc_calc import (
+                DEFAULT_CORPORATE_TAX_RATE,
+                DEFAULT_DISCOUNT_RATE,
+                TAX_REGIMES,
+                epc_economics_from_data,
+            )
+            from proposal_generator.ppa_calc import DEFAULT_MAINTENANCE_YEN_PER_KW
+
+            _ep_col1, _ep_col2 = st.columns(2)
+            with _ep_col1:
+                _epc_regime = st.selectbox(
+                    "税制（減価償却）", list(TAX_REGIMES), key="epc_tax_regime",
+                    help="法定耐用年数17年の定率法／定額法、または即時償却・特別償却・税額控除",
+                )
+                _epc_tax_pct = st.number_input(
+                    "法人実効税率 (%)", min_value=0.0, max_value=50.0,
+                    value=DEFAULT_CORPORATE_TAX_RATE * 100, step=0.1, key="epc_corporate_tax_pct",
+                )
+                _epc_disc_pct = st.number_input(
+                    "割引率 (%)", min_value=0.0, max_value=20.0,
+                    value=DEFAULT_DISCOUNT_RATE * 100, step=0.5, key="epc_discount_pct",
+                    help="NPV・割引回収年数の計算に使用",
+                )
+            with _ep_col2:
+                _epc_maint = st.number_input(
+                    "保守費 (円/kW/年)", min_value=0, value=int(DEFAULT_MAINTENANCE_YEN_PER_KW), step=100,
+                    key="epc_maint_per_kw",
+                )
+                _epc_om_esc_pct = st.number_input(
+                    "O&M上昇率 (%/年)", min_value=0.0, max_value=10.0, value=0.0, step=0.5,
+                    key="epc_om_escalation_pct",
+                )
+                st.caption(f"年間O&M（初年度）: ¥{system_capacity * _epc_maint:,.0f}")
+
+            # Stored with the deal so EP4 / the payback KPI read the same cached result
+            st.session_state["epc_settings"] = {
+                "epc_tax_regime": _epc_regime,
+                "corporate_tax_rate": _epc_tax_pct / 100,
+                "epc_discount_rate": _epc_disc_pct / 100,
+                "om_escalation": _epc_om_esc_pct / 100,
+                "annual_om_cost": system_capacity * _epc_maint,
+            }
+            _econ = epc_economics_from_data({
+                "selling_price": selling_price,
+                "subsidy_amount": subsidy_amount,
+                "self_consumption_kwh": st.session_state.get("ipals_data", {}).get("self_consumption_kwh"),
+                "annual_cost": annual_elec_cost if annual_elec_cost > 0 else None,
+                "annual_kwh": st.session_state.get("annual_kwh", 0),
+                "pv_unit_price": _tou_bill["pv_unit_price"] if _tou_bill else None,
+                "contract_kw": st.session_state.get("contract_kw", 0),
+                "basic_rate_kw": _basic_rate_kw,
+                "demand_reduction_kw": demand_reduction,
+                "system_capacity_kw": system_capacity,
+                "contract_years": int(contract_years),
+                "yield_profile": st.session_state.get("yield_profile"),
+                **st.session_state["epc_settings"],
+            })
+            if _econ is None or _econ["saving"][0] <= 0:
+                st.info("販売価格・iPalsデータ・電気料金を入力すると投資回収を試算します")
+            else:
+                def _yr(v):
+                    return f"{v:.1f} 年" if v is not None else f"{_econ['n_years']}年超"
+
+                _em1, _em2, _em3, _em4, _em5 = st.columns(5)
+                _em1.metric("実質投資額", f"¥{_econ['investment']:,.0f}")
+                _em2.metric(
+                    "税引後IRR", f"{_econ['irr'] * 100:.2f}%" if _econ["irr"] is not None else "—",
+                    delta=(f"税引前 {_econ['pre_tax_irr'] * 100:.2f}%"
+                           if _econ["pre_tax_irr"] is not None else None),
+                    delta_color="off",
+                )
+                _em3.metric(f"NPV（{_econ['discount_rate'] * 100:.1f}%）", f"¥{_econ['npv']:,.0f}")
+                _em4.metric("投資回収（税引後）", _yr(_econ["payback_years"]),
+                            delta=f"割引 {_yr(_econ['discounted_payback_years'])}", delta_color="off")
+                _em5.metric("税効果合計", f"¥{_econ['total_tax_shield']:,.0f}")
+
+                import pandas as pd
+                _edf = pd.DataFrame({
+                    "年": _econ["year"],
+                    "削減額(円)": _econ["saving"],
+                    "O&M(円)": _econ["om_cost"],
+                    "償却資産税(円)": _econ["property_tax"],
+                    "減価償却費(円)": _econ["depreciation"],
+                    "法人税等(円)": _econ["corporate_tax"],
+                    "税引後CF(円)": _econ["after_tax_cashflow"],
+                    "累積CF(円)": _econ["cumulative_cashflow"],
+                })
+                st.dataframe(
+                    _edf.style.format({c: "{:,.0f}" for c in _edf.columns if c != "年"}, na_rep="—"),
+                    use_container_width=True,
+                )
+                st.caption(
+                    "補助金は圧縮記帳（償却基礎 = 販売価格 − 補助金）、"
+                    "法人税の減少効果は他の課税所得と通算できる前提で試算しています"
+                )
+
     # ----- FIP (Feed-in Premium) -----
     with st.expander("⚡ FIP売電試算（余剰電力のFIP売電）", expanded=False):
         st.caption("FIP制度を活用して余剰電力を売電する場合の試算です。NEW_fip スライドに反映されます。")
@@ -1616,6 +2533,7 @@ with tab2:
         "opp_id": st.session_state.get("sf_opp_id", ""),
         "snow_depth": snow_depth,
         "proposal_date": str(proposal_date),
+        "calendar_year": proposal_date.year,  # weekdays / holidays for the hourly analytics
         "company_size": company_size,
         "site_survey": site_survey,
         "tax_display": tax_display,
@@ -1660,6 +2578,11 @@ with tab2:
         "elec_contract": st.session_state.get("elec_contract", ""),
         "contract_kw": st.session_state.get("contract_kw", 0),
         "annual_kwh": st.session_state.get("annual_kwh", 0),
+        # Basic charge of the contract (契約電力マスタ / manual) for the demand-cut saving
+        "basic_rate_kw": _basic_rate_kw,
+        # Time-of-use value of a self-consumed kWh (PP8 / EP4 usage savings)
+        "pv_unit_price": _tou_bill["pv_unit_price"] if _tou_bill else None,
+        "tou_energy_saving": _tou_bill["energy_saving"] if _tou_bill else None,
         # PPA calc results (if auto-calculated)
         "annual_lease_payment": st.session_state.get("ppa_calc_result", {}).get("annual_lease_payment", 0),
         "ppa_effective_rate_pct": st.session_state.get("ppa_calc_result", {}).get("effective_rate_pct", 0.0),
@@ -1667,8 +2590,11 @@ with tab2:
         "total_annual_cost": st.session_state.get("ppa_calc_result", {}).get("total_annual_cost", 0),
         "min_ppa_price": st.session_state.get("ppa_calc_result", {}).get("min_ppa_price", 0),
         "min_dscr": st.session_state.get("ppa_calc_result", {}).get("min_dscr", None),
-        "cashflow_table": st.session_state.get("ppa_calc_result", {}).get("cashflow_table", []),
+        "cashflow_table": list(st.session_state.get("ppa_calc_result", {}).get("cashflow_table", [])),
         "ppa_principal": st.session_state.get("ppa_calc_result", {}).get("principal", 0),
+        # Generation profile (None = 0.5%/yr default) shared with PP8 / EP4
+        "yield_profile": st.session_state.get("yield_profile"),
+        "yield_profile_label": st.session_state.get("yield_profile_label"),
         # FF
         "ff_current_situation": ff_current,
         "ff_customer_needs": ff_needs,
@@ -1703,6 +2629,10 @@ with tab2:
             "monthly_gen_kwh": _ipals.get("monthly_gen_kwh"),
         })
 
+    # EPC tax / O&M settings (epc_calc reads them from the deal)
+    if is_epc:
+        st.session_state["customer_data"].update(st.session_state.get("epc_settings", {}))
+
     # Merge layout image path and load calc data if available
     _layout_path = st.session_state.get("layout_image_path")
     if _layout_path:
@@ -1736,9 +2666,17 @@ with tab2:
         if _annual_saving > 0:
             _cd["annual_saving"] = _annual_saving
             _cd["annual_cost_saving"] = _annual_saving
-            # Simple payback period
             _sell_price = _cd.get("selling_price", 0)
-            if _sell_price > 0:
+            if _is_epc_calc:
+                # EPC: after-tax payback / IRR from the shared epc_calc result (same as EP4)
+                from proposal_generator.epc_calc import epc_economics_from_data
+                _econ = epc_economics_from_data(_cd)
+                if _econ is not None:
+                    if _econ["payback_years"] is not None:
+                        _cd["investment_recovery_yr"] = round(_econ["payback_years"], 1)
+                    _cd["irr"] = _econ["irr"]
+            elif _sell_price > 0:
+                # Simple payback period
                 _cd["investment_recovery_yr"] = round(float(_sell_price) / _annual_saving, 1)
 
 # =========================================================================
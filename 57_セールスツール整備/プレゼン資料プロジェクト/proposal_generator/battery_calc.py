@@ -0,0 +1,206 @@
+"""
+battery_calc.py - Battery peak-shaving dispatch simulator
+
+Dispatches a battery over the iPals hourly arrays (demand_calc.hourly_arrays):
+
+  - PV-surplus charging: surplus PV charges the battery (up to its power)
+  - Threshold peak shaving: when the load left after PV exceeds the
+    threshold, the battery discharges the excess (up to its power)
+  - SoC limits (soc_min..soc_max of the capacity) and round-trip efficiency
+    (split evenly between charge and discharge)
+
+Every battery size is simulated at once. The SoC recursion
+s[t] = clip(s[t-1] + d[t], lo, hi) is a composition of clamp-add maps,
+which compose associatively, so the whole year is a log2(hours)-step
+prefix scan over (sizes x hours) arrays instead of a per-hour loop:
+
+    sim = simulate_battery(hourly, capacity_kwh=[0, 50, 100, 200])
+    sim["peak_after_kw"], sim["annual_basic_saving"]
+
+Without a threshold the lowest one the battery can hold all year is found
+by bisection (each step is one scan for all sizes).
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+from proposal_generator.demand_calc import DEMAND_COLUMNS, hourly_arrays
+
+DEFAULT_ROUND_TRIP_EFFICIENCY = 0.90
+DEFAULT_C_RATE = 0.5            # power (kW) per kWh when the quote has no kW
+DEFAULT_SOC_MIN = 0.10          # usable window of the nameplate capacity
+DEFAULT_SOC_MAX = 1.00
+THRESHOLD_ITERATIONS = 16       # bisection steps (resolution = power / 2**16)
+
+BATTERY_COLUMNS = DEMAND_COLUMNS + ("surplus_kw",)
+
+
+# ---------------------------------------------------------------------------
+# Bounded cumulative sum (SoC) as an associative scan
+# ---------------------------------------------------------------------------
+
+def soc_path(delta: np.ndarray, lower, upper, initial) -> np.ndarray:
+    """State of charge after each hour: s[t] = clip(s[t-1] + delta[t], lower, upper).
+
+    Each hour is the map f_t(s) = clip(s + a, lo, hi). Applying f then g gives
+    clip(s + a_f + a_g, clip(lo_f + a_g, lo_g, hi_g), clip(hi_f + a_g, lo_g, hi_g)),
+    again a clamp-add map, so prefixes are combined by doubling strides
+    (Hillis-Steele) and s[t] = F_t(initial).
+
+    Args:
+        delta:   (n_rows, n_hours) energy into (+) / out of (-) storage
+        lower:   (n_rows,) minimum stored energy
+        upper:   (n_rows,) maximum stored energy
+        initial: (n_rows,) stored energy before hour 0
+
+    Returns:
+        (n_rows, n_hours) stored energy at the end of each hour
+    """
+    delta = np.atleast_2d(np.asarray(delta, dtype=float))
+    n_rows, n = delta.shape
+    lower, upper, initial = (np.broadcast_to(np.asarray(v, dtype=float), (n_rows,))[:, None]
+                             for v in (lower, upper, initial))
+    shift = delta.copy()
+    lo = np.broadcast_to(lower, delta.shape).copy()
+    hi = np.broadcast_to(upper, delta.shape).copy()
+    step = 1
+    while step < n:
+        a_g, lo_g, hi_g = shift[:, step:], lo[:, step:], hi[:, step:]
+        new_lo = np.clip(lo[:, :-step] + a_g, lo_g, hi_g)
+        new_hi = np.clip(hi[:, :-step] + a_g, lo_g, hi_g)
+        shift[:, step:] = shift[:, :-step] + a_g
+        lo[:, step:] = new_lo
+        hi[:, step:] = new_hi
+        step *= 2
+    return np.clip(initial + shift, lo, hi)
+
+
+# ---------------------------------------------------------------------------
+# Dispatch
+# ---------------------------------------------------------------------------
+
+def _dispatch(net, surplus, threshold, power, lower, upper, eff_c, eff_d):
+    """(stored energy, discharge delivered kW, charge from PV kW) for each row."""
+    need = np.minimum(np.maximum(net[None, :] - threshold[:, None], 0.0), power[:, None])
+    charge = np.minimum(surplus[None, :], power[:, None])
+    delta = charge * eff_c - need / eff_d
+    stored = soc_path(delta, lower, upper, upper)
+    change = np.diff(stored, axis=1, prepend=upper[:, None])
+    discharge = np.maximum(-change, 0.0) * eff_d
+    charged = np.maximum(change, 0.0) / eff_c
+    return stored, discharge, charged
+
+
+def _lowest_threshold(net, surplus, power, lower, upper, eff_c, eff_d, iterations):
+    """Lowest threshold each battery can hold all year (bisection on all rows at once).
+
+    A higher threshold never leaves less energy stored, so feasibility
+    (post-battery peak <= threshold) is monotone in the threshold.
+    """
+    peak = float(net.max()) if len(net) else 0.0
+    lo = np.maximum(peak - power, 0.0)
+    hi = np.full_like(power, peak)
+    # hours that can matter: PV surplus, or load above the lowest candidate threshold
+    active = (surplus > 0) | (net > lo.min())
+    net_a, surplus_a = net[active], surplus[active]
+    for _ in range(iterations):
+        mid = (lo + hi) / 2
+        _, discharge, _ = _dispatch(net_a, surplus_a, mid, power, lower, upper, eff_c, eff_d)
+        held = (net_a[None, :] - discharge).max(axis=1, initial=0.0) <= mid + 1e-9
+        hi = np.where(held, mid, hi)
+        lo = np.where(held, lo, mid)
+    return hi
+
+
+def simulate_battery(
+    hourly_rows,
+    capacity_kwh,
+    power_kw=None,
+    threshold_kw=None,
+    round_trip_efficiency: float = DEFAULT_ROUND_TRIP_EFFICIENCY,
+    soc_min: float = DEFAULT_SOC_MIN,
+    soc_max: float = DEFAULT_SOC_MAX,
+    basic_rate_kw: float = 0.0,
+    power_factor_pct: int = 85,
+    iterations: int = THRESHOLD_ITERATIONS,
+) -> dict[str, np.ndarray]:
+    """Peak-shaving dispatch of one or more battery sizes over the iPals year.
+
+    Args:
+        hourly_rows:           hourly dicts or hourly_arrays() columns
+        capacity_kwh:          scalar or (n_sizes,) nameplate capacity
+        power_kw:              scalar or per size; None = capacity x DEFAULT_C_RATE
+        threshold_kw:          scalar or per size; None = lowest holdable threshold
+        round_trip_efficiency: charge x discharge efficiency
+        soc_min / soc_max:     usable SoC window (fractions of capacity)
+        basic_rate_kw:         basic charge unit price (yen/kW/month)
+        power_factor_pct:      power factor percentage (default 85)
+        iterations:            bisection steps for the threshold search
+
+    Returns:
+        dict of (n_sizes,) arrays: capacity_kwh, power_kw, threshold_kw,
+        peak_pv_kw (after PV only), peak_after_kw (after PV + battery),
+        demand_cut_kw, discharged_kwh, avoided_surplus_kwh (PV surplus stored),
+        surplus_after_kwh, equivalent_cycles, monthly_basic_saving,
+        annual_basic_saving (extra on top of PV, steady state like
+        calc_demand_cut); plus (n_sizes, n_hours) soc_kwh, discharge_kw,
+        charge_kw
+    """
+    arrays = hourly_arrays(hourly_rows, BATTERY_COLUMNS)
+    net = np.maximum(arrays["demand_kw"] - arrays["self_consumption_kw"], 0.0)
+    surplus = np.maximum(arrays["surplus_kw"], 0.0)
+
+    capacity = np.atleast_1d(np.asarray(capacity_kwh, dtype=float))
+    power = capacity * DEFAULT_C_RATE if power_kw is None else np.asarray(power_kw, dtype=float)
+    capacity, power = np.broadcast_arrays(capacity, power)
+    lower, upper = capacity * soc_min, capacity * soc_max
+    eff_c = eff_d = float(np.sqrt(round_trip_efficiency))
+
+    peak_pv = float(net.max()) if len(net) else 0.0
+    if threshold_kw is None:
+        threshold = _lowest_threshold(net, surplus, power, lower, upper, eff_c, eff_d, iterations)
+    else:
+        threshold = np.broadcast_to(np.asarray(threshold_kw, dtype=float), capacity.shape).copy()
+
+    stored, discharge, charged = _dispatch(net, surplus, threshold, power, lower, upper, eff_c, eff_d)
+    peak_after = (net[None, :] - discharge).max(axis=1, initial=0.0)
+    demand_cut = peak_pv - peak_after
+    usable = upper - lower
+    discharged = discharge.sum(axis=1)
+
+    pf_factor = (185 - power_factor_pct) / 100
+    monthly_saving = basic_rate_kw * demand_cut * pf_factor
+    return {
+        "capacity_kwh": capacity,
+        "power_kw": power,
+        "threshold_kw": threshold,
+        "peak_pv_kw": np.full(capacity.shape, peak_pv),
+        "peak_after_kw": peak_after,
+        "demand_cut_kw": demand_cut,
+        "discharged_kwh": discharged,
+        "avoided_surplus_kwh": charged.sum(axis=1),
+        "surplus_after_kwh": surplus.sum() - charged.sum(axis=1),
+        "equivalent_cycles": np.divide(discharged / eff_d, usable, out=np.zeros_like(usable), where=usable > 0),
+        "monthly_basic_saving": np.rint(monthly_saving),
+        "annual_basic_saving": np.rint(monthly_saving * 12),
+        "soc_kwh": stored,
+        "discharge_kw": discharge,
+        "charge_kw": charged,
+    }
+
+
+def with_battery(hourly_rows, capacity_kwh: float, **kwargs) -> dict[str, np.ndarray]:
+    """Hourly columns with one battery's dispatch folded in.
+
+    Discharge is stored PV, so it is added to self_consumption_kw and the
+    stored energy is taken out of surplus_kw; calc_demand_cut() /
+    calc_ratchet_billing() on the result give the post-battery figures.
+    """
+    arrays = dict(hourly_arrays(hourly_rows))
+    if capacity_kwh <= 0:
+        return arrays
+    sim = simulate_battery(arrays, capacity_kwh, **kwargs)
+    arrays["self_consumption_kw"] = arrays["self_consumption_kw"] + sim["discharge_kw"][0]
+    arrays["surplus_kw"] = np.maximum(arrays["surplus_kw"] - sim["charge_kw"][0], 0.0)
+    return arrays
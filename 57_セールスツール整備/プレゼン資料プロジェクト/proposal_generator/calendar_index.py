@@ -0,0 +1,183 @@
+"""
+calendar_index.py - Japanese calendar index for hourly analytics
+
+iPals hourly data carries month / day / hour only. This module precomputes,
+once per year, a (12 x 31) table indexed by [month - 1, day - 1] with the
+weekday, national holiday (国民の祝日・振替休日・国民の休日), off-day
+(weekend or holiday) and summer-season flags, so hourly arrays are joined
+to it by fancy indexing instead of building a date per row:
+
+    cal = calendar_columns(arrays["month"], arrays["day"], 2025)
+    cal["offday"]      # (n_hours,) bool
+    cal["weekday"]     # (n_hours,) 0=Mon .. 6=Sun
+
+Holidays follow the National Holiday Act as amended (Happy Monday,
+山の日, the 2019 enthronement and the 2020/2021 Olympic moves) and are
+computed for 2000-2099; the equinoxes use the standard approximation.
+The per-hour tariff band built on this table is tariff_calc.band_calendar().
+"""
+
+from __future__ import annotations
+
+import datetime
+from functools import lru_cache
+
+import numpy as np
+
+MIN_YEAR = 2000
+MAX_YEAR = 2099
+
+SUMMER_MONTHS = (7, 8, 9)  # 夏季 (tariff season)
+WEEKDAY_LABELS = ("月", "火", "水", "木", "金", "土", "日")
+
+# Holidays moved by special acts (year -> {(month, day): name}); replaces the
+# regular date of the same holiday that year
+_SPECIAL_HOLIDAYS = {
+    2019: {(5, 1): "天皇の即位の日", (10, 22): "即位礼正殿の儀の行われる日"},
+    2020: {(7, 23): "海の日", (7, 24): "スポーツの日", (8, 10): "山の日"},
+    2021: {(7, 22): "海の日", (7, 23): "スポーツの日", (8, 8): "山の日"},
+}
+_MOVED = ("海の日", "スポーツの日", "山の日")
+
+
+# ---------------------------------------------------------------------------
+# National holidays
+# ---------------------------------------------------------------------------
+
+def _nth_monday(year: int, month: int, n: int) -> datetime.date:
+    """n-th Monday of a month."""
+    first = datetime.date(year, month, 1)
+    return first + datetime.timedelta(days=(7 - first.weekday()) % 7 + 7 * (n - 1))
+
+
+def _equinox_day(year: int, base: float) -> int:
+    """Day of month of the vernal (base 20.8431) / autumnal (23.2488) equinox."""
+    return int(base + 0.242194 * (year - 1980) - (year - 1980) // 4)
+
+
+def _fixed_holidays(year: int) -> dict[datetime.date, str]:
+    """国民の祝日 of a year (before substitute / sandwiched days)."""
+    d = datetime.date
+    days = {
+        d(year, 1, 1): "元日",
+        _nth_monday(year, 1, 2): "成人の日",
+        d(year, 2, 11): "建国記念の日",
+        d(year, 3, _equinox_day(year, 20.8431)): "春分の日",
+        d(year, 4, 29): "昭和の日" if year >= 2007 else "みどりの日",
+        d(year, 5, 3): "憲法記念日",
+        d(year, 5, 5): "こどもの日",
+        d(year, 9, _equinox_day(year, 23.2488)): "秋分の日",
+        d(year, 11, 3): "文化の日",
+        d(year, 11, 23): "勤労感謝の日",
+    }
+    if year >= 2007:
+        days[d(year, 5, 4)] = "みどりの日"
+    if year >= 2020:
+        days[d(year, 2, 23)] = "天皇誕生日"
+    elif year <= 2018:
+        days[d(year, 12, 23)] = "天皇誕生日"
+    days[_nth_monday(year, 7, 3) if year >= 2003 else d(year, 7, 20)] = "海の日"
+    days[_nth_monday(year, 9, 3) if year >= 2003 else d(year, 9, 15)] = "敬老の日"
+    days[_nth_monday(year, 10, 2)] = "スポーツの日" if year >= 2020 else "体育の日"
+    if year >= 2016:
+        days[d(year, 8, 11)] = "山の日"
+
+    special = _SPECIAL_HOLIDAYS.get(year, {})
+    if any(name in _MOVED for name in special.values()):
+        days = {k: v for k, v in days.items() if v not in _MOVED}
+    days.update({d(year, m, day): name for (m, day), name in special.items()})
+    return days
+
+
+@lru_cache(maxsize=None)
+def national_holidays(year: int) -> tuple[tuple[datetime.date, str], ...]:
+    """Holidays of a year as sorted (date, name) pairs.
+
+    Adds 国民の休日 (a weekday between two holidays) and 振替休日 (the first
+    non-holiday after a holiday falling on Sunday).
+
+    Raises:
+        ValueError: if year is outside MIN_YEAR..MAX_YEAR
+    """
+    if not MIN_YEAR <= year <= MAX_YEAR:
+        raise ValueError(f"祝日の計算範囲外の年です: {year}（{MIN_YEAR}〜{MAX_YEAR}）")
+    one_day = datetime.timedelta(days=1)
+    days = _fixed_holidays(year)
+
+    for day in sorted(days):
+        between = day + one_day
+        if (between not in days and between + one_day in days
+                and between.weekday() != 6 and between.year == year):
+            days[between] = "国民の休日"
+
+    for day in sorted(days):
+        if day.weekday() == 6:
+            sub = day + one_day
+            while sub in days:
+                sub += one_day
+            if sub.year == year:
+                days[sub] = "振替休日"
+    return tuple(sorted(days.items()))
+
+
+# ---------------------------------------------------------------------------
+# Calendar table
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=None)
+def calendar_table(year: int) -> dict[str, np.ndarray]:
+    """(12, 31) calendar arrays for [month - 1, day - 1] (read-only).
+
+    Returns:
+        dict with valid (the date exists), weekday (int8, 0=Mon, -1 where
+        invalid), holiday, offday (Sat / Sun / holiday) and summer (bool)
+    """
+    holidays = national_holidays(year)
+    month = np.arange(1, 13)[:, None]
+    day = np.arange(1, 32)[None, :]
+    first = np.array([f"{year}-{m:02d}-01" for m in range(1, 13)], dtype="datetime64[D]")
+    n_days = (np.append(first[1:], np.datetime64(f"{year + 1}-01-01")) - first).astype(int)
+    valid = day <= n_days[:, None]
+
+    dates = first[:, None] + (day - 1)
+    # 1970-01-01 was a Thursday (weekday 3)
+    weekday = np.where(valid, (dates.astype(np.int64) + 3) % 7, -1).astype(np.int8)
+    holiday = np.zeros((12, 31), dtype=bool)
+    for date, _name in holidays:
+        holiday[date.month - 1, date.day - 1] = True
+
+    table = {
+        "valid": valid,
+        "weekday": weekday,
+        "holiday": holiday,
+        "offday": valid & ((weekday >= 5) | holiday),
+        "summer": valid & np.isin(month, SUMMER_MONTHS),
+    }
+    for arr in table.values():
+        arr.setflags(write=False)
+    return table
+
+
+def calendar_columns(month, day, year: int) -> dict[str, np.ndarray]:
+    """Calendar columns for each hour, joined by [month - 1, day - 1].
+
+    Args:
+        month: (n_hours,) month 1..12
+        day:   (n_hours,) day 1..31
+        year:  calendar year the (year-less) iPals profile is laid on
+
+    Returns:
+        dict of (n_hours,) arrays: weekday, holiday, offday, summer
+    """
+    table = calendar_table(year)
+    m = np.asarray(month, dtype=np.intp) - 1
+    d = np.asarray(day, dtype=np.intp) - 1
+    return {key: table[key][m, d] for key in ("weekday", "holiday", "offday", "summer")}
+
+
+def date_label(month: int, day: int, year: int | None = None) -> str:
+    """"m/d" label, with the weekday "m/d(月)" when the year is known."""
+    if year is None:
+        return f"{month}/{day}"
+    weekday = int(calendar_table(year)["weekday"][month - 1, day - 1])
+    return f"{month}/{day}({WEEKDAY_LABELS[weekday]})" if weekday >= 0 else f"{month}/{day}"
@@ -3,53 +3,210 @@ demand_calc.py - Demand cut calculation engine
 
 Calculates peak demand reduction from iPals hourly data and produces
 chart-ready 2-week window data for PP9/EP5 slides.
+
+The engine works on contiguous columnar arrays (month / day / hour /
+demand / self-consumption); peaks are found with argmax and the chart
+window is a slice. iPals hourly dicts are converted once by hourly_arrays():
+
+    arrays = hourly_arrays(hourly_rows)        # dict-list -> columns
+    result = calc_demand_cut(arrays, basic_rate_kw=1800)
+    result["peak_week_before"].values          # (336,) float array
+    result["peak_week_before"].day_labels()    # "m/d" every 24 points, else ""
+
+With a calendar year (calendar_index) the chart days carry the weekday
+("7/15(火)") and the result adds weekday / off-day (土日祝) load figures.
 """
 
 from __future__ import annotations
 
+from collections.abc import Sequence
+
+import numpy as np
+
+from proposal_generator.calendar_index import calendar_columns, date_label
+
+# iPals hourly columns (dict keys of hourly_rows)
+HOURLY_COLUMNS = ("month", "day", "hour", "demand_kw", "gen_kw", "self_consumption_kw", "surplus_kw")
+CALENDAR_COLUMNS = ("month", "day", "hour")
+DEMAND_COLUMNS = ("month", "day", "hour", "demand_kw", "self_consumption_kw")  # used by calc_demand_cut
+
+WINDOW_DAYS = 14  # chart window (7 days before the peak day, 7 days from it)
+
+
+# ---------------------------------------------------------------------------
+# Columnar input
+# ---------------------------------------------------------------------------
+
+def hourly_arrays(hourly_rows, columns=HOURLY_COLUMNS) -> dict[str, np.ndarray]:
+    """Columnar arrays from iPals hourly data (the dict-list adapter).
+
+    Accepts the list of hourly dicts used by the slides, or an already
+    columnar mapping (used as-is when the dtypes already match). Missing /
+    empty values count as 0, like float(row.get(key) or 0).
+
+    Args:
+        hourly_rows: list of hourly dicts, or dict of columns
+        columns:     columns to extract (default: all HOURLY_COLUMNS)
+
+    Returns:
+        dict of (n_hours,) arrays: month, day, hour (int64) and
+        demand_kw, gen_kw, self_consumption_kw, surplus_kw (float64)
+    """
+    if isinstance(hourly_rows, dict):
+        n = len(next(iter(hourly_rows.values()), ()))
+        source = {key: hourly_rows[key] if key in hourly_rows else np.zeros(n) for key in columns}
+    else:
+        source = {key: [row.get(key) or 0 for row in hourly_rows] for key in columns}
+
+    arrays = {}
+    for key, values in source.items():
+        dtype = np.int64 if key in CALENDAR_COLUMNS else np.float64
+        arr = np.ascontiguousarray(values, dtype=dtype)
+        if arr is not values:
+            arr.setflags(write=False)
+        arrays[key] = arr
+    return arrays
+
+
+# ---------------------------------------------------------------------------
+# Chart window
+# ---------------------------------------------------------------------------
+
+class DemandSeries(Sequence):
+    """Chart series over an hourly window with lazily formatted labels.
+
+    Behaves as a read-only list of {"label": "m/d h:00", "value": kW} dicts
+    for existing callers; charts use .values and .day_labels() so only the
+    plotted labels are ever formatted. With a year the day labels carry
+    the weekday.
+    """
+
+    __slots__ = ("values", "_month", "_day", "_hour", "_year")
+
+    def __init__(self, values: np.ndarray, month: np.ndarray, day: np.ndarray, hour: np.ndarray,
+                 year: int | None = None):
+        self.values = values
+        self._month = month
+        self._day = day
+        self._hour = hour
+        self._year = year
+
+    def label(self, i: int) -> str:
+        """"m/d h:00" label of point i."""
+        return f"{self._month[i]}/{self._day[i]} {self._hour[i]}:00"
+
+    def day_labels(self, step: int = 24) -> list[str]:
+        """Category labels: "m/d" ("m/d(曜)" with a year) every step points, "" elsewhere."""
+        labels = [""] * len(self.values)
+        for i in range(0, len(labels), step):
+            labels[i] = date_label(int(self._month[i]), int(self._day[i]), self._year)
+        return labels
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return {"label": self.label(i), "value": float(self.values[i])}
+
+    def __repr__(self) -> str:
+        return f"DemandSeries({len(self)} points)"
+
+
+def peak_window(hour: np.ndarray, peak_idx: int, n_days: int = WINDOW_DAYS) -> slice:
+    """Slice of the n_days window centred on the day of peak_idx.
+
+    7 days before the peak day and 7 days from it (inclusive), shifted to stay
+    inside the data when the peak is near either end.
+    """
+    n = len(hour)
+    half_window = (n_days // 2) * 24
+
+    # Start of the peak day (hour 1)
+    peak_day_start = max(0, peak_idx - (int(hour[peak_idx]) - 1))
+
+    window_start = peak_day_start - half_window
+    window_end = peak_day_start + half_window + 24  # +24 for peak day itself
+
+    # Clamp to data bounds
+    if window_start < 0:
+        window_start = 0
+        window_end = min(n, n_days * 24)
+    if window_end > n:
+        window_end = n
+        window_start = max(0, n - n_days * 24)
+    return slice(window_start, window_end)
+
+
+def _select_peak_weeks(
+    arrays: dict[str, np.ndarray], peak_idx: int, year: int | None = None
+) -> tuple[DemandSeries, DemandSeries]:
+    """Select 14-day (336-hour) window centered on the peak demand hour.
+
+    Returns (before_window, after_window) where:
+      - before_window: raw demand values for chart
+      - after_window: net demand (demand - self_consumption) for chart
+    """
+    window = peak_window(arrays["hour"], peak_idx)
+    demand = arrays["demand_kw"][window]
+    net = np.maximum(demand - arrays["self_consumption_kw"][window], 0.0)
+    calendar = (arrays["month"][window], arrays["day"][window], arrays["hour"][window])
+    return DemandSeries(demand, *calendar, year), DemandSeries(net, *calendar, year)
+
+
+# ---------------------------------------------------------------------------
+# Demand cut
+# ---------------------------------------------------------------------------
+
+def _peak(values: np.ndarray) -> tuple[float, int]:
+    """(peak, first index of the peak); (0.0, 0) when nothing is positive."""
+    idx = int(np.argmax(values))
+    peak = float(values[idx])
+    return (peak, idx) if peak > 0 else (0.0, 0)
+
 
 def calc_demand_cut(
-    hourly_rows: list[dict],
+    hourly_rows,
     basic_rate_kw: float = 0.0,
     power_factor_pct: int = 85,
+    year: int | None = None,
 ) -> dict:
     """Calculate demand cut metrics from iPals hourly data.
 
     Args:
         hourly_rows: list of dicts with keys:
             month, day, hour, demand_kw, gen_kw, self_consumption_kw, surplus_kw
+            or the columnar dict from hourly_arrays()
         basic_rate_kw: basic charge unit price (yen/kW/month) from electricity master
         power_factor_pct: power factor percentage (default 85)
+        year: calendar year the profile is laid on (weekdays / holidays);
+            None treats every day alike
 
     Returns:
         dict with peak values, savings, and chart data
+        (peak_week_before / peak_week_after are DemandSeries); with a year
+        also peak_before_date, peak_before_offday and weekday / offday
+        peak and average demand (before PV)
     """
-    if not hourly_rows:
+    if hourly_rows is None or len(hourly_rows) == 0:
+        return {}
+    arrays = hourly_arrays(hourly_rows, DEMAND_COLUMNS)
+    if not len(arrays["demand_kw"]):
         return {}
 
     # --- Peak detection ---
-    peak_before_kw = 0.0
-    peak_before_idx = 0
-    peak_after_kw = 0.0
-    peak_after_idx = 0
-
-    for i, row in enumerate(hourly_rows):
-        demand = float(row.get("demand_kw", 0) or 0)
-        self_c = float(row.get("self_consumption_kw", 0) or 0)
-        net_demand = demand - self_c
-
-        if demand > peak_before_kw:
-            peak_before_kw = demand
-            peak_before_idx = i
-
-        if net_demand > peak_after_kw:
-            peak_after_kw = net_demand
-            peak_after_idx = i
+    demand = arrays["demand_kw"]
+    net_demand = demand - arrays["self_consumption_kw"]
+    peak_before_kw, peak_before_idx = _peak(demand)
+    peak_after_kw, peak_after_idx = _peak(net_demand)
 
     demand_cut_kw = peak_before_kw - peak_after_kw
 
-    peak_before_month = hourly_rows[peak_before_idx].get("month", 0)
-    peak_after_month = hourly_rows[peak_after_idx].get("month", 0)
+    peak_before_month = int(arrays["month"][peak_before_idx])
+    peak_after_month = int(arrays["month"][peak_after_idx])
 
     # --- Basic fee calculation ---
     # Formula: basic_rate * peak_kw * (185 - PF%) / 100
@@ -61,11 +218,9 @@ def calc_demand_cut(
     annual_basic_saving = monthly_basic_saving * 12
 
     # --- 2-week chart window (centered on peak_before day) ---
-    peak_week_before, peak_week_after = _select_peak_weeks(
-        hourly_rows, peak_before_idx
-    )
+    peak_week_before, peak_week_after = _select_peak_weeks(arrays, peak_before_idx, year)
 
-    return {
+    result = {
         "peak_before_kw": round(peak_before_kw, 1),
         "peak_after_kw": round(peak_after_kw, 1),
         "demand_cut_kw": round(demand_cut_kw, 1),
@@ -81,46 +236,143 @@ def calc_demand_cut(
         "peak_week_before": peak_week_before,
         "peak_week_after": peak_week_after,
     }
+    if year is not None:
+        result.update(_calendar_stats(arrays, demand, peak_before_idx, year))
+    return result
 
 
-def _select_peak_weeks(
-    hourly_rows: list[dict], peak_idx: int
-) -> tuple[list[dict], list[dict]]:
-    """Select 14-day (336-hour) window centered on the peak demand hour.
+def _calendar_stats(arrays: dict[str, np.ndarray], demand: np.ndarray, peak_idx: int, year: int) -> dict:
+    """Peak date and weekday / off-day (土日祝) demand figures."""
+    offday = calendar_columns(arrays["month"], arrays["day"], year)["offday"]
+    weekday_demand, offday_demand = demand[~offday], demand[offday]
+    return {
+        "peak_before_date": date_label(int(arrays["month"][peak_idx]), int(arrays["day"][peak_idx]), year),
+        "peak_before_offday": bool(offday[peak_idx]),
+        "weekday_peak_kw": round(float(weekday_demand.max(initial=0.0)), 1),
+        "offday_peak_kw": round(float(offday_demand.max(initial=0.0)), 1),
+        "weekday_avg_kw": round(float(weekday_demand.mean()), 1) if len(weekday_demand) else 0.0,
+        "offday_avg_kw": round(float(offday_demand.mean()), 1) if len(offday_demand) else 0.0,
+    }
 
-    Returns (before_window, after_window) where:
-      - before_window: raw demand values for chart
-      - after_window: net demand (demand - self_consumption) for chart
+
+# ---------------------------------------------------------------------------
+# Monthly max demand and 12-month ratchet billing
+# ---------------------------------------------------------------------------
+#
+# High-voltage basic charges (実量制) bill each month at the contract demand
+#   = max(最大需要電力 of the current month and the previous 11 months)
+# so a PV-reduced peak only lowers the bill once every pre-PV month with a
+# higher peak has left the 12-month window. iPals data is hourly, so the
+# hourly average kW stands in for the 30-minute demand.
+
+RATCHET_MONTHS = 12
+DEFAULT_START_MONTH = 4  # PV operation starts in April (fiscal year)
+
+
+def monthly_max_demand(hourly_rows) -> dict[str, np.ndarray]:
+    """Highest demand per calendar month, before and after PV.
+
+    Returns:
+        dict of (12,) arrays indexed by month - 1: peak_before_kw,
+        peak_after_kw (demand - self-consumption), has_data (bool)
     """
-    n = len(hourly_rows)
-    half_window = 7 * 24  # 7 days in hours
+    arrays = hourly_arrays(hourly_rows, DEMAND_COLUMNS)
+    month_idx = arrays["month"] - 1
+    valid = (month_idx >= 0) & (month_idx < 12)
+    month_idx = month_idx[valid]
+    demand = arrays["demand_kw"][valid]
+    net = demand - arrays["self_consumption_kw"][valid]
 
-    # Find the start of the peak day (hour 1)
-    peak_row = hourly_rows[peak_idx]
-    peak_day_start = peak_idx - (int(peak_row.get("hour", 1)) - 1)
-    peak_day_start = max(0, peak_day_start)
+    peak_before = np.zeros(12)
+    peak_after = np.zeros(12)
+    np.maximum.at(peak_before, month_idx, demand)
+    np.maximum.at(peak_after, month_idx, net)
+    has_data = np.bincount(month_idx, minlength=12) > 0
+    return {"peak_before_kw": peak_before, "peak_after_kw": peak_after, "has_data": has_data}
 
-    # Center window: 7 days before peak day, 7 days after (inclusive of peak day)
-    window_start = peak_day_start - half_window
-    window_end = peak_day_start + half_window + 24  # +24 for peak day itself
 
-    # Clamp to data bounds
-    if window_start < 0:
-        window_start = 0
-        window_end = min(n, 14 * 24)
-    if window_end > n:
-        window_end = n
-        window_start = max(0, n - 14 * 24)
+def ratchet_demand(monthly_peak_kw: np.ndarray, prior_peak_kw: np.ndarray | None = None) -> np.ndarray:
+    """Billing demand per month under the 12-month ratchet (rolling max).
 
-    window = hourly_rows[window_start:window_end]
+    Args:
+        monthly_peak_kw: (n_months,) peaks in billing order
+        prior_peak_kw:   (11+,) peaks of the months just before (oldest first);
+                         None = steady state (the same profile the year before)
+
+    Returns:
+        (n_months,) billing demand (kW)
+    """
+    monthly_peak_kw = np.asarray(monthly_peak_kw, dtype=float)
+    if prior_peak_kw is None:
+        prior_peak_kw = monthly_peak_kw
+    history = np.asarray(prior_peak_kw, dtype=float)[-(RATCHET_MONTHS - 1):]
+    sequence = np.concatenate([history, monthly_peak_kw])
+    windows = np.lib.stride_tricks.sliding_window_view(sequence, len(history) + 1)
+    return windows.max(axis=1)[-len(monthly_peak_kw):]
 
-    before_window = []
-    after_window = []
-    for row in window:
-        demand = float(row.get("demand_kw", 0) or 0)
-        self_c = float(row.get("self_consumption_kw", 0) or 0)
-        label = f"{int(row.get('month', 0))}/{int(row.get('day', 0))} {int(row.get('hour', 0))}:00"
-        before_window.append({"label": label, "value": demand})
-        after_window.append({"label": label, "value": max(0, demand - self_c)})
 
-    return before_window, after_window
+def calc_ratchet_billing(
+    hourly_rows,
+    basic_rate_kw: float = 0.0,
+    power_factor_pct: int = 85,
+    start_month: int = DEFAULT_START_MONTH,
+    prior_peak_kw=None,
+) -> dict:
+    """Month-by-month basic charge before / after PV with the 12-month ratchet.
+
+    Year 1 after PV still carries the pre-PV peaks of the previous 11 months;
+    from year 2 on both sides are in steady state (rolling max of their own
+    profile), which equals the annual-peak x 12 estimate of calc_demand_cut.
+
+    Args:
+        hourly_rows:      hourly dicts or hourly_arrays() columns
+        basic_rate_kw:    basic charge unit price (yen/kW/month)
+        power_factor_pct: power factor percentage (default 85)
+        start_month:      first month of PV operation (1-12)
+        prior_peak_kw:    12 actual monthly peaks before PV (calendar order,
+                          Jan..Dec) from past bills; None = the iPals demand
+
+    Returns:
+        dict of (12,) arrays in billing order from start_month: month,
+        peak_before_kw, peak_after_kw, billing_kw_before, billing_kw_after_y1,
+        billing_kw_after, basic_before, basic_after_y1, basic_after,
+        saving_y1, saving (yen/month, rounded), plus annual_basic_before,
+        annual_saving_y1, annual_saving, ratchet_loss (year-1 shortfall) and
+        full_saving_month (first month with the steady-state saving, or None)
+    """
+    peaks = monthly_max_demand(hourly_rows)
+    order = (np.arange(12) + (int(start_month) - 1)) % 12
+    before = peaks["peak_before_kw"][order]
+    after = peaks["peak_after_kw"][order]
+    prior = before if prior_peak_kw is None else np.asarray(prior_peak_kw, dtype=float)[order]
+
+    billing_before = ratchet_demand(before, prior)
+    billing_after_y1 = ratchet_demand(after, prior)
+    billing_after = ratchet_demand(after)
+
+    unit = basic_rate_kw * (185 - power_factor_pct) / 100  # yen per billing kW
+    basic_before = billing_before * unit
+    basic_after_y1 = billing_after_y1 * unit
+    basic_after = billing_after * unit
+    saving_y1 = basic_before - basic_after_y1
+    saving = basic_before - basic_after
+
+    full = np.flatnonzero(np.isclose(billing_after_y1, billing_after))
+    return {
+        "month": order + 1,
+        "peak_before_kw": before,
+        "peak_after_kw": after,
+        "billing_kw_before": billing_before,
+        "billing_kw_after_y1": billing_after_y1,
+        "billing_kw_after": billing_after,
+        "basic_before": np.rint(basic_before),
+        "basic_after_y1": np.rint(basic_after_y1),
+        "basic_after": np.rint(basic_after),
+        "saving_y1": np.rint(saving_y1),
+        "saving": np.rint(saving),
+        "annual_basic_before": round(float(basic_before.sum())),
+        "annual_saving_y1": round(float(saving_y1.sum())),
+        "annual_saving": round(float(saving.sum())),
+        "ratchet_loss": round(float(saving.sum() - saving_y1.sum())),
+        "full_saving_month": int(order[full[0]] + 1) if len(full) else None,
+    }
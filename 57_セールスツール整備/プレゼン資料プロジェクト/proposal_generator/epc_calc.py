@@ -0,0 +1,405 @@
+"""
+epc_calc.py - EPC (outright purchase) investor-returns engine
+
+Evaluates a customer-owned system from the buyer's side, after corporate tax:
+
+  - Statutory depreciation over the 17-year useful life (太陽光発電設備):
+    定率法 (200% declining balance with the guarantee / revised-rate switch)
+    or 定額法, rounded down to the yen and stopping at the 1-yen memo value
+  - Immediate-expensing options: 即時償却, 特別償却 (extra year-1
+    depreciation) and 税額控除 (tax credit on the acquisition cost)
+  - Corporate tax shield of depreciation, O&M and 償却資産税
+  - O&M escalation, IRR / NPV, simple and discounted payback
+
+Key assumptions:
+  - Investment = selling price - subsidy at t=0; the subsidy is 圧縮記帳,
+    so the depreciable base (and 償却資産税 base) is the net investment
+  - The buyer has enough other taxable income to use the shield every year
+    (taxable losses of the project reduce tax elsewhere; 税額控除 cap ignored)
+  - Savings follow the deal's generation profile (generation_profile.py),
+    the same per-year energy as the EP4 table and the PPA calc
+
+Per-(price, tax regime) schedules are cached as read-only arrays, and so is
+the full result, so the EP4 slide and the Streamlit UI read the same object:
+
+    econ = epc_economics_from_data(customer_data)
+    econ["payback_years"], econ["irr"], econ["after_tax_cashflow"]
+"""
+
+from __future__ import annotations
+
+import functools
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+from proposal_generator.generation_profile import DEGRADATION_RATE, deal_profile
+from proposal_generator.ppa_calc import (
+    DEFAULT_MAINTENANCE_YEN_PER_KW,
+    DEPRECIATION_RATE_R,
+    DEPRECIATION_TAX_RATE,
+)
+from proposal_generator.ppa_engine import (
+    depreciation_tax_arrays,
+    npv_arrays,
+    solve_irr_arrays,
+    yield_factors,
+)
+
+
+# ---------------------------------------------------------------------------
+# Statutory constants (減価償却資産の耐用年数等に関する省令 別表)
+# ---------------------------------------------------------------------------
+
+USEFUL_LIFE_YEARS = 17                  # 太陽光発電設備 法定耐用年数
+STRAIGHT_LINE_RATE = 0.059              # 定額法 償却率 (17年)
+DECLINING_BALANCE_RATE = 0.118          # 200%定率法 償却率 (17年)
+REVISED_RATE = 0.125                    # 改定償却率
+GUARANTEE_RATE = 0.04038                # 保証率 (17年)
+MEMO_VALUE = 1                          # 備忘価額 (円)
+
+METHOD_DECLINING_BALANCE = "declining_balance"
+METHOD_STRAIGHT_LINE = "straight_line"
+
+DEFAULT_CORPORATE_TAX_RATE = 0.3062     # 法人実効税率（概算）
+DEFAULT_DISCOUNT_RATE = 0.03            # NPV・割引回収年の割引率
+DEFAULT_ANALYSIS_YEARS = 20             # 試算期間 (EP4 table / 20年間削減総額)
+DEFAULT_BASIC_RATE_KW = 1500.0          # 基本料金 (円/kW/月) without a contract rate (typical high voltage)
+
+
+# ---------------------------------------------------------------------------
+# Tax regimes
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class TaxRegime:
+    """Depreciation method plus an optional year-1 incentive."""
+
+    name: str
+    method: str = METHOD_DECLINING_BALANCE
+    special_rate: float = 0.0   # 特別償却 as a fraction of cost (1.0 = 即時償却)
+    credit_rate: float = 0.0    # 税額控除 as a fraction of cost (year 1)
+
+
+TAX_REGIMES: dict[str, TaxRegime] = {
+    regime.name: regime for regime in (
+        TaxRegime("定率法（法定耐用年数17年）"),
+        TaxRegime("定額法（法定耐用年数17年）", method=METHOD_STRAIGHT_LINE),
+        TaxRegime("即時償却（中小企業経営強化税制）", special_rate=1.0),
+        TaxRegime("特別償却30%（中小企業投資促進税制）", special_rate=0.30),
+        TaxRegime("税額控除10%（中小企業経営強化税制）", credit_rate=0.10),
+        TaxRegime("税額控除7%（中小企業投資促進税制）", credit_rate=0.07),
+    )
+}
+DEFAULT_TAX_REGIME = "定率法（法定耐用年数17年）"
+
+
+def get_tax_regime(name: str | None) -> TaxRegime:
+    """Registered regime by name (None / "" -> default).
+
+    Raises:
+        ValueError: for an unknown name
+    """
+    try:
+        return TAX_REGIMES[name or DEFAULT_TAX_REGIME]
+    except KeyError:
+        raise ValueError(f"unknown tax regime: {name!r}") from None
+
+
+# ---------------------------------------------------------------------------
+# Depreciation / tax schedules (cached per (price, tax regime))
+# ---------------------------------------------------------------------------
+
+def _read_only(values) -> np.ndarray:
+    arr = np.ascontiguousarray(values, dtype=float)
+    arr.setflags(write=False)
+    return arr
+
+
+@functools.lru_cache(maxsize=512)
+def depreciation_schedule(cost: float, regime_name: str, n_years: int) -> np.ndarray:
+    """Yearly tax depreciation of an asset bought at the start of year 1.
+
+    定率法: book value x 0.118 until that falls below cost x 保証率, then the
+    book value at the switch x 改定償却率 every year. 定額法: cost x 0.059.
+    特別償却 is added in year 1. Each year is rounded down to the yen, the
+    book value never goes below the 1-yen memo value, and the last year of
+    the useful life writes the remainder down to it.
+
+    Args:
+        cost:        depreciable base (yen)
+        regime_name: TAX_REGIMES key
+        n_years:     number of years (index 0 = year 1)
+
+    Returns:
+        (n_years,) read-only float array
+    """
+    regime = get_tax_regime(regime_name)
+    schedule = np.zeros(n_years)
+    book = float(cost)
+    revised_base = None
+    for i in range(n_years):
+        if book <= MEMO_VALUE:
+            break
+        if regime.method == METHOD_STRAIGHT_LINE:
+            amount = cost * STRAIGHT_LINE_RATE
+        else:
+            if revised_base is None and book * DECLINING_BALANCE_RATE < cost * GUARANTEE_RATE:
+                revised_base = book
+            amount = (revised_base * REVISED_RATE if revised_base is not None
+                      else book * DECLINING_BALANCE_RATE)
+        if i == 0:
+            amount += cost * regime.special_rate
+        if i == USEFUL_LIFE_YEARS - 1:
+            amount = book  # final year: down to the memo value (rounding remainder)
+        amount = min(math.floor(amount), book - MEMO_VALUE)
+        schedule[i] = amount
+        book -= amount
+    return _read_only(schedule)
+
+
+@functools.lru_cache(maxsize=512)
+def _tax_schedule_cached(
+    cost: float,
+    regime_name: str,
+    corporate_tax_rate: float,
+    n_years: int,
+) -> dict[str, np.ndarray]:
+    """Per-(price, tax regime) rows: depreciation, book value, 償却資産税, shield."""
+    regime = get_tax_regime(regime_name)
+    depreciation = depreciation_schedule(cost, regime_name, n_years)
+    property_tax = depreciation_tax_arrays(cost, n_years, DEPRECIATION_RATE_R, DEPRECIATION_TAX_RATE)[0]
+    tax_credit = np.zeros(n_years)
+    if n_years:
+        tax_credit[0] = math.floor(cost * regime.credit_rate)
+    return {
+        "depreciation": depreciation,
+        "book_value": _read_only(cost - np.cumsum(depreciation)),
+        "property_tax": _read_only(property_tax),
+        "tax_credit": _read_only(tax_credit),
+        "depreciation_shield": _read_only(depreciation * corporate_tax_rate),
+    }
+
+
+def tax_schedule(
+    cost: float,
+    tax_regime: str = DEFAULT_TAX_REGIME,
+    corporate_tax_rate: float = DEFAULT_CORPORATE_TAX_RATE,
+    n_years: int = DEFAULT_ANALYSIS_YEARS,
+) -> dict[str, np.ndarray]:
+    """Depreciation / 償却資産税 / tax-credit rows for one asset (cached, read-only).
+
+    Returns:
+        dict of (n_years,) arrays: depreciation, book_value (end of year),
+        property_tax (償却資産税), tax_credit, depreciation_shield
+    """
+    return _tax_schedule_cached(
+        float(max(cost, 0.0)), get_tax_regime(tax_regime).name, float(corporate_tax_rate), int(n_years),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Investor returns
+# ---------------------------------------------------------------------------
+
+def _payback_years(investment: float, cashflows: np.ndarray) -> float | None:
+    """Fractional years until cumulative cashflow recovers the investment."""
+    if investment <= 0:
+        return 0.0
+    cumulative = np.cumsum(cashflows) - investment
+    reached = np.flatnonzero(cumulative >= 0)
+    if not len(reached):
+        return None
+    t = int(reached[0])
+    before = cumulative[t - 1] if t else -investment
+    return t + float(-before / cashflows[t])
+
+
+@functools.lru_cache(maxsize=256)
+def _economics_cached(
+    selling_price: float,
+    subsidy_amount: float,
+    self_consumption_kwh: float,
+    unit_price: float,
+    demand_saving: float,
+    annual_om_cost: float,
+    om_escalation: float,
+    regime_name: str,
+    corporate_tax_rate: float,
+    discount_rate: float,
+    n_years: int,
+    yield_profile: tuple[float, ...] | None,
+) -> dict:
+    investment = max(selling_price - subsidy_amount, 0.0)
+    sched = _tax_schedule_cached(investment, regime_name, corporate_tax_rate, n_years)
+
+    factors = yield_factors(DEGRADATION_RATE, n_years, yield_profile)[0]
+    energy = self_consumption_kwh * factors
+    usage_saving = energy * unit_price
+    demand = np.full(n_years, demand_saving)
+    saving = usage_saving + demand
+    om_cost = annual_om_cost * (1 + om_escalation) ** np.arange(n_years)
+
+    pre_tax = saving - om_cost - sched["property_tax"]
+    taxable = pre_tax - sched["depreciation"]
+    corporate_tax = taxable * corporate_tax_rate - sched["tax_credit"]
+    after_tax = pre_tax - corporate_tax
+    tax_shield = sched["depreciation_shield"] + sched["tax_credit"]
+
+    t = np.arange(1, n_years + 1)
+    discounted = after_tax / (1 + discount_rate) ** t
+
+    rows = np.vstack([
+        np.concatenate(([-investment], after_tax)),
+        np.concatenate(([-investment], pre_tax)),
+    ])
+    irr_res = solve_irr_arrays(rows)
+    irr_rate = [float(r) if ok else None for r, ok in zip(irr_res["rate"], irr_res["converged"])]
+
+    arrays = {
+        "year": t,
+        "self_consumption_kwh": energy,
+        "usage_saving": usage_saving,
+        "demand_saving": demand,
+        "saving": saving,
+        "om_cost": om_cost,
+        "property_tax": sched["property_tax"],
+        "depreciation": sched["depreciation"],
+        "book_value": sched["book_value"],
+        "taxable_income": taxable,
+        "corporate_tax": corporate_tax,
+        "tax_shield": tax_shield,
+        "pre_tax_cashflow": pre_tax,
+        "after_tax_cashflow": after_tax,
+        "cumulative_cashflow": np.cumsum(after_tax) - investment,
+        "discounted_cashflow": discounted,
+        "cumulative_discounted": np.cumsum(discounted) - investment,
+    }
+    result = {name: _read_only(values) for name, values in arrays.items()}
+    result.update({
+        "investment": investment,
+        "tax_regime": regime_name,
+        "corporate_tax_rate": corporate_tax_rate,
+        "discount_rate": discount_rate,
+        "n_years": n_years,
+        "irr": irr_rate[0],
+        "pre_tax_irr": irr_rate[1],
+        "npv": round(float(npv_arrays(discount_rate, after_tax[None, :])[0]) - investment),
+        "payback_years": _payback_years(investment, after_tax),
+        "discounted_payback_years": _payback_years(investment, discounted),
+        "simple_payback_years": investment / saving[0] if n_years and saving[0] > 0 else None,
+        "total_tax_shield": round(float(tax_shield.sum())),
+        "total_after_tax_cashflow": round(float(after_tax.sum())),
+    })
+    return result
+
+
+def calc_epc_economics(
+    selling_price: float,
+    subsidy_amount: float = 0.0,
+    self_consumption_kwh: float = 0.0,
+    unit_price: float = 0.0,
+    demand_saving: float = 0.0,
+    annual_om_cost: float = 0.0,
+    om_escalation: float = 0.0,
+    tax_regime: str = DEFAULT_TAX_REGIME,
+    corporate_tax_rate: float = DEFAULT_CORPORATE_TAX_RATE,
+    discount_rate: float = DEFAULT_DISCOUNT_RATE,
+    n_years: int = DEFAULT_ANALYSIS_YEARS,
+    yield_profile=None,
+) -> dict:
+    """After-tax investor returns of an EPC purchase (cached).
+
+    saving[y]     = self_consumption_kwh * profile[y] * unit_price + demand_saving
+    pre_tax[y]    = saving - O&M * (1 + om_escalation)^(y-1) - 償却資産税
+    tax[y]        = (pre_tax - depreciation) * corporate_tax_rate - 税額控除
+    after_tax[y]  = pre_tax - tax
+
+    Args:
+        selling_price:        EPC selling price (yen)
+        subsidy_amount:       subsidy (yen), deducted from the investment (圧縮記帳)
+        self_consumption_kwh: year-1 self-consumed energy (kWh)
+        unit_price:           avoided energy charge (yen/kWh)
+        demand_saving:        avoided basic charge per year (yen)
+        annual_om_cost:       year-1 O&M (yen)
+        om_escalation:        O&M growth per year (0.01 = +1%/yr)
+        tax_regime:           TAX_REGIMES key
+        corporate_tax_rate:   effective corporate tax rate
+        discount_rate:        rate for NPV and discounted payback
+        n_years:              analysis horizon
+        yield_profile:        per-year generation multipliers (None = 0.5%/yr decay)
+
+    Returns:
+        dict of (n_years,) read-only arrays (saving, om_cost, property_tax,
+        depreciation, book_value, taxable_income, corporate_tax, tax_shield,
+        pre_tax_cashflow, after_tax_cashflow, cumulative_cashflow,
+        discounted_cashflow, cumulative_discounted, ...) plus investment, irr,
+        pre_tax_irr (None unless converged), npv, payback_years,
+        discounted_payback_years (None if not recovered within n_years),
+        simple_payback_years, total_tax_shield. The dict is shared between
+        callers; treat it as read-only.
+    """
+    n_years = int(n_years)
+    if yield_profile is not None:
+        yield_profile = tuple(float(v) for v in np.asarray(yield_profile, dtype=float).ravel()[:n_years])
+    return _economics_cached(
+        float(selling_price), float(subsidy_amount), float(self_consumption_kwh), float(unit_price),
+        float(demand_saving), float(annual_om_cost), float(om_escalation),
+        get_tax_regime(tax_regime).name, float(corporate_tax_rate), float(discount_rate),
+        n_years, yield_profile,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Deal-data adapter (EP4 / app)
+# ---------------------------------------------------------------------------
+
+def epc_inputs(data: dict) -> dict:
+    """calc_epc_economics() keyword arguments from a customer_data dict.
+
+    The usage saving is valued at data["pv_unit_price"] (time-of-use value of
+    a self-consumed kWh, tariff_calc) when set, else at the average unit price
+    annual_cost / annual_kwh; the basic charge for the demand reduction is
+    data["basic_rate_kw"] (the 契約電力マスタ "basic" of the contract, set by
+    the app), else DEFAULT_BASIC_RATE_KW. O&M falls back to
+    system_capacity_kw x DEFAULT_MAINTENANCE_YEN_PER_KW.
+    """
+    annual_cost = float(data.get("annual_cost") or 0)
+    annual_kwh = float(data.get("annual_kwh", 0) or 0)
+    avg_unit_price = annual_cost / annual_kwh if annual_cost and annual_kwh > 0 else 0.0
+    unit_price = float(data.get("pv_unit_price") or 0) or avg_unit_price
+
+    basic_rate_kw = float(data.get("basic_rate_kw", 0) or 0) or DEFAULT_BASIC_RATE_KW
+    demand_kw = float(data.get("demand_reduction_kw", 0) or 0)
+
+    annual_om_cost = float(data.get("annual_om_cost", 0) or 0)
+    system_kw = float(data.get("system_capacity_kw", 0) or 0)
+    if annual_om_cost <= 0 and system_kw > 0:
+        annual_om_cost = system_kw * DEFAULT_MAINTENANCE_YEN_PER_KW
+
+    n_years = max(int(data.get("contract_years", DEFAULT_ANALYSIS_YEARS) or DEFAULT_ANALYSIS_YEARS), 1)
+    corporate_tax_rate = data.get("corporate_tax_rate")
+    discount_rate = data.get("epc_discount_rate")
+    return {
+        "selling_price": float(data.get("selling_price", 0) or 0),
+        "subsidy_amount": float(data.get("subsidy_amount", 0) or 0),
+        "self_consumption_kwh": float(data.get("self_consumption_kwh", 0) or 0),
+        "unit_price": unit_price,
+        "demand_saving": demand_kw * basic_rate_kw * 12 if demand_kw > 0 else 0.0,
+        "annual_om_cost": annual_om_cost,
+        "om_escalation": float(data.get("om_escalation", 0) or 0),
+        "tax_regime": data.get("epc_tax_regime") or DEFAULT_TAX_REGIME,
+        "corporate_tax_rate": DEFAULT_CORPORATE_TAX_RATE if corporate_tax_rate is None else float(corporate_tax_rate),
+        "discount_rate": DEFAULT_DISCOUNT_RATE if discount_rate is None else float(discount_rate),
+        "n_years": n_years,
+        "yield_profile": deal_profile(data, n_years),
+    }
+
+
+def epc_economics_from_data(data: dict) -> dict | None:
+    """calc_epc_economics() for a deal; None without a selling price."""
+    inputs = epc_inputs(data)
+    if inputs["selling_price"] <= 0:
+        return None
+    return calc_epc_economics(**inputs)
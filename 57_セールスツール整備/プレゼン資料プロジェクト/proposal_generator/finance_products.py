@@ -0,0 +1,241 @@
+"""
+finance_products.py - Declarative finance-product registry
+
+Lessor / bank conditions live in finance_products.yaml (finance type, rate,
+re-lease ratio, revenue share, fire insurance, depreciation tax, terms).
+This module loads them once and compiles them into array form so the PPA
+calculations never branch on company names:
+
+    product = get_finance_product("みずほリース")
+    product.release_ratio                      # 0.1
+
+    sched = finance_schedule_arrays(
+        company=["シーエナジー", "群馬銀行"], principal=[7e7, 7e7],
+        selling_price=8e7, rate_pct=6.0, term=15, n_years=20,
+    )
+    sched["payment"]                           # (2, 20) yearly finance payment
+
+Companies that are not registered use the "defaults" block (lease at the
+rate entered on screen, no extras).
+"""
+
+from __future__ import annotations
+
+import functools
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from proposal_generator.ppa_engine import (
+    broadcast_scenarios,
+    depreciation_tax_arrays,
+    fire_insurance_arrays,
+    loan_schedule_arrays,
+    pmt_arrays,
+)
+
+FINANCE_PRODUCTS_PATH = Path(__file__).resolve().parent / "finance_products.yaml"
+
+FINANCE_TYPE_LEASE = "lease"
+FINANCE_TYPE_LOAN = "loan"
+FINANCE_TYPES = (FINANCE_TYPE_LEASE, FINANCE_TYPE_LOAN)
+
+
+# ---------------------------------------------------------------------------
+# Product definitions
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class FinanceProduct:
+    """One lessor / bank product as declared in finance_products.yaml."""
+
+    name: str
+    finance_type: str = FINANCE_TYPE_LEASE
+    rate: float | None = None                # None -> rate entered on screen
+    rate_label: str = ""
+    release_ratio: float = 0.0               # re-lease after the term (lease only)
+    revenue_share_rate: float = 0.0          # post-term share of (revenue - O&M)
+    fire_insurance_per_million: float = 0.0  # 0 -> no fire insurance
+    depreciation_rate_r: float | None = None  # None -> no depreciation tax
+    depreciation_tax_rate: float = 0.0
+    min_term: int = 10
+    max_term: int = 20
+
+    @property
+    def is_loan(self) -> bool:
+        return self.finance_type == FINANCE_TYPE_LOAN
+
+    @property
+    def has_depreciation_tax(self) -> bool:
+        return self.depreciation_rate_r is not None
+
+    @property
+    def terms(self) -> range:
+        """Allowed finance terms (years)."""
+        return range(self.min_term, self.max_term + 1)
+
+    def effective_rate(self, rate_pct: float) -> float:
+        """Product rate, or the on-screen rate (%) when the product has none."""
+        return self.rate if self.rate is not None else rate_pct / 100.0
+
+
+def _parse_product(name: str, spec: dict, defaults: dict) -> FinanceProduct:
+    merged = {**defaults, **(spec or {})}
+    finance_type = merged["type"]
+    if finance_type not in FINANCE_TYPES:
+        raise ValueError(f"{name}: type must be one of {FINANCE_TYPES}, got {finance_type!r}")
+    if merged["release_ratio"] and finance_type != FINANCE_TYPE_LEASE:
+        raise ValueError(f"{name}: release_ratio applies to lease products only")
+    min_term, max_term = (int(t) for t in merged["terms"])
+    dep = merged["depreciation_tax"]
+    return FinanceProduct(
+        name=name,
+        finance_type=finance_type,
+        rate=None if merged["rate"] is None else float(merged["rate"]),
+        rate_label=merged["rate_label"] or "",
+        release_ratio=float(merged["release_ratio"]),
+        revenue_share_rate=float(merged["revenue_share"]),
+        fire_insurance_per_million=float(merged["fire_insurance_per_million"]),
+        depreciation_rate_r=None if dep is None else float(dep["rate_r"]),
+        depreciation_tax_rate=0.0 if dep is None else float(dep["tax_rate"]),
+        min_term=min_term,
+        max_term=max_term,
+    )
+
+
+@functools.lru_cache(maxsize=8)
+def _load_registry(path: str) -> tuple[FinanceProduct, dict[str, FinanceProduct]]:
+    with open(path, encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    defaults = data["defaults"]
+    default_product = _parse_product("", {}, defaults)
+    products = {
+        name: _parse_product(name, spec, defaults)
+        for name, spec in (data.get("products") or {}).items()
+    }
+    return default_product, products
+
+
+def load_finance_products(path: Path | str = FINANCE_PRODUCTS_PATH) -> dict[str, FinanceProduct]:
+    """Registered products by company name (parsed once per file)."""
+    return dict(_load_registry(str(path))[1])
+
+
+def get_finance_product(company: str, path: Path | str = FINANCE_PRODUCTS_PATH) -> FinanceProduct:
+    """Product for a company; unregistered names get the defaults block."""
+    default_product, products = _load_registry(str(path))
+    product = products.get(company)
+    if product is None:
+        product = replace(default_product, name=company or "")
+    return product
+
+
+# ---------------------------------------------------------------------------
+# Compiled (array) form
+# ---------------------------------------------------------------------------
+
+@functools.lru_cache(maxsize=256)
+def compile_products(companies: tuple[str, ...], path: str = str(FINANCE_PRODUCTS_PATH)) -> dict[str, np.ndarray]:
+    """Product attributes as arrays aligned with `companies` (cached per tuple).
+
+    Returns:
+        dict of 1-D arrays: is_loan, rate (NaN -> on-screen rate),
+        release_ratio, revenue_share_rate, fire_insurance_per_million,
+        has_depreciation_tax, depreciation_rate_r, depreciation_tax_rate
+    """
+    products = [get_finance_product(c, path) for c in companies]
+    table = {
+        "is_loan": np.array([p.is_loan for p in products], dtype=bool),
+        "rate": np.array([np.nan if p.rate is None else p.rate for p in products]),
+        "release_ratio": np.array([p.release_ratio for p in products]),
+        "revenue_share_rate": np.array([p.revenue_share_rate for p in products]),
+        "fire_insurance_per_million": np.array([p.fire_insurance_per_million for p in products]),
+        "has_depreciation_tax": np.array([p.has_depreciation_tax for p in products], dtype=bool),
+        "depreciation_rate_r": np.array([p.depreciation_rate_r or 0.0 for p in products]),
+        "depreciation_tax_rate": np.array([p.depreciation_tax_rate for p in products]),
+    }
+    for arr in table.values():
+        arr.setflags(write=False)
+    return table
+
+
+def finance_schedule_arrays(
+    company,
+    principal,
+    selling_price,
+    rate_pct,
+    term,
+    n_years: int,
+    rate_shift_pct=0.0,
+) -> dict[str, np.ndarray]:
+    """Year-by-year finance cost for many scenarios, driven by the registry.
+
+    Args:
+        company:       company name per scenario (or scalar)
+        principal:     financed amount (selling price - subsidy)
+        selling_price: equipment price (fire insurance / depreciation tax base)
+        rate_pct:      on-screen rate (%) for products without a fixed rate
+        term:          finance term (years)
+        n_years:       number of year columns
+        rate_shift_pct: %-points added to the effective rate (sensitivity runs)
+
+    Returns:
+        dict with
+            payment            (S, n_years) lease / loan payment per year
+            annual_payment     (S,) lease PMT, or loan year-1 total
+            fire_insurance     (S,)
+            depreciation_tax   (S, n_years)
+            post_term_payment  (S,) re-lease payment after the term
+            revenue_share_rate (S,)
+            rate, is_loan, has_schedule (loan with a positive principal)
+    """
+    names = np.atleast_1d(np.asarray(company, dtype=object)).astype(str)
+    unique, code = np.unique(names, return_inverse=True)
+    table = compile_products(tuple(unique.tolist()))
+    code_f, principal, selling_price, rate_pct, term, rate_shift_pct = broadcast_scenarios(
+        code.reshape(-1), principal, selling_price, rate_pct, term, rate_shift_pct,
+    )
+    n = len(code_f)
+    attr = {k: v[code_f.astype(int)] for k, v in table.items()}
+
+    rate = np.where(np.isnan(attr["rate"]), rate_pct / 100.0, attr["rate"])
+    if np.any(rate_shift_pct):
+        rate = rate + rate_shift_pct / 100.0
+    is_loan = attr["is_loan"]
+    funded = principal > 0
+
+    loan = loan_schedule_arrays(np.where(is_loan, principal, 0.0), rate, term.astype(int), n_years)
+    annual_payment = np.where(
+        is_loan,
+        loan["total"][:, 0] if n_years else 0.0,
+        pmt_arrays(rate, term, principal),
+    )
+    has_schedule = is_loan & funded
+    payment = np.where(has_schedule[:, None], loan["total"], annual_payment[:, None])
+
+    fire_insurance = np.where(
+        funded & (attr["fire_insurance_per_million"] > 0),
+        fire_insurance_arrays(selling_price, attr["fire_insurance_per_million"]),
+        0.0,
+    )
+    depreciation_tax = np.zeros((n, n_years))
+    taxed = funded & attr["has_depreciation_tax"]
+    if taxed.any():
+        depreciation_tax[taxed] = depreciation_tax_arrays(
+            selling_price[taxed], n_years,
+            attr["depreciation_rate_r"][taxed], attr["depreciation_tax_rate"][taxed],
+        )
+
+    return {
+        "payment": payment,
+        "annual_payment": annual_payment,
+        "fire_insurance": fire_insurance,
+        "depreciation_tax": depreciation_tax,
+        "post_term_payment": np.where(is_loan, 0.0, annual_payment * attr["release_ratio"]),
+        "revenue_share_rate": attr["revenue_share_rate"],
+        "rate": rate,
+        "is_loan": is_loan,
+        "has_schedule": has_schedule,
+    }
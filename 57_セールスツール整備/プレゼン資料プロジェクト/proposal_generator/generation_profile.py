@@ -0,0 +1,141 @@
+"""
+generation_profile.py - Per-year generation (yield) profiles shared by the finance calc and slides
+
+A profile is one multiplier per contract year on the year-1 energy from iPals
+(self-consumption / surplus). The finance engine (ppa_engine.yield_factors),
+auto_calc_ppa(yield_profile=...) and the PP8 / EP4 simulation tables all read
+the same vector, so the decay curve is computed once per deal:
+
+    profile = generation_profile(20, lid=0.02, curtailment=0.01)
+    profile[0]                                 # 0.9702 (year 1)
+    auto_calc_ppa(..., yield_profile=profile)
+    data["yield_profile"] = profile.tolist()   # slides read it back via deal_profile()
+
+Supported effects:
+  - Geometric degradation (default 0.5%/yr, the model used so far)
+  - First-year LID (light-induced degradation): a one-off loss kept in every year
+  - Manufacturer warranty curves (non-linear): output fractions by year,
+    interpolated linearly and extended with the last segment's slope
+  - Curtailment (出力抑制): fraction lost per year (scalar or per year)
+
+Without LID, warranty and curtailment the profile is exactly
+(1 - degradation) ** (year - 1), so existing prices do not move.
+"""
+
+from __future__ import annotations
+
+import functools
+
+import numpy as np
+
+from proposal_generator.ppa_engine import decay_factors
+
+DEGRADATION_RATE = 0.005  # 0.5% per year
+PROFILE_YEARS = 30        # default horizon (longest contract offered)
+
+# Output warranty curves: (year, output fraction of nameplate) knots
+WARRANTY_CURVES: dict[str, tuple[tuple[int, float], ...]] = {
+    "リニア保証（1年目98%・25年目84.8%）": ((1, 0.98), (25, 0.848)),
+    "リニア保証（1年目99%・30年目87.4%）": ((1, 0.99), (30, 0.874)),
+    "段階保証（10年目90%・25年目80%）": ((1, 1.0), (10, 0.90), (25, 0.80)),
+}
+
+
+def _warranty_factors(knots: tuple[tuple[float, float], ...], n_years: int) -> np.ndarray:
+    """Warranty output fractions for years 1..n_years (linear between knots)."""
+    if not knots:
+        raise ValueError("warranty curve needs at least one (year, fraction) knot")
+    xs = np.array([k[0] for k in knots], dtype=float)
+    ys = np.array([k[1] for k in knots], dtype=float)
+    if np.any(np.diff(xs) <= 0):
+        raise ValueError("warranty knots must have increasing years")
+    years = np.arange(1, n_years + 1, dtype=float)
+    values = np.interp(years, xs, ys)
+    if len(xs) > 1:
+        slope = (ys[-1] - ys[-2]) / (xs[-1] - xs[-2])
+        beyond = years > xs[-1]
+        values[beyond] = ys[-1] + slope * (years[beyond] - xs[-1])
+    return np.maximum(values, 0.0)
+
+
+@functools.lru_cache(maxsize=256)
+def _profile_cached(
+    n_years: int,
+    degradation: float,
+    lid: float,
+    warranty: tuple | None,
+    curtailment: tuple[float, ...] | float,
+) -> np.ndarray:
+    if warranty is None:
+        profile = decay_factors(degradation, n_years)[0]
+    else:
+        profile = _warranty_factors(warranty, n_years)
+    if lid:
+        profile = profile * (1 - lid)
+    if isinstance(curtailment, tuple):
+        curtail = np.zeros(n_years)
+        values = curtailment[:n_years]
+        curtail[:len(values)] = values
+        if len(values) < n_years and values:
+            curtail[len(values):] = values[-1]   # last given year carries on
+        profile = profile * (1 - curtail)
+    elif curtailment:
+        profile = profile * (1 - curtailment)
+    profile = np.ascontiguousarray(profile, dtype=float)
+    profile.setflags(write=False)
+    return profile
+
+
+def generation_profile(
+    n_years: int = PROFILE_YEARS,
+    degradation: float = DEGRADATION_RATE,
+    lid: float = 0.0,
+    warranty=None,
+    curtailment=0.0,
+) -> np.ndarray:
+    """Per-year generation multipliers on the year-1 energy (cached, read-only).
+
+    factor[year] = base[year] * (1 - lid) * (1 - curtailment[year])
+    base = (1 - degradation) ** (year - 1), or the warranty curve.
+
+    Args:
+        n_years:     number of years (index 0 = contract year 1)
+        degradation: annual degradation rate (ignored when warranty is given)
+        lid:         first-year light-induced degradation (0.02 = 2%)
+        warranty:    WARRANTY_CURVES name or (year, fraction) knots
+        curtailment: curtailment fraction, scalar or per year (the last value
+                     carries on for later years)
+
+    Returns:
+        (n_years,) float array
+    """
+    if isinstance(warranty, str):
+        try:
+            warranty = WARRANTY_CURVES[warranty]
+        except KeyError:
+            raise ValueError(f"unknown warranty curve: {warranty!r}") from None
+    if warranty is not None:
+        warranty = tuple((float(y), float(f)) for y, f in warranty)
+    if np.ndim(curtailment):
+        curtailment = tuple(float(c) for c in np.asarray(curtailment, dtype=float).ravel())
+    else:
+        curtailment = float(curtailment)
+    return _profile_cached(int(n_years), float(degradation), float(lid), warranty, curtailment)
+
+
+def deal_profile(data: dict, n_years: int) -> np.ndarray:
+    """Profile stored with a deal (data["yield_profile"]), or the default decay.
+
+    Used by the slides so they show the same energy as the finance calc.
+    """
+    stored = data.get("yield_profile")
+    if stored is not None and len(stored) >= n_years:
+        return np.asarray(stored, dtype=float)[:n_years]
+    return generation_profile(n_years)
+
+
+def profile_note(data: dict) -> str:
+    """Slide footnote describing the generation assumption of a deal."""
+    if data.get("yield_profile") is not None:
+        return data.get("yield_profile_label") or "発電量は設定した発電量プロファイル（LID・劣化保証・出力抑制）で試算"
+    return f"発電量は年▲{DEGRADATION_RATE * 100:.1f}%低減で試算"
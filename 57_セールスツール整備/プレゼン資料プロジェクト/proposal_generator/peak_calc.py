@@ -0,0 +1,208 @@
+"""
+peak_calc.py - Load-duration curve and peak-event index
+
+Analytics over the iPals hourly arrays (demand_calc.hourly_arrays) that the
+slides and the UI read without rescanning the year:
+
+  - Load-duration curve: demand before / after PV sorted in descending
+    order, evaluated at DURATION_POINTS exceedance ranks. One np.sort per
+    curve (a multi-kth np.partition is asymptotically cheaper but measured
+    ~10x slower than numpy's vectorised sort at 8,760 hours).
+  - Peak events: one event per day (the daily maximum hour); the top N
+    days are kept in a heap (heapq.nlargest), O(n + days x log N). Each
+    event has its timestamp, month, and the PV output at the peak hour.
+
+Results are cached per upload (keyed by a digest of the hourly columns), so
+PP9 / EP5 and the app share one computation:
+
+    pa = peak_analytics(hourly, top_n=10, year=2025)
+    pa["duration_hours"], pa["duration_before_kw"], pa["duration_after_kw"]
+    pa["events_before"]["label"]     # ["7/15(火) 14:00", ...] (iPals hour)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import heapq
+from functools import lru_cache
+
+import numpy as np
+
+from proposal_generator.calendar_index import calendar_columns, date_label
+from proposal_generator.demand_calc import DEMAND_COLUMNS, hourly_arrays
+
+DURATION_POINTS = 101       # curve resolution (every 1% of the hours)
+DEFAULT_TOP_N = 10
+EVENT_MARKS = "①②③④⑤⑥⑦⑧⑨⑩"
+
+
+# ---------------------------------------------------------------------------
+# Load-duration curve
+# ---------------------------------------------------------------------------
+
+def duration_ranks(n: int, points: int = DURATION_POINTS) -> np.ndarray:
+    """Descending-order ranks (0 = largest) sampled evenly over n hours."""
+    if n <= 0:
+        return np.zeros(0, dtype=np.intp)
+    return np.unique(np.rint(np.linspace(0, n - 1, min(points, n))).astype(np.intp))
+
+
+def duration_curve(values: np.ndarray, ranks: np.ndarray) -> np.ndarray:
+    """values sorted in descending order, evaluated at ranks."""
+    values = np.asarray(values, dtype=float)
+    if not len(ranks):
+        return np.zeros(0)
+    return np.sort(values)[len(values) - 1 - ranks]
+
+
+# ---------------------------------------------------------------------------
+# Peak events
+# ---------------------------------------------------------------------------
+
+def day_starts(month: np.ndarray, day: np.ndarray) -> np.ndarray:
+    """Index of the first hour of each (month, day) run."""
+    if not len(month):
+        return np.zeros(0, dtype=np.intp)
+    change = (month[1:] != month[:-1]) | (day[1:] != day[:-1])
+    return np.concatenate(([0], np.flatnonzero(change) + 1))
+
+
+def daily_peaks(values: np.ndarray, starts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(daily maximum, index of its first hour) for each day run."""
+    if not len(starts):
+        return np.zeros(0), np.zeros(0, dtype=np.intp)
+    day_max = np.maximum.reduceat(values, starts)
+    day_id = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(values))))
+    hits = np.flatnonzero(values == day_max[day_id])
+    first = np.concatenate(([True], day_id[hits][1:] != day_id[hits][:-1]))
+    return day_max, hits[first]
+
+
+def peak_events(
+    arrays: dict[str, np.ndarray],
+    values: np.ndarray,
+    top_n: int = DEFAULT_TOP_N,
+    year: int | None = None,
+) -> dict[str, np.ndarray | list[str]]:
+    """Top N daily peaks of values (largest first; ties keep the earlier day).
+
+    Args:
+        arrays: hourly_arrays() columns (DEMAND_COLUMNS)
+        values: (n_hours,) load to rank (demand before or after PV)
+        top_n:  number of events
+        year:   calendar year for weekday labels / off-day flags (optional)
+
+    Returns:
+        dict of (n_events,) arrays: index (hour position), month, day, hour,
+        load_kw (the ranked value), demand_kw, net_demand_kw, pv_kw
+        (self-consumption at that hour), pv_share (pv_kw / demand_kw),
+        offday (False without a year); label ("m/d h:00", weekday with a year)
+    """
+    starts = day_starts(arrays["month"], arrays["day"])
+    day_max, day_idx = daily_peaks(values, starts)
+    top = heapq.nlargest(top_n, range(len(day_max)), key=day_max.__getitem__)
+    idx = day_idx[np.asarray(top, dtype=np.intp)]
+
+    month, day, hour = (arrays[k][idx] for k in ("month", "day", "hour"))
+    demand = arrays["demand_kw"][idx]
+    pv = np.minimum(arrays["self_consumption_kw"][idx], np.maximum(demand, 0.0))
+    offday = (calendar_columns(month, day, year)["offday"] if year is not None
+              else np.zeros(len(idx), dtype=bool))
+    return {
+        "index": idx,
+        "month": month,
+        "day": day,
+        "hour": hour,
+        "load_kw": values[idx],
+        "demand_kw": demand,
+        "net_demand_kw": np.maximum(demand - pv, 0.0),
+        "pv_kw": pv,
+        "pv_share": np.divide(pv, demand, out=np.zeros_like(pv), where=demand > 0),
+        "offday": offday,
+        "label": [f"{date_label(int(m), int(d), year)} {int(h)}:00" for m, d, h in zip(month, day, hour)],
+    }
+
+
+def event_summary(events: dict, n: int = 3) -> str:
+    """One-line "①7/15(火) 14:00 452kW（PV 120kW）…" summary of the first n events."""
+    parts = [
+        f"{EVENT_MARKS[i] if i < len(EVENT_MARKS) else f'{i + 1}.'}{label} "
+        f"{load:,.0f}kW（PV {pv:,.0f}kW）"
+        for i, (label, load, pv) in enumerate(zip(events["label"][:n], events["load_kw"][:n], events["pv_kw"][:n]))
+    ]
+    return "　".join(parts)
+
+
+# ---------------------------------------------------------------------------
+# Cached analytics per upload
+# ---------------------------------------------------------------------------
+
+def _digest(arrays: dict[str, np.ndarray]) -> str:
+    """Content key of the hourly columns (one pass over the bytes)."""
+    h = hashlib.blake2b(digest_size=16)
+    for key in DEMAND_COLUMNS:
+        h.update(np.ascontiguousarray(arrays[key]).tobytes())
+    return h.hexdigest()
+
+
+class _HashedArrays(tuple):
+    """Hourly columns passed through lru_cache, hashed / compared by digest only."""
+
+    def __new__(cls, digest: str, arrays: dict[str, np.ndarray]) -> _HashedArrays:
+        obj = super().__new__(cls, (arrays[k] for k in DEMAND_COLUMNS))
+        obj.digest = digest
+        return obj
+
+    def __hash__(self) -> int:
+        return hash(self.digest)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, _HashedArrays) and self.digest == other.digest
+
+
+@lru_cache(maxsize=8)
+def _analytics_cached(digest: str, top_n: int, points: int, year: int | None, _arrays: tuple) -> dict:
+    arrays = dict(zip(DEMAND_COLUMNS, _arrays))
+    demand = np.maximum(arrays["demand_kw"], 0.0)
+    net = np.maximum(demand - arrays["self_consumption_kw"], 0.0)
+    ranks = duration_ranks(len(demand), points)
+
+    result = {
+        "duration_hours": ranks + 1,
+        "duration_before_kw": duration_curve(demand, ranks),
+        "duration_after_kw": duration_curve(net, ranks),
+        "events_before": peak_events(arrays, demand, top_n, year),
+        "events_after": peak_events(arrays, net, top_n, year),
+        "n_hours": len(demand),
+        "year": year,
+    }
+    for value in (result["duration_hours"], result["duration_before_kw"], result["duration_after_kw"],
+                  *result["events_before"].values(), *result["events_after"].values()):
+        if isinstance(value, np.ndarray):
+            value.setflags(write=False)
+    return result
+
+
+def peak_analytics(
+    hourly_rows,
+    top_n: int = DEFAULT_TOP_N,
+    points: int = DURATION_POINTS,
+    year: int | None = None,
+) -> dict:
+    """Load-duration curves and top-N peak events before / after PV (cached).
+
+    Args:
+        hourly_rows: hourly dicts or hourly_arrays() columns
+        top_n:       number of peak events (one per day)
+        points:      duration-curve resolution
+        year:        calendar year for weekday labels / off-day flags
+
+    Returns:
+        dict with (points,) arrays duration_hours (hours at or above the
+        value), duration_before_kw, duration_after_kw; events_before /
+        events_after from peak_events() ranked by demand before / after PV;
+        n_hours and year. Arrays are read-only and shared between callers.
+    """
+    arrays = hourly_arrays(hourly_rows, DEMAND_COLUMNS)
+    key = _digest(arrays)
+    return _analytics_cached(key, int(top_n), int(points), year, _HashedArrays(key, arrays))
@@ -0,0 +1,899 @@
+"""
+ppa_batch.py - Batch / grid scenario API for auto_calc_ppa
+
+Evaluates many PPA scenarios in one vectorised pass through ppa_engine
+instead of N Python calls to ppa_calc.auto_calc_ppa(). Typical use is the
+sales grid: finance company x lease_years x subsidy x self-consumption correction.
+
+Every argument of auto_calc_ppa_batch() accepts a scalar or a 1-D array;
+arrays are broadcast against each other (one element per scenario).
+build_grid() expands axes into the cartesian product.
+
+Example:
+    grid = build_grid(
+        lease_company=["シーエナジー", "みずほリース", "群馬銀行"],
+        lease_years=[15, 20],
+        subsidy_amount=[0, 10_000_000],
+        consumption_correction_pct=[0.0, 5.0, 10.0],
+    )
+    table = auto_calc_ppa_batch(
+        self_consumption_y1_kwh=420_000, surplus_y1_kwh=30_000,
+        selling_price=80_000_000, lease_rate_pct=6.0, contract_years=20,
+        system_kw=400, **grid,
+    )
+    pd.DataFrame(table)   # one row per grid cell
+
+The pipeline is split into stages so callers can reuse the price-independent
+part: prepare_scenarios() (finance schedules) -> batch_min_price() /
+batch_cashflow() -> batch_metrics(). solve_ppa_price_batch() prices for a
+DSCR, lessor-IRR or customer-savings target on top of those stages.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+from proposal_generator.finance_products import (
+    FINANCE_TYPE_LEASE,
+    FINANCE_TYPE_LOAN,
+    finance_schedule_arrays,
+    get_finance_product,
+    load_finance_products,
+)
+from proposal_generator.ppa_calc import (
+    DEFAULT_INSURANCE_YEN_FIXED,
+    DEFAULT_MAINTENANCE_YEN_PER_KW,
+    DEGRADATION_RATE,
+)
+from proposal_generator.ppa_engine import (
+    broadcast_scenarios,
+    cashflow_arrays,
+    min_price_arrays,
+    npv_arrays,
+    solve_irr_arrays,
+)
+
+
+# ---------------------------------------------------------------------------
+# Grid helpers
+# ---------------------------------------------------------------------------
+
+def build_grid(**axes) -> dict[str, np.ndarray]:
+    """Cartesian product of parameter axes as flat, equal-length arrays.
+
+    Args:
+        **axes: parameter name -> list of values (strings allowed)
+
+    Returns:
+        dict of parameter name -> 1-D array (length = product of axis lengths),
+        ordered with the last axis varying fastest
+    """
+    if not axes:
+        return {}
+    values = {k: np.asarray(list(v) if not np.isscalar(v) else [v]) for k, v in axes.items()}
+    index = np.meshgrid(*[np.arange(len(v)) for v in values.values()], indexing="ij")
+    return {k: v[i.reshape(-1)] for (k, v), i in zip(values.items(), index)}
+
+
+# ---------------------------------------------------------------------------
+# Batch calculation
+# ---------------------------------------------------------------------------
+
+def prepare_scenarios(
+    self_consumption_y1_kwh,
+    surplus_y1_kwh,
+    selling_price,
+    subsidy_amount,
+    lease_company,
+    lease_rate_pct,
+    lease_years,
+    contract_years,
+    system_kw=0.0,
+    fit_price=0.0,
+    include_surplus: bool = False,
+    target_dscr=1.30,
+    maintenance_yen_per_kw=DEFAULT_MAINTENANCE_YEN_PER_KW,
+    insurance_yen_fixed=DEFAULT_INSURANCE_YEN_FIXED,
+    consumption_correction_pct=0.0,
+    degradation=DEGRADATION_RATE,
+    rate_shift_pct=0.0,
+    yield_profile=None,
+) -> dict:
+    """Finance stage of the batch pipeline: everything that does not depend on the PPA price.
+
+    Arguments are those of auto_calc_ppa_batch(), plus the annual degradation
+    rate, a shift (%-points) added to the effective finance rate, including
+    products with a fixed registry rate (sensitivity analysis), and a
+    per-year yield_profile ((n_years,) shared or (n_scenarios, n_years);
+    replaces degradation, see generation_profile.py). The returned dict holds the
+    broadcast inputs plus per-scenario finance arrays (payment matrix, fire
+    insurance, depreciation tax, O&M, re-lease, revenue share) and is consumed
+    by batch_min_price(), batch_cashflow() and the pricing solvers.
+    """
+    names = np.atleast_1d(np.asarray(lease_company, dtype=object))
+
+    (sc_raw, sur_y1, price, subsidy, rate_pct, term, contract, kw, fit,
+     dscr_t, maint, insure, corr, deg, shift, _) = broadcast_scenarios(
+        self_consumption_y1_kwh, surplus_y1_kwh, selling_price, subsidy_amount,
+        lease_rate_pct, lease_years, contract_years, system_kw, fit_price,
+        target_dscr, maintenance_yen_per_kw, insurance_yen_fixed,
+        consumption_correction_pct, degradation, rate_shift_pct, np.zeros(len(names)),
+    )
+    names = np.broadcast_to(names, price.shape) if len(names) == 1 else names
+    term = term.astype(int)
+    contract = contract.astype(int)
+    n_years = int(max(term.max(initial=0), contract.max(initial=0)))
+
+    sc_y1 = sc_raw * (1 - corr / 100)
+    principal = np.maximum(price - subsidy, 0.0)
+
+    # Finance payments (finance-product registry)
+    finance = finance_schedule_arrays(
+        names, principal, price, rate_pct, term, n_years, rate_shift_pct=shift,
+    )
+
+    return {
+        "lease_company": np.asarray(names, dtype=object),
+        "is_loan": finance["is_loan"],
+        "lease_years": term,
+        "contract_years": contract,
+        "n_years": n_years,
+        "selling_price": price,
+        "subsidy_amount": subsidy,
+        "consumption_correction_pct": corr,
+        "self_consumption_y1_kwh": sc_y1,
+        "surplus_y1_kwh": sur_y1,
+        "degradation": deg,
+        "yield_profile": yield_profile,
+        "fit_price": fit,
+        "include_surplus": include_surplus,
+        "target_dscr": dscr_t,
+        "principal": principal,
+        "rate": finance["rate"],
+        "annual_payment": finance["annual_payment"],
+        "payment": finance["payment"],
+        "has_schedule": finance["has_schedule"],
+        "fire_insurance": finance["fire_insurance"],
+        "depreciation_tax": finance["depreciation_tax"],
+        "om_cost": kw * maint + insure,
+        "post_term_payment": finance["post_term_payment"],
+        "revenue_share_rate": finance["revenue_share_rate"],
+        "valid": (principal > 0) & (sc_y1 > 0),
+    }
+
+
+def batch_min_price(prep: dict, target_dscr=None, rounded: bool = True) -> np.ndarray:
+    """Minimum PPA price meeting the DSCR target per scenario.
+
+    0.5-yen rounded like calc_min_ppa_price(), or the unrounded break-even
+    price with rounded=False.
+    """
+    raw, min_price = min_price_arrays(
+        self_consumption_y1_kwh=prep["self_consumption_y1_kwh"],
+        surplus_y1_kwh=prep["surplus_y1_kwh"],
+        finance_payment=prep["payment"],
+        lease_years=prep["lease_years"],
+        degradation=prep["degradation"],
+        yield_profile=prep["yield_profile"],
+        fit_price=prep["fit_price"],
+        include_surplus=prep["include_surplus"],
+        target_dscr=prep["target_dscr"] if target_dscr is None else target_dscr,
+        annual_om_cost=prep["om_cost"],
+        fire_insurance=prep["fire_insurance"][:, None],
+        depreciation_tax=prep["depreciation_tax"],
+    )
+    priced = prep["valid"] & (prep["has_schedule"] | (prep["annual_payment"] > 0))
+    return np.where(priced, min_price if rounded else np.maximum(raw, 0.0), 0.0)
+
+
+def batch_cashflow(prep: dict, ppa_unit_price) -> dict[str, np.ndarray]:
+    """Cashflow arrays (ppa_engine.cashflow_arrays) for every scenario at the given price(s)."""
+    return cashflow_arrays(
+        self_consumption_y1_kwh=prep["self_consumption_y1_kwh"],
+        surplus_y1_kwh=prep["surplus_y1_kwh"],
+        ppa_unit_price=ppa_unit_price,
+        fit_price=prep["fit_price"],
+        finance_payment=prep["payment"],
+        lease_years=prep["lease_years"],
+        contract_years=prep["contract_years"],
+        degradation=prep["degradation"],
+        yield_profile=prep["yield_profile"],
+        include_surplus=prep["include_surplus"],
+        annual_om_cost=prep["om_cost"],
+        fire_insurance=prep["fire_insurance"][:, None],
+        depreciation_tax=prep["depreciation_tax"],
+        post_term_payment=prep["post_term_payment"],
+        revenue_share_rate=prep["revenue_share_rate"],
+    )
+
+
+def batch_metrics(prep: dict, cf: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """min DSCR, IRR and NPV per scenario from batch_cashflow() output.
+
+    IRR / NPV use the whole-yen net cashflows, as auto_calc_ppa() does.
+    """
+    principal = prep["principal"]
+    has_table = prep["valid"] & (prep["contract_years"] > 0)
+
+    dscr = np.where(np.isnan(cf["dscr"]), np.inf, cf["dscr"])
+    min_dscr = dscr.min(axis=1) if dscr.shape[1] else np.full(len(principal), np.inf)
+    min_dscr = np.where(has_table & np.isfinite(min_dscr), np.round(min_dscr, 3), np.nan)
+
+    net_cf = np.rint(cf["net_cashflow"])
+    irr_res = solve_irr_arrays(np.concatenate([-principal[:, None], net_cf], axis=1))
+    return {
+        "min_dscr": min_dscr,
+        "irr_pct": np.where(has_table, np.round(irr_res["rate"] * 100, 2), np.nan),
+        "npv_yen": np.where(has_table, np.rint(npv_arrays(prep["rate"], net_cf) - principal), np.nan),
+        "irr_converged": has_table & irr_res["converged"],
+        "irr_iterations": irr_res["iterations"],
+    }
+
+
+def auto_calc_ppa_batch(
+    self_consumption_y1_kwh,
+    surplus_y1_kwh,
+    selling_price,
+    subsidy_amount,
+    lease_company,
+    lease_rate_pct,
+    lease_years,
+    contract_years,
+    system_kw=0.0,
+    fit_price=0.0,
+    include_surplus: bool = False,
+    target_dscr=1.30,
+    maintenance_yen_per_kw=DEFAULT_MAINTENANCE_YEN_PER_KW,
+    insurance_yen_fixed=DEFAULT_INSURANCE_YEN_FIXED,
+    consumption_correction_pct=0.0,
+    yield_profile=None,
+) -> dict[str, np.ndarray]:
+    """Vectorised auto_calc_ppa() over many scenarios.
+
+    Same inputs as ppa_calc.auto_calc_ppa() (scalars or arrays), plus
+    consumption_correction_pct: self-consumption is reduced by that percentage
+    before pricing, as in the Streamlit 自家消費補正係数 input, and the deal's
+    per-year yield_profile (see prepare_scenarios(); None = flat degradation).
+
+    Returns:
+        dict of 1-D arrays (one element per scenario):
+            lease_company, finance_type, lease_years, contract_years,
+            selling_price, subsidy_amount, consumption_correction_pct,
+            self_consumption_y1_kwh (after correction), principal,
+            effective_rate_pct, annual_lease_payment, annual_om_cost,
+            total_annual_cost, min_ppa_price, min_dscr, irr_pct, npv_yen,
+            irr_converged, irr_iterations, valid
+
+        min_dscr / irr_pct / npv_yen are NaN where auto_calc_ppa() would
+        return None; valid is False where principal or self-consumption is 0.
+    """
+    prep = prepare_scenarios(
+        self_consumption_y1_kwh, surplus_y1_kwh, selling_price, subsidy_amount,
+        lease_company, lease_rate_pct, lease_years, contract_years,
+        system_kw=system_kw, fit_price=fit_price, include_surplus=include_surplus,
+        target_dscr=target_dscr, maintenance_yen_per_kw=maintenance_yen_per_kw,
+        insurance_yen_fixed=insurance_yen_fixed,
+        consumption_correction_pct=consumption_correction_pct,
+        yield_profile=yield_profile,
+    )
+    min_price = batch_min_price(prep)
+    metrics = batch_metrics(prep, batch_cashflow(prep, min_price))
+
+    return {
+        "lease_company": prep["lease_company"],
+        "finance_type": np.where(prep["is_loan"], FINANCE_TYPE_LOAN, FINANCE_TYPE_LEASE).astype(object),
+        "lease_years": prep["lease_years"],
+        "contract_years": prep["contract_years"],
+        "selling_price": prep["selling_price"],
+        "subsidy_amount": prep["subsidy_amount"],
+        "consumption_correction_pct": prep["consumption_correction_pct"],
+        "self_consumption_y1_kwh": prep["self_consumption_y1_kwh"],
+        "principal": np.rint(prep["principal"]),
+        "effective_rate_pct": np.round(prep["rate"] * 100, 2),
+        "annual_lease_payment": np.rint(prep["annual_payment"]),
+        "annual_om_cost": np.rint(prep["om_cost"]),
+        "total_annual_cost": np.rint(prep["annual_payment"] + prep["om_cost"]),
+        "min_ppa_price": min_price,
+        **metrics,
+        "valid": prep["valid"],
+    }
+
+
+def calc_ppa_grid(grid: dict, **base) -> dict[str, np.ndarray]:
+    """Run auto_calc_ppa_batch() over the cartesian product of grid axes.
+
+    Args:
+        grid:   parameter name -> list of values (e.g. {"lease_years": [15, 20]})
+        **base: fixed auto_calc_ppa_batch() arguments shared by every cell
+
+    Returns:
+        Result table from auto_calc_ppa_batch() (one element per grid cell)
+    """
+    return auto_calc_ppa_batch(**{**base, **build_grid(**grid)})
+
+
+# ---------------------------------------------------------------------------
+# Pricing solver modes
+# ---------------------------------------------------------------------------
+
+PRICING_MODE_DSCR = "dscr"        # lowest price with min DSCR >= target (calc_min_ppa_price)
+PRICING_MODE_IRR = "irr"          # lowest price with lessor IRR >= target %
+PRICING_MODE_SAVINGS = "savings"  # highest price giving the customer >= target % savings
+PRICING_MODES = (PRICING_MODE_DSCR, PRICING_MODE_IRR, PRICING_MODE_SAVINGS)
+
+PRICE_STEP = 0.5  # 円/kWh, same rounding as calc_min_ppa_price
+
+
+def _ceil_price(raw: np.ndarray) -> np.ndarray:
+    return np.ceil(raw / PRICE_STEP) * PRICE_STEP
+
+
+def _floor_price(raw: np.ndarray) -> np.ndarray:
+    return np.floor(raw / PRICE_STEP) * PRICE_STEP
+
+
+def _irr_npv(prep: dict, price: np.ndarray, rate: np.ndarray) -> np.ndarray:
+    """Lessor NPV at `rate` (incl. the t=0 principal) on whole-yen cashflows at `price`."""
+    net_cf = np.rint(batch_cashflow(prep, price)["net_cashflow"])
+    return npv_arrays(rate, net_cf) - prep["principal"]
+
+
+def batch_irr_price(prep: dict, target_irr_pct, max_steps: int = 4) -> np.ndarray:
+    """Lowest 0.5-yen PPA price whose lessor IRR reaches target_irr_pct.
+
+    Net cashflow is affine in the PPA price (revenue, revenue share), so the
+    NPV at the target rate is too: two cashflow passes (price 0 and 1) give the
+    exact root. IRR >= target is equivalent to NPV(target) >= 0 because every
+    cashflow rises with the price. The rounded root is then checked on the
+    whole-yen cashflows auto_calc_ppa() uses and stepped up by 0.5 where
+    rounding leaves it short (normally no step is needed).
+
+    Returns:
+        price per scenario; NaN where no price reaches the target
+        (no self-consumption within the contract term, or invalid scenario)
+    """
+    rate = np.broadcast_to(np.asarray(target_irr_pct, dtype=float) / 100.0, prep["principal"].shape)
+    cf0 = batch_cashflow(prep, 0.0)["net_cashflow"]
+    cf1 = batch_cashflow(prep, 1.0)["net_cashflow"]
+    npv0 = npv_arrays(rate, cf0) - prep["principal"]
+    slope = npv_arrays(rate, cf1 - cf0)
+
+    solvable = prep["valid"] & (slope > 0)
+    raw = np.divide(-npv0, slope, out=np.full_like(npv0, np.nan), where=solvable)
+    price = np.where(solvable, _ceil_price(np.maximum(raw, 0.0)), np.nan)
+
+    for _ in range(max_steps):
+        short = solvable & (_irr_npv(prep, np.nan_to_num(price), rate) < 0)
+        if not short.any():
+            break
+        price = np.where(short, price + PRICE_STEP, price)
+    return price
+
+
+def solve_ppa_price_batch(
+    mode: str,
+    target,
+    current_tariff=None,
+    enforce_dscr: bool = True,
+    **scenario,
+) -> dict[str, np.ndarray]:
+    """Price many scenarios for a DSCR, lessor-IRR or customer-savings target.
+
+    Args:
+        mode:           PRICING_MODE_DSCR / PRICING_MODE_IRR / PRICING_MODE_SAVINGS
+        target:         DSCR (e.g. 1.30), IRR % (e.g. 3.10) or savings % (e.g. 15.0);
+                        scalar or per-scenario array
+        current_tariff: current electricity unit price (円/kWh) the customer pays
+                        for self-consumed energy; required for savings mode and
+                        used for savings_pct in every mode
+        enforce_dscr:   IRR mode only - never price below the DSCR minimum price
+        **scenario:     auto_calc_ppa_batch() arguments
+
+    Returns:
+        dict of 1-D arrays:
+            lease_company, lease_years, contract_years,
+            min_ppa_price   - DSCR minimum price (target_dscr of the scenario),
+            target_price    - price solved for the mode's target (NaN if none),
+            ppa_price       - price to quote (0 where infeasible),
+            feasible        - target reachable and, for savings mode, the price
+                              still clears the DSCR minimum price,
+            min_dscr, irr_pct, npv_yen - metrics at ppa_price,
+            savings_pct, annual_saving_y1 - vs current_tariff (NaN without it),
+            valid
+    """
+    if mode not in PRICING_MODES:
+        raise ValueError(f"unknown pricing mode: {mode!r} (expected one of {PRICING_MODES})")
+    prep = prepare_scenarios(**scenario)
+    shape = prep["principal"].shape
+    target = np.broadcast_to(np.asarray(target, dtype=float), shape)
+    tariff = (
+        np.full(shape, np.nan) if current_tariff is None
+        else np.broadcast_to(np.asarray(current_tariff, dtype=float), shape)
+    )
+    dscr_price = batch_min_price(prep)
+
+    if mode == PRICING_MODE_DSCR:
+        target_price = np.where(prep["valid"], batch_min_price(prep, target_dscr=target), np.nan)
+        feasible = target_price > 0
+        ppa_price = target_price
+    elif mode == PRICING_MODE_IRR:
+        target_price = batch_irr_price(prep, target)
+        feasible = np.isfinite(target_price)
+        ppa_price = np.fmax(target_price, dscr_price) if enforce_dscr else target_price
+    else:
+        if current_tariff is None:
+            raise ValueError("savings mode requires current_tariff")
+        target_price = np.where(prep["valid"], _floor_price(tariff * (1 - target / 100)), np.nan)
+        feasible = (target_price > 0) & (target_price >= dscr_price)
+        ppa_price = target_price
+
+    ppa_price = np.where(feasible, ppa_price, 0.0)
+    metrics = batch_metrics(prep, batch_cashflow(prep, ppa_price))
+    priced = feasible & (tariff > 0)
+    savings_pct = np.divide(
+        (tariff - ppa_price) * 100, tariff, out=np.full(shape, np.nan), where=priced,
+    )
+
+    return {
+        "lease_company": prep["lease_company"],
+        "lease_years": prep["lease_years"],
+        "contract_years": prep["contract_years"],
+        "min_ppa_price": dscr_price,
+        "target_price": target_price,
+        "ppa_price": ppa_price,
+        "feasible": feasible,
+        "min_dscr": np.where(feasible, metrics["min_dscr"], np.nan),
+        "irr_pct": np.where(feasible, metrics["irr_pct"], np.nan),
+        "npv_yen": np.where(feasible, metrics["npv_yen"], np.nan),
+        "savings_pct": np.round(savings_pct, 2),
+        "annual_saving_y1": np.where(
+            priced, np.rint(prep["self_consumption_y1_kwh"] * (tariff - ppa_price)), np.nan,
+        ),
+        "valid": prep["valid"],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Reverse solver: maximum selling price for a target PPA price
+# ---------------------------------------------------------------------------
+
+SELLING_PRICE_STEP = 100  # 円, same rounding as the app's selling price (_round_100)
+
+
+def _clears_dscr(scenario: dict, selling_price: np.ndarray, target_ppa_price: np.ndarray) -> np.ndarray:
+    """True where the target PPA price clears the DSCR target at this selling price."""
+    prep = prepare_scenarios(**{**scenario, "selling_price": selling_price})
+    return batch_min_price(prep, rounded=False) <= target_ppa_price
+
+
+def solve_max_selling_price_batch(
+    target_ppa_price,
+    raw_cost=None,
+    max_iter: int = 40,
+    **scenario,
+) -> dict[str, np.ndarray]:
+    """Highest selling price (100-yen steps) a target PPA price still supports.
+
+    Finance cost rises monotonically with the selling price (principal, loan
+    schedule, fire insurance, depreciation tax), so the break-even DSCR price
+    does too and the feasible selling prices form an interval starting at the
+    subsidy amount. The bracket is seeded from a linear fit of the break-even
+    price through two selling prices, widened until it straddles the root and
+    bisected on the 100-yen grid; every step is one batch pass over all
+    scenarios.
+
+    Args:
+        target_ppa_price: PPA unit price the customer accepts (円/kWh)
+        raw_cost:         equipment cost (円) for the implied gross margin (optional)
+        max_iter:         bisection cap (40 halvings resolve any realistic bracket)
+        **scenario:       auto_calc_ppa_batch() arguments except selling_price
+
+    Returns:
+        dict of 1-D arrays:
+            lease_company, lease_years, target_ppa_price,
+            max_selling_price, principal, feasible (a positive principal is
+            supported), min_ppa_price (DSCR price at max_selling_price),
+            min_dscr, irr_pct, annual_lease_payment - at max_selling_price
+            and target_ppa_price,
+            gross_profit, gross_margin_pct - vs raw_cost (NaN without it)
+    """
+    scenario = dict(scenario)
+    scenario.pop("selling_price", None)
+    base = prepare_scenarios(selling_price=0.0, **scenario)
+    shape = base["principal"].shape
+    target = np.broadcast_to(np.asarray(target_ppa_price, dtype=float), shape)
+    subsidy = base["subsidy_amount"]
+    scenario = {**scenario, "subsidy_amount": subsidy}
+    solvable = (base["self_consumption_y1_kwh"] > 0) & (target > 0)
+
+    # Linear seed: break-even price at two principals
+    probe = 10_000_000.0
+    p1 = batch_min_price(prepare_scenarios(selling_price=subsidy + probe, **scenario), rounded=False)
+    p2 = batch_min_price(prepare_scenarios(selling_price=subsidy + 2 * probe, **scenario), rounded=False)
+    slope = (p2 - p1) / probe
+    guess = np.where(
+        slope > 0, subsidy + probe + (target - p1) / np.where(slope > 0, slope, 1.0), subsidy + probe,
+    )
+    guess = np.maximum(guess, subsidy + SELLING_PRICE_STEP)
+
+    # Bracket: lo always clears DSCR (principal 0), hi does not
+    lo = subsidy.copy()
+    hi = guess * 1.02 + SELLING_PRICE_STEP
+    inner = guess * 0.98
+    ok = solvable & (inner > lo) & _clears_dscr(scenario, inner, target)
+    lo = np.where(ok, inner, lo)
+    for _ in range(max_iter):
+        ok = solvable & _clears_dscr(scenario, hi, target)
+        if not ok.any():
+            break
+        lo = np.where(ok, hi, lo)
+        hi = np.where(ok, hi * 2, hi)
+
+    # Bisection on the 100-yen grid
+    lo = np.where(lo > subsidy, np.floor(lo / SELLING_PRICE_STEP) * SELLING_PRICE_STEP, lo)
+    hi = np.ceil(hi / SELLING_PRICE_STEP) * SELLING_PRICE_STEP
+    for _ in range(max_iter):
+        active = solvable & (hi - lo > SELLING_PRICE_STEP)
+        if not active.any():
+            break
+        mid = np.floor((lo + hi) / 2 / SELLING_PRICE_STEP) * SELLING_PRICE_STEP
+        mid = np.where(active & (mid > lo), mid, lo)
+        ok = _clears_dscr(scenario, mid, target)
+        lo = np.where(active & ok, mid, lo)
+        hi = np.where(active & ~ok, mid, hi)
+
+    max_price = np.where(solvable, lo, np.nan)
+    feasible = solvable & (max_price > subsidy)
+    prep = prepare_scenarios(selling_price=np.nan_to_num(max_price), **scenario)
+    metrics = batch_metrics(prep, batch_cashflow(prep, target))
+
+    if raw_cost is None:
+        gross_profit = np.full(shape, np.nan)
+    else:
+        gross_profit = np.where(feasible, max_price - np.asarray(raw_cost, dtype=float), np.nan)
+    gross_margin_pct = np.divide(
+        gross_profit * 100, max_price, out=np.full(shape, np.nan), where=feasible & ~np.isnan(gross_profit),
+    )
+
+    return {
+        "lease_company": base["lease_company"],
+        "lease_years": base["lease_years"],
+        "target_ppa_price": target,
+        "max_selling_price": max_price,
+        "principal": np.where(feasible, max_price - subsidy, np.nan),
+        "feasible": feasible,
+        "min_ppa_price": np.where(feasible, batch_min_price(prep), np.nan),
+        "min_dscr": np.where(feasible, metrics["min_dscr"], np.nan),
+        "irr_pct": np.where(feasible, metrics["irr_pct"], np.nan),
+        "annual_lease_payment": np.where(feasible, np.rint(prep["annual_payment"]), np.nan),
+        "gross_profit": np.rint(gross_profit),
+        "gross_margin_pct": np.round(gross_margin_pct, 1),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Best finance option (all registered companies x allowed terms)
+# ---------------------------------------------------------------------------
+
+def pareto_front(*objectives: np.ndarray, valid: np.ndarray | None = None) -> np.ndarray:
+    """Non-dominated mask for objectives to be *minimised* (negate to maximise).
+
+    A point is dominated if another is no worse in every objective and
+    strictly better in one. NaN objectives / invalid points are never on the front.
+    """
+    obj = np.column_stack([np.asarray(o, dtype=float) for o in objectives])
+    ok = np.isfinite(obj).all(axis=1)
+    if valid is not None:
+        ok &= np.asarray(valid, dtype=bool)
+    pts = obj[ok]
+    no_worse = (pts[:, None, :] <= pts[None, :, :]).all(axis=2)  # [j, i]: j no worse than i
+    better = (pts[:, None, :] < pts[None, :, :]).any(axis=2)
+    dominated = (no_worse & better).any(axis=0)
+    front = np.zeros(len(obj), dtype=bool)
+    front[np.flatnonzero(ok)[~dominated]] = True
+    return front
+
+
+def _rank(values: np.ndarray, descending: bool = False) -> np.ndarray:
+    """1-based rank (ties share the best rank); NaN values get rank 0."""
+    key = -values if descending else values
+    ranks = np.zeros(len(values), dtype=int)
+    ok = np.isfinite(key)
+    ordered = np.sort(key[ok])
+    ranks[ok] = np.searchsorted(ordered, key[ok], side="left") + 1
+    return ranks
+
+
+def best_finance_options(
+    current_tariff=None,
+    companies=None,
+    terms=None,
+    lease_rates=None,
+    **deal,
+) -> dict[str, np.ndarray]:
+    """Evaluate every finance company over every allowed term in one batch.
+
+    Products without a fixed registry rate are only priced at a rate entered
+    for that company: the screen rate of another lessor (or 0%) would rank
+    them as cheap as free money.
+
+    Args:
+        current_tariff: current electricity unit price (円/kWh) for customer
+                        savings; savings columns are NaN without it
+        companies:      company names to compare (default: every registered
+                        product with a fixed rate or an entry in lease_rates)
+        terms:          finance terms to try (default: each product's allowed terms)
+        lease_rates:    {company: lease_rate_pct} for products without a fixed rate
+        **deal:         auto_calc_ppa_batch() arguments except lease_company /
+                        lease_years / lease_rate_pct
+
+    Raises:
+        ValueError: if a company in companies has neither a fixed rate nor
+            an entry in lease_rates
+
+    Returns:
+        dict of 1-D arrays sorted by min_ppa_price (invalid options last):
+            lease_company, finance_type, lease_years, min_ppa_price, min_dscr,
+            irr_pct, npv_yen, annual_lease_payment, total_customer_savings
+            (over the contract at min_ppa_price), rank_price, rank_irr,
+            rank_savings (1 = best, 0 = not ranked), pareto (non-dominated
+            on low price / high IRR / high savings), valid
+    """
+    deal = {k: v for k, v in deal.items() if k not in ("lease_company", "lease_years", "lease_rate_pct")}
+    lease_rates = dict(lease_rates or {})
+    if companies is None:
+        companies = [name for name, product in load_finance_products().items()
+                     if product.rate is not None or name in lease_rates]
+    names, years, rates = [], [], []
+    for company in companies:
+        product = get_finance_product(company)
+        if product.rate is None and company not in lease_rates:
+            raise ValueError(f"{company}: 固定金利がないため lease_rates で金利を指定してください")
+        for term in (terms if terms is not None else product.terms):
+            names.append(company)
+            years.append(int(term))
+            rates.append(float(lease_rates.get(company, product.rate * 100 if product.rate is not None else 0.0)))
+
+    prep = prepare_scenarios(
+        lease_company=np.array(names, dtype=object), lease_years=np.array(years),
+        lease_rate_pct=np.array(rates), **deal,
+    )
+    min_price = batch_min_price(prep)
+    cf = batch_cashflow(prep, min_price)
+    metrics = batch_metrics(prep, cf)
+    valid = prep["valid"] & (min_price > 0)
+
+    if current_tariff is None:
+        savings = np.full(len(names), np.nan)
+    else:
+        savings = np.rint(
+            (cf["self_consumption_kwh"] * (float(current_tariff) - min_price[:, None])).sum(axis=1)
+        )
+    savings = np.where(valid, savings, np.nan)
+    price = np.where(valid, min_price, np.nan)
+    irr_pct = np.where(valid, metrics["irr_pct"], np.nan)
+
+    objectives = [price, -irr_pct]
+    if current_tariff is not None:
+        objectives.append(-savings)
+    pareto = pareto_front(*objectives, valid=valid)
+
+    result = {
+        "lease_company": prep["lease_company"],
+        "finance_type": np.where(prep["is_loan"], FINANCE_TYPE_LOAN, FINANCE_TYPE_LEASE).astype(object),
+        "lease_years": prep["lease_years"],
+        "min_ppa_price": price,
+        "min_dscr": np.where(valid, metrics["min_dscr"], np.nan),
+        "irr_pct": irr_pct,
+        "npv_yen": np.where(valid, metrics["npv_yen"], np.nan),
+        "annual_lease_payment": np.where(valid, np.rint(prep["annual_payment"]), np.nan),
+        "total_customer_savings": savings,
+        "rank_price": _rank(price),
+        "rank_irr": _rank(irr_pct, descending=True),
+        "rank_savings": _rank(savings, descending=True),
+        "pareto": pareto,
+        "valid": valid,
+    }
+    order = np.lexsort((-np.nan_to_num(irr_pct, nan=-np.inf), np.nan_to_num(price, nan=np.inf)))
+    return {k: v[order] for k, v in result.items()}
+
+
+# ---------------------------------------------------------------------------
+# Contract-term sweep
+# ---------------------------------------------------------------------------
+
+def _first_year_reaching(cumulative: np.ndarray, threshold: np.ndarray) -> np.ndarray:
+    """1-based first column where cumulative >= threshold per row (0 = never)."""
+    reached = cumulative >= threshold[:, None]
+    return np.where(reached.any(axis=1), reached.argmax(axis=1) + 1, 0)
+
+
+def sweep_contract_terms(
+    terms=range(10, 21),
+    current_tariff=None,
+    lease_years=None,
+    **deal,
+) -> dict[str, np.ndarray]:
+    """Break-even table over contract terms in one batch pass.
+
+    Each term is priced at its DSCR minimum price, then evaluated from both
+    sides: the customer (PPA savings vs the current tariff, or owning the
+    system under EPC) and the lessor (payback, NPV).
+
+    Args:
+        terms:          contract_years values to evaluate
+        current_tariff: current electricity unit price (円/kWh); savings and
+                        EPC payback are NaN / 0 without it
+        lease_years:    fixed finance term; None = same as each contract term
+        **deal:         auto_calc_ppa_batch() arguments except contract_years
+
+    Returns:
+        dict of 1-D arrays (one element per term):
+            contract_years, lease_years, min_ppa_price, min_dscr, irr_pct,
+            lessor_npv_yen, lessor_payback_year (first year cumulative net
+            cashflow covers the principal, 0 = not within the term),
+            annual_saving_y1, cumulative_savings (PPA customer over the
+            contract), epc_cumulative_savings, epc_payback_year (customer
+            buying the system for selling_price - subsidy instead), valid
+    """
+    deal = {k: v for k, v in deal.items() if k != "contract_years"}
+    terms = np.asarray(list(terms), dtype=int)
+    prep = prepare_scenarios(
+        contract_years=terms,
+        lease_years=terms if lease_years is None else lease_years,
+        **deal,
+    )
+    min_price = batch_min_price(prep)
+    cf = batch_cashflow(prep, min_price)
+    metrics = batch_metrics(prep, cf)
+    valid = prep["valid"] & (terms > 0)
+    principal = prep["principal"]
+
+    lessor_cum = np.cumsum(np.rint(cf["net_cashflow"]), axis=1)
+    lessor_payback = _first_year_reaching(lessor_cum, principal)
+
+    n = len(terms)
+    if current_tariff is None:
+        saving_y1 = cumulative = epc_cumulative = np.full(n, np.nan)
+        epc_payback = np.zeros(n, dtype=int)
+    else:
+        tariff = float(current_tariff)
+        sc = cf["self_consumption_kwh"]
+        ppa_saving = sc * (tariff - min_price[:, None])
+        saving_y1 = ppa_saving[:, 0] if ppa_saving.shape[1] else np.zeros(n)
+        cumulative = ppa_saving.sum(axis=1)
+
+        # EPC: the customer keeps the full tariff saving (+ surplus sales) and pays O&M
+        in_contract = cf["in_contract"]
+        epc_saving = sc * tariff + cf["surplus_revenue"] - np.where(in_contract, prep["om_cost"][:, None], 0.0)
+        epc_cum = np.cumsum(epc_saving, axis=1)
+        epc_cumulative = epc_cum[:, -1] if epc_cum.shape[1] else np.zeros(n)
+        epc_payback = _first_year_reaching(np.where(in_contract, epc_cum, -np.inf), principal)
+
+    return {
+        "contract_years": terms,
+        "lease_years": prep["lease_years"],
+        "min_ppa_price": np.where(valid, min_price, np.nan),
+        "min_dscr": np.where(valid, metrics["min_dscr"], np.nan),
+        "irr_pct": np.where(valid, metrics["irr_pct"], np.nan),
+        "lessor_npv_yen": np.where(valid, metrics["npv_yen"], np.nan),
+        "lessor_payback_year": np.where(valid, lessor_payback, 0),
+        "annual_saving_y1": np.where(valid, np.rint(saving_y1), np.nan),
+        "cumulative_savings": np.where(valid, np.rint(cumulative), np.nan),
+        "epc_cumulative_savings": np.where(valid, np.rint(epc_cumulative), np.nan),
+        "epc_payback_year": np.where(valid, epc_payback, 0),
+        "valid": valid,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Tornado sensitivity
+# ---------------------------------------------------------------------------
+
+SENSITIVITY_RELATIVE = "relative"   # delta is a fraction of the base value
+SENSITIVITY_ABSOLUTE = "absolute"   # delta is added to the base value
+
+# input name -> (label, prepare_scenarios() argument, mode, default delta)
+SENSITIVITY_INPUTS = {
+    "rate": ("金利", "rate_shift_pct", SENSITIVITY_ABSOLUTE, 0.5),
+    "subsidy": ("補助金", "subsidy_amount", SENSITIVITY_RELATIVE, 0.10),
+    "self_consumption": ("自家消費量", "self_consumption_y1_kwh", SENSITIVITY_RELATIVE, 0.10),
+    "om_per_kw": ("O&M単価(円/kW)", "maintenance_yen_per_kw", SENSITIVITY_RELATIVE, 0.10),
+    "degradation": ("経年劣化率", "degradation", SENSITIVITY_ABSOLUTE, 0.0025),
+    "insurance": ("保安管理費(固定)", "insurance_yen_fixed", SENSITIVITY_RELATIVE, 0.10),
+}
+
+_SENSITIVITY_BASE_DEFAULTS = {
+    "rate_shift_pct": 0.0,
+    "maintenance_yen_per_kw": DEFAULT_MAINTENANCE_YEN_PER_KW,
+    "insurance_yen_fixed": DEFAULT_INSURANCE_YEN_FIXED,
+    "degradation": DEGRADATION_RATE,
+}
+
+
+def tornado_sensitivity(deltas: dict | None = None, inputs=None, **deal) -> dict:
+    """One-at-a-time sensitivity of the minimum PPA price, in one batch pass.
+
+    Row 0 is the base deal; each input then gets a low and a high row, so all
+    2 x k perturbations go through prepare_scenarios() / batch_min_price()
+    together. Impacts are measured on the unrounded break-even price so small
+    moves are not hidden by the 0.5-yen rounding.
+
+    Args:
+        deltas: input name -> delta overriding SENSITIVITY_INPUTS
+                (fraction for relative inputs, absolute step otherwise;
+                the rate step is in %-points)
+        inputs: input names to perturb (default: every SENSITIVITY_INPUTS key;
+                degradation is left out when the deal has a yield_profile)
+        **deal: auto_calc_ppa_batch() arguments for a single deal (scalars)
+
+    Returns:
+        dict with
+            base_price, base_break_even   rounded / unrounded base price (円/kWh)
+            and 1-D arrays sorted by swing (largest first, chart order):
+            input, label, base_value, low_value, high_value,
+            price_low, price_high (rounded, input at its low / high value),
+            impact_low, impact_high (break-even change vs base, 円/kWh),
+            swing (|impact_high - impact_low|), rank
+    """
+    deltas = deltas or {}
+    if inputs is None:
+        # An explicit yield profile replaces the degradation rate
+        inputs = [n for n in SENSITIVITY_INPUTS if not (n == "degradation" and deal.get("yield_profile") is not None)]
+    names = list(inputs)
+    unknown = [n for n in names if n not in SENSITIVITY_INPUTS]
+    if unknown:
+        raise ValueError(f"unknown sensitivity inputs: {unknown}")
+
+    n_rows = 1 + 2 * len(names)
+    columns, base_values, lows, highs = {}, [], [], []
+    for i, name in enumerate(names):
+        _, arg, mode, default = SENSITIVITY_INPUTS[name]
+        delta = float(deltas.get(name, default))
+        base = float(deal.get(arg, _SENSITIVITY_BASE_DEFAULTS.get(arg, 0.0)))
+        if mode == SENSITIVITY_RELATIVE:
+            low, high = base * (1 - delta), base * (1 + delta)
+        else:
+            low, high = base - delta, base + delta
+        if arg != "rate_shift_pct":
+            low = max(low, 0.0)   # no negative subsidy / energy / cost / degradation
+        col = columns.setdefault(arg, np.full(n_rows, base))
+        col[1 + 2 * i] = low
+        col[2 + 2 * i] = high
+        base_values.append(base)
+        lows.append(low)
+        highs.append(high)
+
+    prep = prepare_scenarios(**{**deal, **columns})
+    raw = batch_min_price(prep, rounded=False)
+    price = batch_min_price(prep)
+
+    base_break_even = raw[0]
+    impact_low = raw[1::2] - base_break_even
+    impact_high = raw[2::2] - base_break_even
+    swing = np.abs(impact_high - impact_low)
+    order = np.argsort(-swing, kind="stable")
+
+    # The rate row reports the effective rate (%) rather than the shift
+    base_value = np.array(base_values)
+    low_value, high_value = np.array(lows), np.array(highs)
+    if "rate" in names:
+        i = names.index("rate")
+        effective = float(prep["rate"][0]) * 100
+        base_value[i], low_value[i], high_value[i] = effective, effective + lows[i], effective + highs[i]
+
+    return {
+        "base_price": float(price[0]),
+        "base_break_even": float(base_break_even),
+        "input": np.array(names, dtype=object)[order],
+        "label": np.array([SENSITIVITY_INPUTS[n][0] for n in names], dtype=object)[order],
+        "base_value": base_value[order],
+        "low_value": low_value[order],
+        "high_value": high_value[order],
+        "price_low": price[1::2][order],
+        "price_high": price[2::2][order],
+        "impact_low": np.round(impact_low[order], 3),
+        "impact_high": np.round(impact_high[order], 3),
+        "swing": np.round(swing[order], 3),
+        "rank": np.arange(1, len(names) + 1),
+    }
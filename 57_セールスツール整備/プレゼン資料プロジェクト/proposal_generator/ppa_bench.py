@@ -0,0 +1,387 @@
+"""
+ppa_bench.py - Benchmarks and golden-output regression check for the PPA finance engine
+
+Times auto_calc_ppa / irr / calc_bank_loan_annual_payments on representative
+lease and loan deals plus large synthetic batches, and compares every output
+with the recorded golden file (ppa_golden.json). Numerical drift and
+throughput regressions are reported in the same run, together with a
+statutory check that every EPC depreciation schedule reaches the 1-yen memo
+value within the useful life:
+
+    python -m proposal_generator.ppa_bench              # check (exit 1 on drift / slowdown)
+    python -m proposal_generator.ppa_bench --update     # re-record after an intended change
+    python -m proposal_generator.ppa_bench --no-timing  # outputs only (e.g. on a busy CI box)
+
+Run from the プレゼン資料プロジェクト directory. Timings are machine dependent:
+re-record them (--update) on the machine that runs the check, and treat
+--max-slowdown as a coarse guard rather than a precise budget.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from proposal_generator.epc_calc import MEMO_VALUE, TAX_REGIMES, USEFUL_LIFE_YEARS, depreciation_schedule
+from proposal_generator.finance_products import load_finance_products
+from proposal_generator.ppa_batch import auto_calc_ppa_batch
+from proposal_generator.ppa_calc import (
+    _bank_loan_schedule_cached,
+    auto_calc_ppa,
+    calc_bank_loan_annual_payments,
+    clear_auto_calc_ppa_cache,
+    irr,
+    irr_result,
+)
+
+GOLDEN_PATH = Path(__file__).resolve().parent / "ppa_golden.json"
+
+DEFAULT_REPEAT = 5
+DEFAULT_MAX_SLOWDOWN = 2.0   # fail when a benchmark is this many times slower than recorded
+TIMING_SLACK_MS = 1.0        # absolute allowance so sub-millisecond benchmarks do not flap
+DEFAULT_REL_TOL = 1e-9
+
+BATCH_SIZE = 10_000          # vectorised batch (auto_calc_ppa_batch)
+SCALAR_BATCH_SIZE = 300      # quarter-end re-pricing through auto_calc_ppa
+BATCH_SEED = 20240401
+BATCH_SAMPLE_ROWS = 20
+
+
+# ---------------------------------------------------------------------------
+# Reference inputs
+# ---------------------------------------------------------------------------
+
+# Representative deals (lease / bank loan / unregistered lessor / surplus sales)
+REFERENCE_DEALS: dict[str, dict] = {
+    "ce_lease_20y": dict(
+        self_consumption_y1_kwh=420_000, surplus_y1_kwh=30_000, selling_price=80_000_000,
+        subsidy_amount=0, lease_company="シーエナジー", lease_rate_pct=0.0,
+        lease_years=20, contract_years=20, system_kw=400,
+    ),
+    "mizuho_lease_15y_subsidy": dict(
+        self_consumption_y1_kwh=310_000, surplus_y1_kwh=12_000, selling_price=62_000_000,
+        subsidy_amount=15_000_000, lease_company="みずほリース", lease_rate_pct=0.0,
+        lease_years=15, contract_years=20, system_kw=300,
+    ),
+    "gunma_loan_15y": dict(
+        self_consumption_y1_kwh=520_000, surplus_y1_kwh=0, selling_price=95_000_000,
+        subsidy_amount=10_000_000, lease_company="群馬銀行", lease_rate_pct=0.0,
+        lease_years=15, contract_years=20, system_kw=500,
+    ),
+    "gunma_loan_10y_surplus": dict(
+        self_consumption_y1_kwh=180_000, surplus_y1_kwh=60_000, selling_price=40_000_000,
+        subsidy_amount=0, lease_company="群馬銀行", lease_rate_pct=0.0,
+        lease_years=10, contract_years=15, system_kw=200, fit_price=10.0,
+        include_surplus=True,
+    ),
+    "other_lease_screen_rate": dict(
+        self_consumption_y1_kwh=250_000, surplus_y1_kwh=20_000, selling_price=50_000_000,
+        subsidy_amount=5_000_000, lease_company="その他", lease_rate_pct=6.0,
+        lease_years=17, contract_years=17, system_kw=250, target_dscr=1.25,
+    ),
+    "no_principal": dict(
+        self_consumption_y1_kwh=100_000, surplus_y1_kwh=0, selling_price=20_000_000,
+        subsidy_amount=20_000_000, lease_company="シーエナジー", lease_rate_pct=0.0,
+        lease_years=10, contract_years=10, system_kw=100,
+    ),
+}
+
+# Cashflow series for irr(): [-investment, inflows...]
+IRR_SERIES: dict[str, list[float]] = {
+    "lease_20y": [-80_000_000] + [6_200_000 * 0.995 ** t for t in range(20)],
+    "loan_declining": [-85_000_000] + [9_500_000 - 250_000 * t for t in range(15)],
+    "near_zero": [-50_000_000] + [2_600_000] * 20,
+    "negative_rate": [-60_000_000] + [2_500_000] * 20,
+    "high_rate": [-10_000_000] + [4_000_000] * 10,
+}
+
+# Bank loan schedules (principal, annual_rate, term_years)
+LOAN_CASES: dict[str, tuple[float, float, int]] = {
+    "gunma_15y": (85_000_000, 0.018, 15),
+    "gunma_10y": (40_000_000, 0.018, 10),
+    "high_rate_20y": (120_000_000, 0.045, 20),
+    "zero_rate_12y": (30_000_000, 0.0, 12),
+    "odd_principal_7y": (12_345_678, 0.021, 7),
+}
+
+
+def synthetic_deals(n: int, seed: int = BATCH_SEED) -> dict[str, np.ndarray]:
+    """Reproducible random deals (auto_calc_ppa_batch() arguments as arrays)."""
+    rng = np.random.default_rng(seed)
+    companies = np.array(list(load_finance_products()) + ["その他"], dtype=object)
+    selling_price = np.round(rng.uniform(5e6, 3e8, n), -3)
+    return {
+        "self_consumption_y1_kwh": np.round(rng.uniform(1e4, 1e6, n)),
+        "surplus_y1_kwh": np.round(rng.uniform(0, 2e5, n)),
+        "selling_price": selling_price,
+        "subsidy_amount": np.round(selling_price * rng.choice([0.0, 0.1, 0.25, 0.5], n), -3),
+        "lease_company": companies[rng.integers(0, len(companies), n)],
+        "lease_rate_pct": np.round(rng.uniform(0.5, 8.0, n), 2),
+        "lease_years": rng.integers(10, 21, n),
+        "contract_years": rng.integers(10, 26, n),
+        "system_kw": np.round(rng.uniform(20, 1000, n), 1),
+        "fit_price": np.round(rng.uniform(0, 15, n), 2),
+    }
+
+
+def _deal_rows(deals: dict[str, np.ndarray]) -> list[dict]:
+    """Column arrays -> one auto_calc_ppa() kwargs dict per deal (Python scalars)."""
+    n = len(next(iter(deals.values())))
+    return [{k: v[i].item() if hasattr(v[i], "item") else v[i] for k, v in deals.items()} for i in range(n)]
+
+
+# ---------------------------------------------------------------------------
+# Golden outputs
+# ---------------------------------------------------------------------------
+
+def _jsonable(value):
+    """Convert results (numpy scalars / arrays, CashflowTable, NaN) to plain JSON values."""
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return [_jsonable(v) for v in value.tolist()]
+    if isinstance(value, np.generic):
+        return _jsonable(value.item())
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if hasattr(value, "to_records"):
+        return _jsonable(value.to_records())
+    return value
+
+
+def _batch_summary(table: dict[str, np.ndarray]) -> dict:
+    """Per-column checksums of a batch result plus the first rows."""
+    summary = {"n": len(table["valid"]), "n_valid": int(np.sum(table["valid"])), "columns": {}}
+    for key, col in table.items():
+        if col.dtype.kind in "fiub":
+            values = col.astype(float)
+            finite = values[np.isfinite(values)]
+            summary["columns"][key] = {
+                "sum": float(finite.sum()),
+                "min": float(finite.min()) if finite.size else None,
+                "max": float(finite.max()) if finite.size else None,
+                "n_nan": int(np.isnan(values).sum()),
+            }
+    summary["head"] = {key: col[:BATCH_SAMPLE_ROWS] for key, col in table.items()}
+    return summary
+
+
+def golden_outputs() -> dict:
+    """Every output covered by the regression check, as plain JSON values."""
+    clear_auto_calc_ppa_cache()
+    irr_outputs = {}
+    for name, cashflows in IRR_SERIES.items():
+        res = irr_result(cashflows)
+        irr_outputs[name] = {"rate": res["rate"], "converged": res["converged"], "status": res["status"]}
+
+    batch = auto_calc_ppa_batch(**synthetic_deals(BATCH_SIZE))
+    scalar = [auto_calc_ppa(**deal) for deal in _deal_rows(synthetic_deals(SCALAR_BATCH_SIZE, BATCH_SEED + 1))]
+    return _jsonable({
+        "auto_calc_ppa": {name: auto_calc_ppa(**deal) for name, deal in REFERENCE_DEALS.items()},
+        "irr": irr_outputs,
+        "calc_bank_loan_annual_payments": {
+            name: calc_bank_loan_annual_payments(*args) for name, args in LOAN_CASES.items()
+        },
+        "auto_calc_ppa_batch": _batch_summary(batch),
+        "auto_calc_ppa_scalar_batch": {
+            "min_ppa_price": [r["min_ppa_price"] for r in scalar],
+            "min_dscr": [r["min_dscr"] for r in scalar],
+            "irr_pct": [r["irr_pct"] for r in scalar],
+            "npv_yen": [r["npv_yen"] for r in scalar],
+        },
+    })
+
+
+def compare_outputs(expected, actual, rel_tol: float = DEFAULT_REL_TOL, path: str = "") -> list[str]:
+    """Differences between two JSON trees (floats within rel_tol, everything else exact)."""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        diffs = []
+        for key in sorted(set(expected) | set(actual)):
+            sub = f"{path}.{key}" if path else key
+            if key not in actual:
+                diffs.append(f"{sub}: missing")
+            elif key not in expected:
+                diffs.append(f"{sub}: unexpected")
+            else:
+                diffs.extend(compare_outputs(expected[key], actual[key], rel_tol, sub))
+        return diffs
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return [f"{path}: length {len(expected)} -> {len(actual)}"]
+        diffs = []
+        for i, (e, a) in enumerate(zip(expected, actual)):
+            diffs.extend(compare_outputs(e, a, rel_tol, f"{path}[{i}]"))
+        return diffs
+    if isinstance(expected, float) or isinstance(actual, float):
+        if isinstance(expected, (int, float)) and isinstance(actual, (int, float)) \
+                and not isinstance(expected, bool) and not isinstance(actual, bool) \
+                and math.isclose(expected, actual, rel_tol=rel_tol, abs_tol=rel_tol):
+            return []
+    elif expected == actual:
+        return []
+    return [f"{path}: {expected!r} -> {actual!r}"]
+
+
+DEPRECIATION_COSTS = (1_000_000, 12_345_678, 87_654_321, 300_000_000)
+
+
+def check_depreciation(costs=DEPRECIATION_COSTS) -> list[str]:
+    """Tax regimes whose schedule does not reach the memo value within the useful life.
+
+    The final year may only take a rounding remainder on top of the regular
+    amount, so a wrong rate cannot hide behind the last-year write-down.
+    """
+    problems = []
+    for name in TAX_REGIMES:
+        for cost in costs:
+            schedule = depreciation_schedule(cost, name, USEFUL_LIFE_YEARS + 3)
+            within = float(schedule[:USEFUL_LIFE_YEARS].sum())
+            last, previous = schedule[USEFUL_LIFE_YEARS - 1], schedule[USEFUL_LIFE_YEARS - 2]
+            if within != cost - MEMO_VALUE or schedule[USEFUL_LIFE_YEARS:].any():
+                problems.append(
+                    f"{name} cost={cost:,}: {within:,.0f} yen written down in "
+                    f"{USEFUL_LIFE_YEARS} years (expected {cost - MEMO_VALUE:,})"
+                )
+            elif previous > 0 and last > previous * 1.01:
+                problems.append(
+                    f"{name} cost={cost:,}: final-year catch-up {last:,.0f} yen "
+                    f"after {previous:,.0f} yen (schedule does not end on time)"
+                )
+    return problems
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+
+def _best_ms(fn, repeat: int) -> float:
+    """Best wall time of `repeat` calls in milliseconds."""
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run_benchmarks(repeat: int = DEFAULT_REPEAT) -> dict[str, float]:
+    """Best-of-`repeat` timings (ms) per benchmark.
+
+    "cold" runs clear the memo caches first, so they measure the arithmetic;
+    "warm" runs measure the cached path a Streamlit rerun takes.
+    """
+    deals = list(REFERENCE_DEALS.values())
+    batch = synthetic_deals(BATCH_SIZE)
+    scalar_batch = _deal_rows(synthetic_deals(SCALAR_BATCH_SIZE, BATCH_SEED + 1))
+    series = [s for name, s in IRR_SERIES.items() if irr_result(s)["converged"]]
+
+    def ppa_cold():
+        for deal in deals:
+            clear_auto_calc_ppa_cache()
+            auto_calc_ppa(**deal)
+
+    def ppa_warm():
+        for deal in deals:
+            auto_calc_ppa(**deal)
+
+    def loan_cold():
+        _bank_loan_schedule_cached.cache_clear()
+        for args in LOAN_CASES.values():
+            calc_bank_loan_annual_payments(*args)
+
+    def scalar_batch_cold():
+        clear_auto_calc_ppa_cache()
+        for deal in scalar_batch:
+            auto_calc_ppa(**deal)
+
+    ppa_warm()
+    return {
+        "auto_calc_ppa_cold": _best_ms(ppa_cold, repeat),
+        "auto_calc_ppa_warm": _best_ms(ppa_warm, repeat),
+        "irr": _best_ms(lambda: [irr(s) for s in series], repeat),
+        "calc_bank_loan_annual_payments_cold": _best_ms(loan_cold, repeat),
+        f"auto_calc_ppa_scalar_x{SCALAR_BATCH_SIZE}": _best_ms(scalar_batch_cold, max(1, repeat // 2)),
+        f"auto_calc_ppa_batch_x{BATCH_SIZE}": _best_ms(lambda: auto_calc_ppa_batch(**batch), repeat),
+    }
+
+
+def check_timings(
+    baseline: dict[str, float],
+    timings: dict[str, float],
+    max_slowdown: float = DEFAULT_MAX_SLOWDOWN,
+) -> list[str]:
+    """Benchmarks slower than max_slowdown x their recorded time (+ TIMING_SLACK_MS)."""
+    return [
+        f"{name}: {timings[name]:.2f} ms vs {baseline[name]:.2f} ms recorded "
+        f"(x{timings[name] / baseline[name]:.1f})"
+        for name in timings
+        if name in baseline and baseline[name] > 0
+        and timings[name] > baseline[name] * max_slowdown + TIMING_SLACK_MS
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Command line
+# ---------------------------------------------------------------------------
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--update", action="store_true", help="re-record golden outputs and timings")
+    parser.add_argument("--golden", type=Path, default=GOLDEN_PATH, help="golden file path")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timing repetitions")
+    parser.add_argument("--max-slowdown", type=float, default=DEFAULT_MAX_SLOWDOWN,
+                        help="fail when slower than this factor x recorded time")
+    parser.add_argument("--rel-tol", type=float, default=DEFAULT_REL_TOL,
+                        help="relative tolerance for float outputs")
+    parser.add_argument("--no-timing", action="store_true", help="skip the benchmarks")
+    args = parser.parse_args(argv)
+
+    outputs = golden_outputs()
+    timings = {} if args.no_timing else run_benchmarks(args.repeat)
+    for name, ms in timings.items():
+        print(f"{name:<40} {ms:10.2f} ms")
+
+    if args.update:
+        golden = {"outputs": outputs, "timings_ms": {k: round(v, 3) for k, v in timings.items()}}
+        if args.no_timing and args.golden.exists():
+            golden["timings_ms"] = json.loads(args.golden.read_text(encoding="utf-8")).get("timings_ms", {})
+        args.golden.write_text(json.dumps(golden, ensure_ascii=False, indent=1) + "\n", encoding="utf-8")
+        print(f"recorded {args.golden}")
+        return 0
+
+    if not args.golden.exists():
+        print(f"golden file not found: {args.golden} (run with --update)")
+        return 1
+    golden = json.loads(args.golden.read_text(encoding="utf-8"))
+
+    failures = compare_outputs(golden["outputs"], outputs, rel_tol=args.rel_tol)
+    for line in failures[:50]:
+        print(f"DRIFT  {line}")
+    if len(failures) > 50:
+        print(f"DRIFT  ... {len(failures) - 50} more")
+
+    slow = check_timings(golden.get("timings_ms", {}), timings, args.max_slowdown)
+    for line in slow:
+        print(f"SLOW   {line}")
+
+    invalid = check_depreciation()
+    for line in invalid:
+        print(f"DEPR   {line}")
+
+    if not (failures or slow or invalid):
+        print("OK")
+        return 0
+    print(f"FAILED: {len(failures)} drift, {len(slow)} slow, {len(invalid)} depreciation")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
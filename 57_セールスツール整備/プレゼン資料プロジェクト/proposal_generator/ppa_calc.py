@@ -10,54 +10,70 @@ Supports two financing types:
     with declining interest, plus fire insurance and depreciation tax
 
 Key assumptions:
-  - Generation & self-consumption degrade 0.5%/year
+  - Generation & self-consumption degrade 0.5%/year, or follow an explicit
+    per-year yield profile (generation_profile.py: LID, warranty, curtailment)
   - Surplus revenue: only if enabled (normally 0 due to RPR)
   - DSCR = Annual PPA Revenue / Annual Total Cost
   - For lease: worst DSCR is in the final year (fixed cost, declining generation)
   - For bank loan: worst DSCR could be any year (costs decline but so does generation)
 
-Finance rate defaults:
+Per-year arithmetic runs in the columnar NumPy engine (ppa_engine.py);
+the functions here keep the scalar, list-of-dicts interface.
+
+Finance rate defaults (finance_products.yaml):
   - シーエナジー (CE): IRR = 3.10% (their minimum)
-  - みずほリース:      5.50% fixed
+  - みずほリース:      5.50% fixed, 10% re-lease after the term
   - 群馬銀行:          1.80% bank loan
 """
 
 from __future__ import annotations
 
+import functools
 import math
 
+import numpy as np
+
+from proposal_generator.finance_products import (
+    FINANCE_TYPE_LEASE,
+    FINANCE_TYPE_LOAN,
+    finance_schedule_arrays,
+    get_finance_product,
+    load_finance_products,
+)
+from proposal_generator.generation_profile import DEGRADATION_RATE
+from proposal_generator.ppa_engine import (
+    IRR_STATUS_LABELS,
+    cashflow_arrays,
+    lease_payment_matrix,
+    loan_schedule_arrays,
+    loan_schedule_monthly_arrays,
+    min_price_arrays,
+    monthly_cashflow_arrays,
+    pad_schedule,
+    solve_irr_arrays,
+)
+
 
 # ---------------------------------------------------------------------------
 # Finance type constants
 # ---------------------------------------------------------------------------
 
-FINANCE_TYPE_LEASE = "lease"
-FINANCE_TYPE_LOAN = "loan"
-
-# Map company names to finance types
+# Company conditions (type, rate, re-lease, revenue share, insurance,
+# depreciation tax) are declared in finance_products.yaml; the maps below are
+# read-only views kept for existing callers.
 FINANCE_TYPE_MAP: dict[str, str] = {
-    "シーエナジー": FINANCE_TYPE_LEASE,
-    "みずほリース": FINANCE_TYPE_LEASE,
-    "群馬銀行": FINANCE_TYPE_LOAN,
+    name: product.finance_type for name, product in load_finance_products().items()
 }
 
 # Default rates per company (replaces old LEASE_RATE_MAP)
 DEFAULT_RATE_MAP: dict[str, float] = {
-    "シーエナジー": 0.0310,   # CE target IRR = 3.10%
-    "みずほリース": 0.0550,   # Fixed 5.5%
-    "群馬銀行": 0.0180,       # Bank loan 1.8%
+    name: product.rate for name, product in load_finance_products().items()
+    if product.rate is not None
 }
 
 # Keep backward compatibility alias
 LEASE_RATE_MAP = DEFAULT_RATE_MAP
 
-# Revenue share (シーエナジー: post-lease revenue split)
-CE_REVENUE_SHARE_RATE = 0.0  # Currently 0% per PPAリース U14 default
-
-# Re-lease (みずほリース: 1/10 of original lease for years after lease term)
-MIZUHO_RELEASE_RATIO = 0.1  # 再リース = original_lease * 10%
-
-DEGRADATION_RATE = 0.005  # 0.5% per year
 
 # Default O&M costs (from PPAリース sheet)
 DEFAULT_MAINTENANCE_YEN_PER_KW = 1_200   # 保守メンテナンス費 (円/kW/年)
@@ -99,29 +115,47 @@ def npv(rate: float, cashflows: list[float]) -> float:
     return sum(cf / (1 + rate) ** (i + 1) for i, cf in enumerate(cashflows))
 
 
-def irr(cashflows: list[float], guess: float = 0.05, tol: float = 1e-7, max_iter: int = 200) -> float:
-    """Internal Rate of Return via Newton-Raphson.
+def irr_result(cashflows: list[float], guess: float = 0.05, tol: float = 1e-10, max_iter: int = 100) -> dict:
+    """Internal Rate of Return with solver diagnostics.
+
+    Bracketed safeguarded-Newton solver (ppa_engine.solve_irr_arrays).
+    cashflows[0] = initial investment (negative), cashflows[1..] = annual inflows.
+
+    Returns:
+        dict with rate (None unless converged), converged, iterations, status
+    """
+    res = solve_irr_arrays([cashflows], guess=guess, tol=tol, max_iter=max_iter)
+    converged = bool(res["converged"][0])
+    return {
+        "rate": float(res["rate"][0]) if converged else None,
+        "converged": converged,
+        "iterations": int(res["iterations"][0]),
+        "status": IRR_STATUS_LABELS[int(res["status"][0])],
+    }
+
+
+def irr(cashflows: list[float], guess: float = 0.05, tol: float = 1e-10, max_iter: int = 100) -> float:
+    """Internal Rate of Return.
 
     cashflows[0] = initial investment (negative), cashflows[1..] = annual inflows.
+
+    Raises:
+        ValueError: if the solver finds no root (no sign change) or does not converge
     """
-    r = guess
-    for _ in range(max_iter):
-        f = sum(cf / (1 + r) ** i for i, cf in enumerate(cashflows))
-        df = sum(-i * cf / (1 + r) ** (i + 1) for i, cf in enumerate(cashflows))
-        if df == 0:
-            break
-        r_new = r - f / df
-        if abs(r_new - r) < tol:
-            return r_new
-        r = r_new
-    return r
+    res = irr_result(cashflows, guess=guess, tol=tol, max_iter=max_iter)
+    if not res["converged"]:
+        raise ValueError(f"IRR did not converge ({res['status']}, {res['iterations']} iterations)")
+    return res["rate"]
 
 
 # ---------------------------------------------------------------------------
 # Bank loan specific helpers
 # ---------------------------------------------------------------------------
 
-def calc_fire_insurance_annual(selling_price: float) -> int:
+def calc_fire_insurance_annual(
+    selling_price: float,
+    per_million: float = FIRE_INSURANCE_PER_MILLION,
+) -> int:
     """Calculate annual fire insurance for bank loan (群馬銀行).
 
     Formula: ceil(selling_price / 1,000,000 * 3,107 / 1000) * 1000
@@ -129,14 +163,20 @@ def calc_fire_insurance_annual(selling_price: float) -> int:
 
     Args:
         selling_price: Equipment selling price (yen)
+        per_million:   Premium per million yen of equipment (product setting)
 
     Returns:
         Annual fire insurance amount (yen), rounded up to nearest 1,000
     """
-    return math.ceil(selling_price / 1_000_000 * FIRE_INSURANCE_PER_MILLION / 1000) * 1000
+    return math.ceil(selling_price / 1_000_000 * per_million / 1000) * 1000
 
 
-def calc_depreciation_tax_schedule(selling_price: float, term_years: int) -> list[int]:
+def calc_depreciation_tax_schedule(
+    selling_price: float,
+    term_years: int,
+    rate_r: float = DEPRECIATION_RATE_R,
+    tax_rate: float = DEPRECIATION_TAX_RATE,
+) -> list[int]:
     """Calculate yearly depreciation tax (償却資産税) schedule for bank loan.
 
     Year 1 assessed value = selling_price * (1 - r/2) = price * 0.9365
@@ -147,25 +187,42 @@ def calc_depreciation_tax_schedule(selling_price: float, term_years: int) -> lis
     Args:
         selling_price: Equipment selling price (yen)
         term_years:    Financing term (years)
+        rate_r:        減価率 r (product setting)
+        tax_rate:      償却資産税率 (product setting)
 
     Returns:
         List of annual depreciation tax amounts (length = term_years)
     """
     schedule: list[int] = []
-    assessed = selling_price * (1 - DEPRECIATION_RATE_R / 2)
+    assessed = selling_price * (1 - rate_r / 2)
 
     for year in range(1, term_years + 1):
         if year >= 2:
-            assessed = assessed * (1 - DEPRECIATION_RATE_R)
+            assessed = assessed * (1 - rate_r)
 
         # Truncate to nearest 1,000 yen
         truncated = int(assessed // 1000) * 1000
-        tax = truncated * DEPRECIATION_TAX_RATE
+        tax = truncated * tax_rate
         schedule.append(round(tax))
 
     return schedule
 
 
+@functools.lru_cache(maxsize=512)
+def _bank_loan_schedule_cached(
+    principal: float,
+    annual_rate: float,
+    term_years: int,
+) -> tuple[tuple[int, int, int], ...]:
+    """Memoized (principal, interest, total) per year, keyed on (principal, rate, term)."""
+    sched = loan_schedule_arrays(principal, annual_rate, term_years, term_years)
+    return tuple(zip(
+        (int(v) for v in sched["principal"][0].tolist()),
+        (int(v) for v in sched["interest"][0].tolist()),
+        (int(v) for v in sched["total"][0].tolist()),
+    ))
+
+
 def calc_bank_loan_annual_payments(
     principal: float,
     annual_rate: float,
@@ -174,6 +231,9 @@ def calc_bank_loan_annual_payments(
     """Calculate bank loan annual payment schedule (元金均等返済).
 
     Equal principal repayment each month, with declining interest.
+    Per-year sums are computed in closed form (ppa_engine.loan_schedule_arrays)
+    and memoized on (principal, annual_rate, term_years); calc_lease_payment
+    and auto_calc_ppa share the cached schedule.
 
     Args:
         principal:    Loan principal (yen)
@@ -183,32 +243,13 @@ def calc_bank_loan_annual_payments(
     Returns:
         List of dicts: [{"year": y, "principal": p, "interest": i, "total": p+i}, ...]
     """
-    total_months = term_years * 12
-    monthly_principal = principal / total_months
-    monthly_rate = annual_rate / 12
-
-    schedule: list[dict] = []
-    for year in range(1, term_years + 1):
-        year_principal = 0.0
-        year_interest = 0.0
-
-        for month_in_year in range(12):
-            # Global month index (0-based)
-            m = (year - 1) * 12 + month_in_year
-            remaining = principal - monthly_principal * m
-            interest = remaining * monthly_rate
-
-            year_principal += monthly_principal
-            year_interest += interest
-
-        schedule.append({
-            "year": year,
-            "principal": round(year_principal),
-            "interest": round(year_interest),
-            "total": round(year_principal + year_interest),
-        })
-
-    return schedule
+    if term_years <= 0:
+        return []
+    cached = _bank_loan_schedule_cached(float(principal), float(annual_rate), int(term_years))
+    return [
+        {"year": year, "principal": p, "interest": i, "total": total}
+        for year, (p, i, total) in enumerate(cached, start=1)
+    ]
 
 
 # ---------------------------------------------------------------------------
@@ -222,9 +263,9 @@ def get_finance_type(company: str) -> str:
         company: Finance company name
 
     Returns:
-        FINANCE_TYPE_LEASE or FINANCE_TYPE_LOAN
+        FINANCE_TYPE_LEASE or FINANCE_TYPE_LOAN (lease for unregistered companies)
     """
-    return FINANCE_TYPE_MAP.get(company, FINANCE_TYPE_LEASE)
+    return get_finance_product(company).finance_type
 
 
 # ---------------------------------------------------------------------------
@@ -252,14 +293,10 @@ def calc_lease_payment(
     Returns:
         (annual_payment, effective_rate)
     """
-    # Determine rate
-    rate = DEFAULT_RATE_MAP.get(lease_company)
-    if rate is None:
-        rate = lease_rate_pct / 100.0
-
-    finance_type = get_finance_type(lease_company)
+    product = get_finance_product(lease_company)
+    rate = product.effective_rate(lease_rate_pct)
 
-    if finance_type == FINANCE_TYPE_LOAN:
+    if product.is_loan:
         # For bank loan, return year-1 payment as representative
         loan_schedule = calc_bank_loan_annual_payments(principal, rate, lease_years)
         annual_payment = loan_schedule[0]["total"] if loan_schedule else 0.0
@@ -287,6 +324,30 @@ def calc_annual_om_cost(
     return system_kw * maintenance_yen_per_kw + insurance_yen_fixed
 
 
+def _finance_cost_rows(
+    finance_type: str,
+    annual_lease_payment: float,
+    lease_years: int,
+    n_years: int,
+    loan_payment_schedule: list[dict] | None,
+    fire_insurance_annual: float,
+    depreciation_tax_schedule: list[int] | None,
+) -> tuple[np.ndarray, np.ndarray | None, np.ndarray | None]:
+    """Per-year finance cost rows (payment, fire insurance, depreciation tax) for the engine.
+
+    Bank loan (with schedule): loan totals; otherwise the constant annual payment.
+    Fire insurance / depreciation tax rows are added when the product has them.
+    Rows have shape (1, n_years); the engine masks out years after lease_years.
+    """
+    if finance_type == FINANCE_TYPE_LOAN and loan_payment_schedule:
+        payment = pad_schedule([s["total"] for s in loan_payment_schedule], n_years)[None, :]
+    else:
+        payment = lease_payment_matrix(annual_lease_payment, lease_years, n_years)
+    fire_ins = np.full((1, n_years), float(fire_insurance_annual)) if fire_insurance_annual else None
+    dep_tax = pad_schedule(depreciation_tax_schedule, n_years)[None, :] if depreciation_tax_schedule else None
+    return payment, fire_ins, dep_tax
+
+
 def calc_min_ppa_price(
     self_consumption_y1_kwh: float,
     surplus_y1_kwh: float,
@@ -301,6 +362,7 @@ def calc_min_ppa_price(
     loan_payment_schedule: list[dict] | None = None,
     fire_insurance_annual: int = 0,
     depreciation_tax_schedule: list[int] | None = None,
+    yield_profile=None,
 ) -> float:
     """Calculate minimum PPA unit price to achieve target_dscr in all years.
 
@@ -322,71 +384,42 @@ def calc_min_ppa_price(
         annual_om_cost:          Annual O&M cost (yen) -- added to denominator
         finance_type:            FINANCE_TYPE_LEASE or FINANCE_TYPE_LOAN
         loan_payment_schedule:   Year-by-year bank loan payments (for LOAN only)
-        fire_insurance_annual:   Annual fire insurance (for LOAN only)
-        depreciation_tax_schedule: Year-by-year depreciation tax (for LOAN only)
+        fire_insurance_annual:   Annual fire insurance (products with insurance, e.g. bank loan)
+        depreciation_tax_schedule: Year-by-year depreciation tax (products with 償却資産税)
+        yield_profile:           Per-year generation multipliers replacing degradation
+                                 (generation_profile()), or None
 
     Returns:
         Minimum PPA unit price (yen/kWh), rounded up to nearest 0.5 yen
     """
-    if self_consumption_y1_kwh <= 0 or annual_lease_payment <= 0:
-        # For bank loan, check loan schedule instead
-        if finance_type == FINANCE_TYPE_LOAN and loan_payment_schedule:
-            pass  # proceed with loan schedule
-        elif self_consumption_y1_kwh <= 0:
-            return 0.0
-        else:
-            return 0.0
-
-    if finance_type == FINANCE_TYPE_LOAN and loan_payment_schedule:
-        # Bank loan: check every year to find worst DSCR scenario
-        dep_schedule = depreciation_tax_schedule or [0] * lease_years
-        max_required_price = 0.0
-
-        for year in range(1, lease_years + 1):
-            decay = (1 - degradation) ** (year - 1)
-            sc = self_consumption_y1_kwh * decay
-            sur = surplus_y1_kwh * decay if include_surplus else 0.0
-
-            # Year's total cost
-            loan_pay = loan_payment_schedule[year - 1]["total"] if year <= len(loan_payment_schedule) else 0
-            dep_tax = dep_schedule[year - 1] if year <= len(dep_schedule) else 0
-            total_cost = loan_pay + annual_om_cost + fire_insurance_annual + dep_tax
-
-            required_revenue = total_cost * target_dscr
-            surplus_revenue = sur * fit_price
-            required_ppa_revenue = required_revenue - surplus_revenue
-
-            if required_ppa_revenue <= 0 or sc <= 0:
-                continue
-
-            price_this_year = required_ppa_revenue / sc
-            if price_this_year > max_required_price:
-                max_required_price = price_this_year
-
-        if max_required_price <= 0:
-            return 0.0
-
-        # Round up to nearest 0.5 yen
-        return math.ceil(max_required_price * 2) / 2
-
-    else:
-        # Lease: worst year is final year (fixed cost, declining generation)
-        decay = (1 - degradation) ** (lease_years - 1)
-        min_self_consume = self_consumption_y1_kwh * decay
-        min_surplus = surplus_y1_kwh * decay if include_surplus else 0.0
-
-        total_cost = annual_lease_payment + annual_om_cost
-        required_revenue = total_cost * target_dscr
-        surplus_revenue = min_surplus * fit_price
-        required_ppa_revenue = required_revenue - surplus_revenue
-
-        if required_ppa_revenue <= 0:
-            return 0.0
-
-        raw_price = required_ppa_revenue / min_self_consume
-
-        # Round up to nearest 0.5 yen
-        return math.ceil(raw_price * 2) / 2
+    is_loan = finance_type == FINANCE_TYPE_LOAN and bool(loan_payment_schedule)
+    if self_consumption_y1_kwh <= 0:
+        return 0.0
+    if not is_loan and annual_lease_payment <= 0:
+        return 0.0
+
+    # Lease: worst year is the final year (fixed cost, declining generation).
+    # Bank loan: every year is checked since costs decline too.
+    # The engine evaluates all term years at once and takes the maximum.
+    payment, fire_ins, dep_tax = _finance_cost_rows(
+        finance_type, annual_lease_payment, lease_years, lease_years,
+        loan_payment_schedule, fire_insurance_annual, depreciation_tax_schedule,
+    )
+    _, price = min_price_arrays(
+        self_consumption_y1_kwh=self_consumption_y1_kwh,
+        surplus_y1_kwh=surplus_y1_kwh,
+        finance_payment=payment,
+        lease_years=lease_years,
+        degradation=degradation,
+        fit_price=fit_price,
+        include_surplus=include_surplus,
+        target_dscr=target_dscr,
+        annual_om_cost=annual_om_cost,
+        fire_insurance=fire_ins,
+        depreciation_tax=dep_tax,
+        yield_profile=yield_profile,
+    )
+    return float(price[0])
 
 
 def calc_cashflow_table(
@@ -405,7 +438,8 @@ def calc_cashflow_table(
     fire_insurance_annual: int = 0,
     depreciation_tax_schedule: list[int] | None = None,
     company: str = "",
-) -> list[dict]:
+    yield_profile=None,
+) -> CashflowTable:
     """Generate year-by-year cashflow table for the PPA period.
 
     For lease: total_cost = lease_payment + om_cost (constant)
@@ -413,81 +447,418 @@ def calc_cashflow_table(
 
     DSCR = Revenue / Total Cost
 
-    Returns list of dicts with keys:
+    yield_profile (generation_profile()) replaces the geometric degradation.
+
+    Returns a CashflowTable with columns (row dicts on iteration):
         year, self_consumption_kwh, surplus_kwh, ppa_revenue, surplus_revenue,
-        total_revenue, lease_payment, om_cost, fire_insurance, depreciation_tax,
-        total_cost, net_cashflow, dscr
+        total_revenue, lease_payment, om_cost, total_cost, net_cashflow, dscr
+        (+ fire_insurance, depreciation_tax, loan_principal, loan_interest for loans)
     """
-    rows = []
-    dep_schedule = depreciation_tax_schedule or []
-
-    for year in range(1, contract_years + 1):
-        decay = (1 - degradation) ** (year - 1)
-        sc = self_consumption_y1_kwh * decay
-        sur = surplus_y1_kwh * decay if include_surplus else 0.0
-
-        ppa_rev = sc * ppa_unit_price
-        sur_rev = sur * fit_price
-        total_rev = ppa_rev + sur_rev
-
-        # Determine year's costs based on finance type
-        if year <= lease_years:
-            om = annual_om_cost
-
-            if finance_type == FINANCE_TYPE_LOAN and loan_payment_schedule:
-                lp = loan_payment_schedule[year - 1]["total"] if year <= len(loan_payment_schedule) else 0
-                fi = fire_insurance_annual
-                dt = dep_schedule[year - 1] if year <= len(dep_schedule) else 0
-            else:
-                lp = annual_lease_payment
-                fi = 0
-                dt = 0
-        else:
-            # After finance term expires
-            om = 0.0
-            fi = 0
-            dt = 0
-            # Re-lease for みずほリース
-            if finance_type == FINANCE_TYPE_LEASE and company == "みずほリース":
-                lp = annual_lease_payment * MIZUHO_RELEASE_RATIO
-            else:
-                lp = 0.0
-
-        total_cost = lp + om + fi + dt
-
-        # Revenue share for シーエナジー (post-lease only)
-        revenue_share = 0.0
-        if year > lease_years and company == "シーエナジー" and CE_REVENUE_SHARE_RATE > 0:
-            revenue_share = (total_rev - om) * CE_REVENUE_SHARE_RATE
-            total_cost += revenue_share
-
-        net_cf = total_rev - total_cost
-        dscr = total_rev / total_cost if total_cost > 0 else float("inf")
-
-        row = {
-            "year": year,
-            "self_consumption_kwh": round(sc),
-            "surplus_kwh": round(sur),
-            "ppa_revenue": round(ppa_rev),
-            "surplus_revenue": round(sur_rev),
-            "total_revenue": round(total_rev),
-            "lease_payment": round(lp),
-            "om_cost": round(om),
-            "total_cost": round(total_cost),
-            "net_cashflow": round(net_cf),
-            "dscr": round(dscr, 3) if total_cost > 0 else None,
-        }
+    is_loan = finance_type == FINANCE_TYPE_LOAN and bool(loan_payment_schedule)
+    payment, fire_ins, dep_tax = _finance_cost_rows(
+        finance_type, annual_lease_payment, lease_years, contract_years,
+        loan_payment_schedule, fire_insurance_annual, depreciation_tax_schedule,
+    )
+
+    # Post-term re-lease (e.g. みずほリース) and revenue share (e.g. シーエナジー)
+    product = get_finance_product(company)
+    post_term_payment = 0.0
+    if finance_type == FINANCE_TYPE_LEASE:
+        post_term_payment = annual_lease_payment * product.release_ratio
+    revenue_share_rate = product.revenue_share_rate
+
+    arrays = cashflow_arrays(
+        self_consumption_y1_kwh=self_consumption_y1_kwh,
+        surplus_y1_kwh=surplus_y1_kwh,
+        ppa_unit_price=ppa_unit_price,
+        fit_price=fit_price,
+        finance_payment=payment,
+        lease_years=lease_years,
+        contract_years=contract_years,
+        degradation=degradation,
+        include_surplus=include_surplus,
+        annual_om_cost=annual_om_cost,
+        fire_insurance=fire_ins,
+        depreciation_tax=dep_tax,
+        post_term_payment=post_term_payment,
+        revenue_share_rate=revenue_share_rate,
+        yield_profile=yield_profile,
+    )
+    return CashflowTable.from_arrays(
+        arrays,
+        finance_type=finance_type,
+        loan_payment_schedule=loan_payment_schedule if is_loan else None,
+    )
+
+
+def cashflow_rows(
+    arrays: dict,
+    finance_type: str = FINANCE_TYPE_LEASE,
+    loan_payment_schedule: list[dict] | None = None,
+    scenario: int = 0,
+) -> list[dict]:
+    """Convert one scenario of ppa_engine.cashflow_arrays() to the list-of-dicts table.
+
+    Kept for list-of-dicts callers; see CashflowTable.from_arrays().
+    """
+    return CashflowTable.from_arrays(arrays, finance_type, loan_payment_schedule, scenario).to_records()
+
+
+# ---------------------------------------------------------------------------
+# Cashflow table result type
+# ---------------------------------------------------------------------------
+
+# Field -> column label (Japanese) for display / export, in table order
+CASHFLOW_LABELS: dict[str, str] = {
+    "year": "年",
+    "self_consumption_kwh": "自家消費(kWh)",
+    "surplus_kwh": "余剰(kWh)",
+    "ppa_revenue": "PPA収入(円)",
+    "surplus_revenue": "余剰収入(円)",
+    "total_revenue": "収入合計(円)",
+    "lease_payment": "リース料(円)",
+    "om_cost": "O&M(円)",
+    "total_cost": "費用合計(円)",
+    "net_cashflow": "純CF(円)",
+    "dscr": "DSCR",
+    "fire_insurance": "火災保険(円)",
+    "depreciation_tax": "償却資産税(円)",
+    "loan_principal": "元金(円)",
+    "loan_interest": "利息(円)",
+}
+
+_ROUNDED_FIELDS = (
+    "self_consumption_kwh", "surplus_kwh", "ppa_revenue", "surplus_revenue",
+    "total_revenue", "lease_payment", "om_cost", "total_cost", "net_cashflow",
+)
+_LOAN_COST_FIELDS = ("fire_insurance", "depreciation_tax")
+_LOAN_SCHEDULE_FIELDS = ("loan_principal", "loan_interest")
+
 
-        # Add bank loan specific fields
+class CashflowTable:
+    """Year-by-year PPA cashflow stored column-wise (one read-only array per field).
+
+    Replaces the list of per-year dicts: columns are exported to pandas
+    without copying, and indexing / iterating still yields the old row dicts
+    (built on access), so existing callers keep working:
+
+        table = auto_calc_ppa(...)["cashflow_table"]
+        table.column("dscr")            # np.ndarray, NaN where no cost
+        table[0]["net_cashflow"]        # int, as before
+        table.to_pandas(labels=True)    # 年, 自家消費(kWh), ... DSCR
+
+    Money / kWh columns are whole numbers (int64); dscr is float (NaN = None).
+    Loan tables add fire_insurance / depreciation_tax, and loan_principal /
+    loan_interest (NaN after the loan schedule ends, omitted from row dicts).
+    """
+
+    __slots__ = ("_columns", "_n_years")
+
+    def __init__(self, columns: dict[str, np.ndarray]):
+        n_years = len(columns["year"]) if columns else 0
+        frozen = {}
+        for name, values in columns.items():
+            arr = np.asarray(values)
+            if arr.shape != (n_years,):
+                raise ValueError(f"column {name!r} has shape {arr.shape}, expected ({n_years},)")
+            if arr.flags.writeable:
+                # Owned arrays are frozen in place; views are copied so their base stays editable
+                arr = arr.copy() if arr.base is not None else arr
+                arr.setflags(write=False)
+            frozen[name] = arr
+        self._columns = frozen
+        self._n_years = n_years
+
+    @classmethod
+    def from_arrays(
+        cls,
+        arrays: dict,
+        finance_type: str = FINANCE_TYPE_LEASE,
+        loan_payment_schedule: list[dict] | None = None,
+        scenario: int = 0,
+    ) -> "CashflowTable":
+        """Build the table from one scenario of ppa_engine.cashflow_arrays().
+
+        Args:
+            arrays:                Result of ppa_engine.cashflow_arrays()
+            finance_type:          FINANCE_TYPE_LEASE or FINANCE_TYPE_LOAN
+            loan_payment_schedule: Bank loan schedule (adds loan_principal / loan_interest)
+            scenario:              Row index of the scenario to convert
+        """
+        n_years = int(arrays["in_contract"][scenario].sum())
+        columns = {"year": np.arange(1, n_years + 1)}
+        for key in _ROUNDED_FIELDS:
+            columns[key] = np.rint(arrays[key][scenario, :n_years]).astype(np.int64)
+
+        # DSCR rounded like round(x, 3) (NumPy rounding can differ in the last digit)
+        total_cost = arrays["total_cost"][scenario, :n_years].tolist()
+        columns["dscr"] = np.array([
+            round(d, 3) if c > 0 else np.nan
+            for d, c in zip(arrays["dscr"][scenario, :n_years].tolist(), total_cost)
+        ], dtype=float)
+
+        # Bank loan specific fields
         if finance_type == FINANCE_TYPE_LOAN:
-            row["fire_insurance"] = round(fi)
-            row["depreciation_tax"] = round(dt)
-            if loan_payment_schedule and year <= len(loan_payment_schedule):
-                row["loan_principal"] = loan_payment_schedule[year - 1]["principal"]
-                row["loan_interest"] = loan_payment_schedule[year - 1]["interest"]
+            for key in _LOAN_COST_FIELDS:
+                columns[key] = np.rint(arrays[key][scenario, :n_years]).astype(np.int64)
+            if loan_payment_schedule:
+                schedule = loan_payment_schedule[:n_years]
+                for key, src in zip(_LOAN_SCHEDULE_FIELDS, ("principal", "interest")):
+                    col = np.full(n_years, np.nan)
+                    col[:len(schedule)] = [row[src] for row in schedule]
+                    columns[key] = col
+        return cls(columns)
+
+    # -- columnar access ---------------------------------------------------
+
+    @property
+    def columns(self) -> tuple[str, ...]:
+        """Field names in table order."""
+        return tuple(self._columns)
+
+    def column(self, name: str) -> np.ndarray:
+        """Read-only array of one field (no copy)."""
+        return self._columns[name]
+
+    def to_dict(self) -> dict[str, np.ndarray]:
+        """Field -> read-only array mapping (no copy)."""
+        return dict(self._columns)
+
+    def to_pandas(self, labels: bool = False):
+        """DataFrame sharing the column arrays (pandas is imported on demand).
+
+        Args:
+            labels: rename fields to the Japanese CASHFLOW_LABELS headers
+        """
+        import pandas as pd
+
+        df = pd.DataFrame(self._columns, copy=False)
+        if labels:
+            df = df.rename(columns=CASHFLOW_LABELS, copy=False)
+        return df
+
+    # -- row (dict) view ---------------------------------------------------
+
+    def row(self, index: int) -> dict:
+        """One year as the legacy row dict (Python ints, dscr None when no cost)."""
+        if index < 0:
+            index += self._n_years
+        if not 0 <= index < self._n_years:
+            raise IndexError("cashflow table index out of range")
+        out = {}
+        for name, col in self._columns.items():
+            value = col[index].item()
+            if name in _LOAN_SCHEDULE_FIELDS:
+                if math.isnan(value):
+                    continue
+                value = round(value)
+            elif name == "dscr" and math.isnan(value):
+                value = None
+            out[name] = value
+        return out
+
+    def to_records(self) -> list[dict]:
+        """All years as a list of legacy row dicts."""
+        return [self.row(i) for i in range(self._n_years)]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.row(i) for i in range(*index.indices(self._n_years))]
+        return self.row(index)
+
+    def __iter__(self):
+        return (self.row(i) for i in range(self._n_years))
+
+    def __len__(self) -> int:
+        return self._n_years
+
+    def __bool__(self) -> bool:
+        return self._n_years > 0
+
+    def __repr__(self) -> str:
+        return f"CashflowTable(years={self._n_years}, columns={list(self._columns)})"
+
+
+EMPTY_CASHFLOW_TABLE = CashflowTable({})
+
+
+# ---------------------------------------------------------------------------
+# auto_calc_ppa pipeline stages (memoized)
+# ---------------------------------------------------------------------------
+#
+# Each stage is cached on its explicit inputs, so a widget change only
+# recomputes the stages downstream of it:
+#
+#   finance   <- company, selling_price, subsidy_amount, lease_rate_pct, lease_years
+#                (principal, payment, loan schedule, fire insurance, depreciation tax)
+#   om        <- system_kw, maintenance_yen_per_kw, insurance_yen_fixed
+#   min_price <- finance, om, energy, target_dscr
+#   cashflow  <- finance, om, energy, contract_years, min_price
+#   returns   <- cashflow (IRR / NPV)
+#
+# energy = (self-consumption, surplus, fit_price, include_surplus, yield profile
+# tuple or None); fit_price is keyed as 0 when surplus is excluded because it
+# cannot affect the result.
+# Cached values are immutable (read-only CashflowTable columns); auto_calc_ppa()
+# hands out fresh dicts around them.
+
+STAGE_CACHE_SIZE = 256
+
+
+@functools.lru_cache(maxsize=STAGE_CACHE_SIZE)
+def _finance_stage(
+    company: str,
+    selling_price: float,
+    subsidy_amount: float,
+    lease_rate_pct: float,
+    lease_years: int,
+) -> tuple:
+    """(principal, annual_payment, rate, loan rows, fire insurance, depreciation tax)."""
+    product = get_finance_product(company)
+    principal = max(selling_price - subsidy_amount, 0.0)
+    annual_payment, rate = calc_lease_payment(principal, company, lease_rate_pct, lease_years)
+
+    loan_rows = None
+    fire_ins = 0
+    dep_tax = None
+    if principal > 0:
+        if product.is_loan:
+            loan_rows = tuple(
+                (s["year"], s["principal"], s["interest"], s["total"])
+                for s in calc_bank_loan_annual_payments(principal, rate, lease_years)
+            )
+        if product.fire_insurance_per_million:
+            fire_ins = calc_fire_insurance_annual(selling_price, product.fire_insurance_per_million)
+        if product.has_depreciation_tax:
+            dep_tax = tuple(calc_depreciation_tax_schedule(
+                selling_price, lease_years, product.depreciation_rate_r, product.depreciation_tax_rate,
+            ))
+    return principal, annual_payment, rate, loan_rows, fire_ins, dep_tax
+
+
+def _loan_rows_to_dicts(loan_rows: tuple | None) -> list[dict] | None:
+    if loan_rows is None:
+        return None
+    return [
+        {"year": year, "principal": p, "interest": i, "total": total}
+        for year, p, i, total in loan_rows
+    ]
+
+
+@functools.lru_cache(maxsize=STAGE_CACHE_SIZE)
+def _om_stage(system_kw: float, maintenance_yen_per_kw: float, insurance_yen_fixed: float) -> float:
+    return calc_annual_om_cost(system_kw, maintenance_yen_per_kw, insurance_yen_fixed)
+
+
+@functools.lru_cache(maxsize=STAGE_CACHE_SIZE)
+def _min_price_stage(finance_key: tuple, om_key: tuple, energy_key: tuple, target_dscr: float) -> float:
+    principal, annual_payment, _, loan_rows, fire_ins, dep_tax = _finance_stage(*finance_key)
+    self_consumption_y1_kwh, surplus_y1_kwh, fit_price, include_surplus, yield_profile = energy_key
+    if principal <= 0 or self_consumption_y1_kwh <= 0:
+        return 0.0
+    return calc_min_ppa_price(
+        self_consumption_y1_kwh=self_consumption_y1_kwh,
+        surplus_y1_kwh=surplus_y1_kwh,
+        annual_lease_payment=annual_payment,
+        lease_years=finance_key[4],
+        fit_price=fit_price,
+        include_surplus=include_surplus,
+        target_dscr=target_dscr,
+        annual_om_cost=_om_stage(*om_key),
+        finance_type=get_finance_type(finance_key[0]),
+        loan_payment_schedule=_loan_rows_to_dicts(loan_rows),
+        fire_insurance_annual=fire_ins,
+        depreciation_tax_schedule=list(dep_tax) if dep_tax is not None else None,
+        yield_profile=yield_profile,
+    )
+
+
+@functools.lru_cache(maxsize=STAGE_CACHE_SIZE)
+def _cashflow_stage(
+    finance_key: tuple,
+    om_key: tuple,
+    energy_key: tuple,
+    contract_years: int,
+    ppa_unit_price: float,
+) -> CashflowTable:
+    """Cashflow table (read-only columns; empty when nothing to finance)."""
+    principal, annual_payment, _, loan_rows, fire_ins, dep_tax = _finance_stage(*finance_key)
+    self_consumption_y1_kwh, surplus_y1_kwh, fit_price, include_surplus, yield_profile = energy_key
+    if principal <= 0 or self_consumption_y1_kwh <= 0:
+        return EMPTY_CASHFLOW_TABLE
+    return calc_cashflow_table(
+        self_consumption_y1_kwh=self_consumption_y1_kwh,
+        surplus_y1_kwh=surplus_y1_kwh,
+        ppa_unit_price=ppa_unit_price,
+        fit_price=fit_price,
+        annual_lease_payment=annual_payment,
+        contract_years=contract_years,
+        lease_years=finance_key[4],
+        include_surplus=include_surplus,
+        annual_om_cost=_om_stage(*om_key),
+        finance_type=get_finance_type(finance_key[0]),
+        loan_payment_schedule=_loan_rows_to_dicts(loan_rows),
+        fire_insurance_annual=fire_ins,
+        depreciation_tax_schedule=list(dep_tax) if dep_tax is not None else None,
+        company=finance_key[0],
+        yield_profile=yield_profile,
+    )
+
+
+@functools.lru_cache(maxsize=STAGE_CACHE_SIZE)
+def _returns_stage(
+    finance_key: tuple,
+    om_key: tuple,
+    energy_key: tuple,
+    contract_years: int,
+    ppa_unit_price: float,
+) -> tuple[dict, int | None]:
+    """(irr_result, NPV) of the cashflow stage; the IRR dict is read-only by convention."""
+    principal, _, rate, _, _, _ = _finance_stage(*finance_key)
+    net_cashflows = _cashflow_stage(
+        finance_key, om_key, energy_key, contract_years, ppa_unit_price,
+    ).column("net_cashflow").tolist()
+    # IRR: initial outflow = -principal, then annual net cashflows
+    irr_res = irr_result([-principal] + net_cashflows)
+
+    # NPV at discount rate = effective financing rate
+    try:
+        ppa_npv = round(npv(rate, net_cashflows) - principal)
+    except (ZeroDivisionError, ValueError, OverflowError):
+        ppa_npv = None
+    return irr_res, ppa_npv
+
+
+_AUTO_CALC_STAGES = {
+    "finance": _finance_stage,
+    "om": _om_stage,
+    "min_price": _min_price_stage,
+    "cashflow": _cashflow_stage,
+    "returns": _returns_stage,
+}
+
 
-        rows.append(row)
-    return rows
+def auto_calc_ppa_cache_info() -> dict[str, dict[str, int]]:
+    """Hit / miss counters of the auto_calc_ppa() stage caches.
+
+    Downstream stages look up their upstream stages too, so those lookups
+    count as hits of the upstream stage.
+
+    Returns:
+        {stage: {"hits", "misses", "size"}} for finance, om, min_price,
+        cashflow and returns
+    """
+    info = {}
+    for name, stage in _AUTO_CALC_STAGES.items():
+        ci = stage.cache_info()
+        info[name] = {"hits": ci.hits, "misses": ci.misses, "size": ci.currsize}
+    return info
+
+
+def clear_auto_calc_ppa_cache() -> None:
+    """Empty every auto_calc_ppa() stage cache and reset the counters."""
+    for stage in _AUTO_CALC_STAGES.values():
+        stage.cache_clear()
 
 
 def auto_calc_ppa(
@@ -506,11 +877,13 @@ def auto_calc_ppa(
     maintenance_yen_per_kw: float = DEFAULT_MAINTENANCE_YEN_PER_KW,
     insurance_yen_fixed: float = DEFAULT_INSURANCE_YEN_FIXED,
     finance_company: str | None = None,
+    yield_profile=None,
 ) -> dict:
     """Full PPA auto-calculation: financing payment -> O&M -> minimum PPA price -> cashflow table.
 
-    Supports both lease and bank loan financing. The finance type is determined
-    from the company name via FINANCE_TYPE_MAP.
+    Supports both lease and bank loan financing. The finance type and the
+    company-specific rules come from the finance-product registry
+    (finance_products.yaml).
 
     DSCR = Revenue / Total Annual Cost >= target_dscr
 
@@ -530,11 +903,14 @@ def auto_calc_ppa(
         maintenance_yen_per_kw:   Maintenance fee per kW (default 1,200 yen/kW/yr)
         insurance_yen_fixed:      Fixed annual insurance fee (default 120,000 yen/yr)
         finance_company:          Explicit finance company name (overrides lease_company if set)
+        yield_profile:            Per-year generation multipliers (generation_profile());
+                                  None = 0.5%/yr geometric degradation
 
     Returns dict with:
         principal, effective_rate_pct, annual_lease_payment, annual_om_cost,
         total_annual_cost, min_ppa_price, cashflow_table, min_dscr, warnings,
         finance_type,
+        (cashflow_table is a read-only CashflowTable; iterate it for row dicts)
         (bank loan only): fire_insurance_annual, depreciation_tax_y1,
                           annual_interest_y1, annual_principal
     """
@@ -542,92 +918,55 @@ def auto_calc_ppa(
 
     # Use finance_company if provided, otherwise fall back to lease_company
     company = finance_company if finance_company else lease_company
-    finance_type = get_finance_type(company)
+    finance_type = get_finance_product(company).finance_type
+
+    # Stage keys (see "auto_calc_ppa pipeline stages")
+    finance_key = (company, float(selling_price), float(subsidy_amount), float(lease_rate_pct), int(lease_years))
+    om_key = (float(system_kw), float(maintenance_yen_per_kw), float(insurance_yen_fixed))
+    energy_key = (
+        float(self_consumption_y1_kwh),
+        float(surplus_y1_kwh),
+        float(fit_price) if include_surplus else 0.0,  # fit_price is unused without surplus
+        bool(include_surplus),
+        None if yield_profile is None else tuple(float(v) for v in yield_profile),
+    )
+
+    principal, annual_payment, rate, loan_rows, fire_ins, dep_tax = _finance_stage(*finance_key)
+    loan_schedule = _loan_rows_to_dicts(loan_rows)
+    dep_tax_schedule = list(dep_tax) if dep_tax is not None else None
+    om_cost = _om_stage(*om_key)
 
-    principal = max(selling_price - subsidy_amount, 0.0)
     if principal <= 0:
         warnings_list.append("販売価格・補助金額を確認してください（元本が0以下です）")
 
     if self_consumption_y1_kwh <= 0:
         warnings_list.append("iPalsデータがありません。自家消費量を入力してください")
 
-    annual_payment, rate = calc_lease_payment(principal, company, lease_rate_pct, lease_years)
-
-    # O&M cost
-    om_cost = calc_annual_om_cost(system_kw, maintenance_yen_per_kw, insurance_yen_fixed)
-
-    # Bank loan specific calculations
-    loan_schedule: list[dict] | None = None
-    fire_ins = 0
-    dep_tax_schedule: list[int] | None = None
-
-    if finance_type == FINANCE_TYPE_LOAN and principal > 0:
-        loan_schedule = calc_bank_loan_annual_payments(principal, rate, lease_years)
-        fire_ins = calc_fire_insurance_annual(selling_price)
-        dep_tax_schedule = calc_depreciation_tax_schedule(selling_price, lease_years)
+    min_price = _min_price_stage(finance_key, om_key, energy_key, float(target_dscr))
+    cashflow_key = (finance_key, om_key, energy_key, int(contract_years), min_price)
+    cashflow_table = _cashflow_stage(*cashflow_key)   # read-only, shared with the cache
 
-    min_price = 0.0
-    cashflow_table: list[dict] = []
     min_dscr: float | None = None
+    if cashflow_table:
+        dscr_values = cashflow_table.column("dscr")
+        dscr_values = dscr_values[~np.isnan(dscr_values)]
+        min_dscr = float(dscr_values.min()) if dscr_values.size else None
 
-    if principal > 0 and self_consumption_y1_kwh > 0:
-        min_price = calc_min_ppa_price(
-            self_consumption_y1_kwh=self_consumption_y1_kwh,
-            surplus_y1_kwh=surplus_y1_kwh,
-            annual_lease_payment=annual_payment,
-            lease_years=lease_years,
-            fit_price=fit_price,
-            include_surplus=include_surplus,
-            target_dscr=target_dscr,
-            annual_om_cost=om_cost,
-            finance_type=finance_type,
-            loan_payment_schedule=loan_schedule,
-            fire_insurance_annual=fire_ins,
-            depreciation_tax_schedule=dep_tax_schedule,
-        )
-
-        cashflow_table = calc_cashflow_table(
-            self_consumption_y1_kwh=self_consumption_y1_kwh,
-            surplus_y1_kwh=surplus_y1_kwh,
-            ppa_unit_price=min_price,
-            fit_price=fit_price,
-            annual_lease_payment=annual_payment,
-            contract_years=contract_years,
-            lease_years=lease_years,
-            include_surplus=include_surplus,
-            annual_om_cost=om_cost,
-            finance_type=finance_type,
-            loan_payment_schedule=loan_schedule,
-            fire_insurance_annual=fire_ins,
-            depreciation_tax_schedule=dep_tax_schedule,
-            company=company,
-        )
-
-        dscr_values = [r["dscr"] for r in cashflow_table if r["dscr"] is not None]
-        min_dscr = min(dscr_values) if dscr_values else None
-
-    # Calculate IRR and NPV from cashflow table
+    # IRR and NPV from cashflow table
     ppa_irr: float | None = None
     ppa_npv: float | None = None
     if cashflow_table and principal > 0:
-        # IRR: initial outflow = -principal, then annual net cashflows
-        cf_for_irr = [-principal] + [r["net_cashflow"] for r in cashflow_table]
-        try:
-            ppa_irr = round(irr(cf_for_irr) * 100, 2)  # as percentage
-        except (ZeroDivisionError, ValueError, OverflowError):
-            ppa_irr = None
-
-        # NPV at discount rate = effective financing rate
-        try:
-            annual_cfs = [r["net_cashflow"] for r in cashflow_table]
-            ppa_npv = round(npv(rate, annual_cfs) - principal)
-        except (ZeroDivisionError, ValueError, OverflowError):
-            ppa_npv = None
-
-    # Re-lease annual amount (みずほリース)
+        irr_res, ppa_npv = _returns_stage(*cashflow_key)
+        if irr_res["converged"]:
+            ppa_irr = round(irr_res["rate"] * 100, 2)  # as percentage
+        else:
+            warnings_list.append(f"IRRを算出できません（{irr_res['status']}）")
+
+    # Re-lease annual amount (products with a re-lease ratio, e.g. みずほリース)
+    release_ratio = get_finance_product(company).release_ratio
     re_lease_annual = 0
-    if company == "みずほリース" and annual_payment > 0:
-        re_lease_annual = round(annual_payment * MIZUHO_RELEASE_RATIO)
+    if release_ratio and annual_payment > 0:
+        re_lease_annual = round(annual_payment * release_ratio)
 
     result = {
         "principal": round(principal),
@@ -653,3 +992,279 @@ def auto_calc_ppa(
         result["annual_principal"] = loan_schedule[0]["principal"] if loan_schedule else 0
 
     return result
+
+
+# ---------------------------------------------------------------------------
+# Monthly resolution
+# ---------------------------------------------------------------------------
+
+def calc_monthly_cashflow(
+    self_consumption_y1_kwh: float,
+    surplus_y1_kwh: float,
+    selling_price: float,
+    subsidy_amount: float,
+    lease_company: str,
+    lease_rate_pct: float,
+    lease_years: int,
+    contract_years: int,
+    monthly_gen_kwh: list[float] | None = None,
+    ppa_unit_price: float | None = None,
+    system_kw: float = 0.0,
+    fit_price: float = 0.0,
+    include_surplus: bool = False,
+    target_dscr: float = 1.30,
+    maintenance_yen_per_kw: float = DEFAULT_MAINTENANCE_YEN_PER_KW,
+    insurance_yen_fixed: float = DEFAULT_INSURANCE_YEN_FIXED,
+    start_month: int = 1,
+    finance_company: str | None = None,
+    yield_profile=None,
+) -> dict:
+    """Month-by-month cashflow and DSCR (12 x contract_years periods).
+
+    Self-consumption follows the seasonal shape of iPals monthly_gen_kwh
+    (flat if missing) while each year still totals the annual model. Lease
+    payments are annual / 12; bank loans use the monthly 元金均等 schedule.
+    O&M, fire insurance and depreciation tax are spread evenly over the year.
+
+    Args:
+        monthly_gen_kwh: iPals monthly generation (Jan..Dec) for the seasonal shape
+        ppa_unit_price:  price to evaluate; defaults to auto_calc_ppa()'s min_ppa_price
+        start_month:     calendar month (1-12) in which the contract starts
+        yield_profile:   per-year generation multipliers (generation_profile())
+        (others as in auto_calc_ppa())
+
+    Returns dict with:
+        ppa_unit_price, min_rolling_dscr (worst trailing 12-month DSCR inside
+        the finance term), min_monthly_dscr, weakest_month ({"year", "month"}),
+        min_dscr_by_month (12 values, Jan..Dec, worst DSCR per calendar month
+        within the finance term), monthly_table (list of dicts: period, year,
+        month, self_consumption_kwh, total_revenue, total_cost, net_cashflow,
+        dscr, rolling_dscr)
+    """
+    company = finance_company if finance_company else lease_company
+    if ppa_unit_price is None:
+        ppa_unit_price = auto_calc_ppa(
+            self_consumption_y1_kwh, surplus_y1_kwh, selling_price, subsidy_amount,
+            company, lease_rate_pct, lease_years, contract_years,
+            system_kw=system_kw, fit_price=fit_price, include_surplus=include_surplus,
+            target_dscr=target_dscr, maintenance_yen_per_kw=maintenance_yen_per_kw,
+            insurance_yen_fixed=insurance_yen_fixed, yield_profile=yield_profile,
+        )["min_ppa_price"]
+
+    principal = max(selling_price - subsidy_amount, 0.0)
+    n_years = max(lease_years, contract_years)
+    n_months = 12 * contract_years
+    finance = finance_schedule_arrays(company, principal, selling_price, lease_rate_pct, lease_years, n_years)
+    if finance["has_schedule"][0]:
+        monthly_payment = loan_schedule_monthly_arrays(
+            principal, finance["rate"], lease_years, n_months,
+        )["total"]
+    else:
+        monthly_payment = np.full((1, n_months), finance["annual_payment"][0] / 12)
+
+    arrays = monthly_cashflow_arrays(
+        self_consumption_y1_kwh=self_consumption_y1_kwh,
+        surplus_y1_kwh=surplus_y1_kwh,
+        ppa_unit_price=ppa_unit_price,
+        fit_price=fit_price,
+        monthly_payment=monthly_payment,
+        lease_years=lease_years,
+        contract_years=contract_years,
+        degradation=DEGRADATION_RATE,
+        monthly_profile=monthly_gen_kwh,
+        include_surplus=include_surplus,
+        annual_om_cost=calc_annual_om_cost(system_kw, maintenance_yen_per_kw, insurance_yen_fixed),
+        fire_insurance=finance["fire_insurance"],
+        depreciation_tax=finance["depreciation_tax"],
+        post_term_payment=finance["post_term_payment"],
+        revenue_share_rate=finance["revenue_share_rate"],
+        start_month=start_month,
+        yield_profile=yield_profile,
+    )
+
+    dscr = arrays["dscr"][0]
+    in_term = arrays["in_term"][0]
+    term_dscr = np.where(in_term, dscr, np.nan)
+    rolling = np.full(n_months, np.nan)
+    rolling[11:] = arrays["rolling_dscr"][0]
+
+    min_monthly = weakest = None
+    if np.isfinite(term_dscr).any():
+        i = int(np.nanargmin(term_dscr))
+        min_monthly = round(float(term_dscr[i]), 3)
+        weakest = {"year": int(arrays["year"][0, i]), "month": int(arrays["calendar_month"][0, i])}
+
+    by_month = []
+    for month in range(1, 13):
+        values = term_dscr[(arrays["calendar_month"][0] == month) & np.isfinite(term_dscr)]
+        by_month.append(round(float(values.min()), 3) if values.size else None)
+
+    min_rolling = float(arrays["min_rolling_dscr"][0])
+    cols = {
+        key: arrays[key][0].tolist()
+        for key in ("period", "year", "calendar_month", "self_consumption_kwh",
+                    "total_revenue", "total_cost", "net_cashflow")
+    }
+    table = [
+        {
+            "period": cols["period"][i],
+            "year": cols["year"][i],
+            "month": cols["calendar_month"][i],
+            "self_consumption_kwh": round(cols["self_consumption_kwh"][i]),
+            "total_revenue": round(cols["total_revenue"][i]),
+            "total_cost": round(cols["total_cost"][i]),
+            "net_cashflow": round(cols["net_cashflow"][i]),
+            "dscr": None if math.isnan(dscr[i]) else round(float(dscr[i]), 3),
+            "rolling_dscr": None if math.isnan(rolling[i]) else round(float(rolling[i]), 3),
+        }
+        for i in range(n_months)
+    ]
+    return {
+        "ppa_unit_price": ppa_unit_price,
+        "min_rolling_dscr": None if math.isnan(min_rolling) else round(min_rolling, 3),
+        "min_monthly_dscr": min_monthly,
+        "weakest_month": weakest,
+        "min_dscr_by_month": by_month,
+        "monthly_table": table,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Target pricing (DSCR / lessor IRR / customer savings)
+# ---------------------------------------------------------------------------
+
+def calc_target_ppa_price(
+    mode: str,
+    target: float,
+    self_consumption_y1_kwh: float,
+    surplus_y1_kwh: float,
+    selling_price: float,
+    subsidy_amount: float,
+    lease_company: str,
+    lease_rate_pct: float,
+    lease_years: int,
+    contract_years: int,
+    system_kw: float = 0.0,
+    fit_price: float = 0.0,
+    include_surplus: bool = False,
+    target_dscr: float = 1.30,
+    maintenance_yen_per_kw: float = DEFAULT_MAINTENANCE_YEN_PER_KW,
+    insurance_yen_fixed: float = DEFAULT_INSURANCE_YEN_FIXED,
+    current_tariff: float | None = None,
+    enforce_dscr: bool = True,
+    finance_company: str | None = None,
+    yield_profile=None,
+) -> dict:
+    """Solve the PPA unit price for a DSCR, lessor-IRR or customer-savings target.
+
+    mode is one of ppa_batch.PRICING_MODES:
+        "dscr"    -- target is the DSCR (same result as calc_min_ppa_price)
+        "irr"     -- target is the lessor IRR floor in % (e.g. 3.10 for シーエナジー);
+                     the price is not allowed below the DSCR minimum unless
+                     enforce_dscr is False
+        "savings" -- target is the guaranteed customer saving in % vs
+                     current_tariff (円/kWh); the price is the highest 0.5-yen
+                     step meeting it and is feasible only if it still clears DSCR
+
+    Other arguments are those of auto_calc_ppa().
+
+    Returns dict with:
+        ppa_price (0 if infeasible), target_price, min_ppa_price (DSCR),
+        feasible, min_dscr, irr_pct, npv_yen, savings_pct, annual_saving_y1
+        (metrics are None where not applicable)
+    """
+    from proposal_generator.ppa_batch import solve_ppa_price_batch
+
+    res = solve_ppa_price_batch(
+        mode,
+        target,
+        current_tariff=current_tariff,
+        enforce_dscr=enforce_dscr,
+        self_consumption_y1_kwh=self_consumption_y1_kwh,
+        surplus_y1_kwh=surplus_y1_kwh,
+        selling_price=selling_price,
+        subsidy_amount=subsidy_amount,
+        lease_company=finance_company or lease_company,
+        lease_rate_pct=lease_rate_pct,
+        lease_years=lease_years,
+        contract_years=contract_years,
+        system_kw=system_kw,
+        fit_price=fit_price,
+        include_surplus=include_surplus,
+        target_dscr=target_dscr,
+        maintenance_yen_per_kw=maintenance_yen_per_kw,
+        insurance_yen_fixed=insurance_yen_fixed,
+        yield_profile=yield_profile,
+    )
+    out = {}
+    for key in ("ppa_price", "target_price", "min_ppa_price", "min_dscr", "irr_pct", "npv_yen",
+                "savings_pct", "annual_saving_y1"):
+        value = float(res[key][0])
+        out[key] = None if math.isnan(value) else value
+    for key in ("npv_yen", "annual_saving_y1"):
+        if out[key] is not None:
+            out[key] = int(out[key])
+    out["feasible"] = bool(res["feasible"][0])
+    return out
+
+
+def calc_max_selling_price(
+    target_ppa_price: float,
+    self_consumption_y1_kwh: float,
+    surplus_y1_kwh: float,
+    subsidy_amount: float,
+    lease_company: str,
+    lease_rate_pct: float,
+    lease_years: int,
+    contract_years: int,
+    system_kw: float = 0.0,
+    fit_price: float = 0.0,
+    include_surplus: bool = False,
+    target_dscr: float = 1.30,
+    maintenance_yen_per_kw: float = DEFAULT_MAINTENANCE_YEN_PER_KW,
+    insurance_yen_fixed: float = DEFAULT_INSURANCE_YEN_FIXED,
+    raw_cost: float | None = None,
+    finance_company: str | None = None,
+    yield_profile=None,
+) -> dict:
+    """Reverse of auto_calc_ppa(): maximum selling price a target PPA price supports.
+
+    The result is the highest selling price (100-yen steps) for which
+    target_ppa_price still clears target_dscr in every finance year
+    (see ppa_batch.solve_max_selling_price_batch).
+
+    Returns dict with:
+        max_selling_price, principal, feasible, min_ppa_price, min_dscr,
+        irr_pct, annual_lease_payment, gross_profit, gross_margin_pct
+        (None where not applicable; margin figures need raw_cost)
+    """
+    from proposal_generator.ppa_batch import solve_max_selling_price_batch
+
+    res = solve_max_selling_price_batch(
+        target_ppa_price,
+        raw_cost=raw_cost,
+        self_consumption_y1_kwh=self_consumption_y1_kwh,
+        surplus_y1_kwh=surplus_y1_kwh,
+        subsidy_amount=subsidy_amount,
+        lease_company=finance_company or lease_company,
+        lease_rate_pct=lease_rate_pct,
+        lease_years=lease_years,
+        contract_years=contract_years,
+        system_kw=system_kw,
+        fit_price=fit_price,
+        include_surplus=include_surplus,
+        target_dscr=target_dscr,
+        maintenance_yen_per_kw=maintenance_yen_per_kw,
+        insurance_yen_fixed=insurance_yen_fixed,
+        yield_profile=yield_profile,
+    )
+    out = {}
+    for key in ("max_selling_price", "principal", "min_ppa_price", "min_dscr", "irr_pct",
+                "annual_lease_payment", "gross_profit", "gross_margin_pct"):
+        value = float(res[key][0])
+        out[key] = None if math.isnan(value) else value
+    for key in ("max_selling_price", "principal", "annual_lease_payment", "gross_profit"):
+        if out[key] is not None:
+            out[key] = int(out[key])
+    out["feasible"] = bool(res["feasible"][0])
+    return out
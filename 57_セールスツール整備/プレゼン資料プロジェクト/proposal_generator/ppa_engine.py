@@ -0,0 +1,754 @@
+"""
+ppa_engine.py - Columnar (NumPy) cashflow engine behind ppa_calc
+
+Computes every year of many PPA scenarios in one pass as 2-D arrays of
+shape (n_scenarios, n_years). ppa_calc keeps the scalar, list-of-dicts API
+and delegates the per-year arithmetic here.
+
+Conventions:
+  - Year axis is 0-based: column t holds contract year t + 1
+  - Scenario inputs (scalars or 1-D arrays) are broadcast to length n_scenarios
+  - Years after a scenario's contract_years are zero-filled; use the
+    "in_contract" mask in the result to drop them
+  - The engine knows nothing about finance companies: company-specific
+    behaviour (re-lease, revenue share) arrives as plain per-scenario numbers
+
+Arithmetic is done in the same order as the original per-year loops so that
+rounded results are identical to the scalar implementation.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+
+# ---------------------------------------------------------------------------
+# Shape helpers
+# ---------------------------------------------------------------------------
+
+def broadcast_scenarios(*values) -> list[np.ndarray]:
+    """Broadcast scalars / 1-D arrays to a common 1-D float shape (n_scenarios,)."""
+    arrays = [np.atleast_1d(np.asarray(v, dtype=float)) for v in values]
+    return [np.ascontiguousarray(a) for a in np.broadcast_arrays(*arrays)]
+
+
+def year_index(n_years: int) -> np.ndarray:
+    """Contract year numbers 1..n_years as a (1, n_years) row for broadcasting."""
+    return np.arange(1, n_years + 1)[None, :]
+
+
+def decay_factors(degradation, n_years: int) -> np.ndarray:
+    """Generation decay (1 - degradation) ** (year - 1) per scenario and year.
+
+    Powers are evaluated with Python floats once per distinct degradation rate
+    (NumPy's vectorised pow can differ from libm in the last ulp, which would
+    break bit-for-bit parity with the scalar engine).
+
+    Args:
+        degradation: Scalar or (n_scenarios,) annual degradation rates
+        n_years:     Number of years
+
+    Returns:
+        Array of shape (n_scenarios, n_years)
+    """
+    deg = np.atleast_1d(np.asarray(degradation, dtype=float))
+    unique, inverse = np.unique(deg, return_inverse=True)
+    table = np.array(
+        [[(1 - d) ** k for k in range(n_years)] for d in unique.tolist()],
+        dtype=float,
+    ).reshape(len(unique), n_years)
+    return table[inverse.reshape(-1)]
+
+
+def yield_factors(degradation, n_years: int, yield_profile=None) -> np.ndarray:
+    """Generation multipliers on year-1 energy per scenario and year.
+
+    An explicit yield_profile (see generation_profile.py: LID, warranty
+    curves, curtailment) replaces the geometric degradation; without it this
+    is decay_factors(degradation, n_years).
+
+    Args:
+        degradation:   Scalar or (n_scenarios,) annual degradation rates
+        n_years:       Number of years
+        yield_profile: None, (n_profile_years,) shared by every scenario, or
+                       (n_scenarios, n_profile_years); n_profile_years >= n_years
+
+    Returns:
+        Array of shape (n_scenarios, n_years), or (1, n_years) for a shared profile
+    """
+    if yield_profile is None:
+        return decay_factors(degradation, n_years)
+    profile = np.atleast_2d(np.asarray(yield_profile, dtype=float))
+    if profile.shape[1] < n_years:
+        raise ValueError(f"yield_profile covers {profile.shape[1]} years, {n_years} needed")
+    return profile[:, :n_years]
+
+
+def term_mask(term_years, n_years: int) -> np.ndarray:
+    """Boolean (n_scenarios, n_years) mask: True while year <= term_years."""
+    term = np.atleast_1d(np.asarray(term_years))
+    return year_index(n_years) <= term[:, None]
+
+
+def pad_schedule(schedule: list[float] | None, n_years: int) -> np.ndarray:
+    """Convert a ragged per-year list to a length-n_years float row (zero padded)."""
+    row = np.zeros(n_years, dtype=float)
+    if schedule:
+        values = list(schedule)[:n_years]
+        row[:len(values)] = values
+    return row
+
+
+def lease_payment_matrix(annual_payment, lease_years, n_years: int) -> np.ndarray:
+    """Constant lease payment during the term, 0 afterwards -> (n_scenarios, n_years)."""
+    payment, term = broadcast_scenarios(annual_payment, lease_years)
+    return np.where(term_mask(term, n_years), payment[:, None], 0.0)
+
+
+# ---------------------------------------------------------------------------
+# Finance schedule kernels
+# ---------------------------------------------------------------------------
+
+def exact_power(base, exponent) -> np.ndarray:
+    """Elementwise base ** exponent evaluated with Python floats per distinct pair.
+
+    Used where results must match the scalar code bit-for-bit (see decay_factors).
+    """
+    b, e = broadcast_scenarios(base, exponent)
+    pairs, inverse = np.unique(np.stack([b, e], axis=1), axis=0, return_inverse=True)
+    values = np.array([x ** y for x, y in pairs.tolist()], dtype=float)
+    return values[inverse.reshape(-1)]
+
+
+def pmt_arrays(rate, nper, pv) -> np.ndarray:
+    """Vectorised ppa_calc.pmt(): annual annuity payment per scenario."""
+    rate, nper, pv = broadcast_scenarios(rate, nper, pv)
+    zero = rate == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annuity = pv * rate / (1 - exact_power(1 + rate, -nper))
+        flat = pv / nper
+    return np.where(zero, flat, annuity)
+
+
+def _loan_interest_monthly(principal, monthly_principal, monthly_rate, year0) -> np.ndarray:
+    """Reference month-by-month interest sums (used only for rounding ties)."""
+    year_interest = np.zeros(np.broadcast_shapes(principal.shape, year0.shape))
+    for month_in_year in range(12):
+        remaining = principal - monthly_principal * (year0 + month_in_year)
+        year_interest = year_interest + remaining * monthly_rate
+    return year_interest
+
+
+def loan_schedule_arrays(principal, annual_rate, term_years, n_years: int) -> dict[str, np.ndarray]:
+    """Closed-form 元金均等返済 schedule (see ppa_calc.calc_bank_loan_annual_payments).
+
+    With monthly principal p = P / (12 * term) and monthly rate i, year y covers
+    months m = 12(y-1) .. 12y-1, so
+
+        principal_y = 12 p
+        interest_y  = i * (12 P - p * sum(m)),   sum(m) = 144 (y-1) + 66
+
+    Entries whose fractional part lies within 1e-6 of .5 are recomputed with
+    the monthly sum, so rounded values always equal the month-by-month loop.
+
+    Returns:
+        dict of (n_scenarios, n_years) arrays "principal", "interest", "total",
+        rounded to whole yen; years after term_years are 0
+    """
+    principal, annual_rate, term = broadcast_scenarios(principal, annual_rate, term_years)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        monthly_principal = np.where(term > 0, principal / (term * 12), 0.0)[:, None]
+    monthly_rate = (annual_rate / 12)[:, None]
+    P = principal[:, None]
+
+    # 12 sequential additions, exactly as the monthly loop accumulates them
+    year_principal = np.zeros_like(monthly_principal)
+    for _ in range(12):
+        year_principal = year_principal + monthly_principal
+    year_principal = np.broadcast_to(year_principal, (len(principal), n_years))
+
+    year0 = (year_index(n_years) - 1) * 12
+    month_sum = 12 * year0 + 66
+    year_interest = monthly_rate * (12 * P - monthly_principal * month_sum)
+
+    def _near_half(x):
+        return np.abs(np.abs(x - np.trunc(x)) - 0.5) < 1e-6
+
+    tie = _near_half(year_interest) | _near_half(year_principal + year_interest)
+    if tie.any():
+        rows = np.flatnonzero(tie.any(axis=1))
+        exact = _loan_interest_monthly(P[rows], monthly_principal[rows], monthly_rate[rows], year0)
+        year_interest[rows] = np.where(tie[rows], exact, year_interest[rows])
+
+    in_term = term_mask(term, n_years)
+    return {
+        "principal": np.where(in_term, np.rint(year_principal), 0.0),
+        "interest": np.where(in_term, np.rint(year_interest), 0.0),
+        "total": np.where(in_term, np.rint(year_principal + year_interest), 0.0),
+    }
+
+
+def fire_insurance_arrays(selling_price, per_million) -> np.ndarray:
+    """Vectorised ppa_calc.calc_fire_insurance_annual() (rounded up to 1,000 yen)."""
+    price, per_million = broadcast_scenarios(selling_price, per_million)
+    return np.ceil(price / 1_000_000 * per_million / 1000) * 1000
+
+
+def depreciation_tax_arrays(selling_price, n_years: int, rate_r, tax_rate) -> np.ndarray:
+    """Vectorised ppa_calc.calc_depreciation_tax_schedule() -> (n_scenarios, n_years).
+
+    rate_r / tax_rate may be scalars or per-scenario arrays. The assessed value
+    is carried forward by repeated multiplication (cumprod), matching the
+    scalar loop exactly.
+    """
+    price, rate_r, tax_rate = broadcast_scenarios(selling_price, rate_r, tax_rate)
+    factors = np.empty((len(price), n_years))
+    if n_years:
+        factors[:, 0] = price * (1 - rate_r / 2)
+        factors[:, 1:] = (1 - rate_r)[:, None]
+    assessed = np.cumprod(factors, axis=1)
+    truncated = np.floor_divide(assessed, 1000) * 1000
+    return np.rint(truncated * tax_rate[:, None])
+
+
+# ---------------------------------------------------------------------------
+# Cashflow engine
+# ---------------------------------------------------------------------------
+
+def cashflow_arrays(
+    self_consumption_y1_kwh,
+    surplus_y1_kwh,
+    ppa_unit_price,
+    fit_price,
+    finance_payment: np.ndarray,
+    lease_years,
+    contract_years,
+    degradation,
+    include_surplus: bool = False,
+    annual_om_cost=0.0,
+    fire_insurance: np.ndarray | None = None,
+    depreciation_tax: np.ndarray | None = None,
+    post_term_payment=0.0,
+    revenue_share_rate=0.0,
+    yield_profile=None,
+) -> dict[str, np.ndarray]:
+    """Year-by-year cashflow for many scenarios at once.
+
+    During the finance term:
+        total_cost = finance_payment + om + fire_insurance + depreciation_tax
+    After the finance term:
+        total_cost = post_term_payment (re-lease) + revenue_share
+        revenue_share = total_revenue * revenue_share_rate
+
+    Args:
+        self_consumption_y1_kwh: Year-1 self-consumption (n_scenarios,) or scalar
+        surplus_y1_kwh:          Year-1 surplus (n_scenarios,) or scalar
+        ppa_unit_price:          PPA unit price (yen/kWh)
+        fit_price:               Surplus unit price (yen/kWh)
+        finance_payment:         (n_scenarios, n_years) lease/loan payment per year;
+                                 only columns inside the finance term are used
+        lease_years:             Finance term per scenario
+        contract_years:          Contract duration per scenario
+        degradation:             Annual degradation rate per scenario
+        include_surplus:         Whether surplus revenue is counted
+        annual_om_cost:          O&M per year during the finance term
+        fire_insurance:          (n_scenarios, n_years) fire insurance, or None
+        depreciation_tax:        (n_scenarios, n_years) 償却資産税, or None
+        post_term_payment:       Payment per year after the term (みずほ再リース)
+        revenue_share_rate:      Post-term revenue share rate (シーエナジー)
+        yield_profile:           Per-year generation multipliers replacing the
+                                 degradation (see yield_factors), or None
+
+    Returns:
+        dict of (n_scenarios, n_years) arrays:
+            year, in_contract, in_term, self_consumption_kwh, surplus_kwh,
+            ppa_revenue, surplus_revenue, total_revenue, lease_payment, om_cost,
+            fire_insurance, depreciation_tax, revenue_share, total_cost,
+            net_cashflow, dscr (NaN where total_cost <= 0)
+    """
+    finance_payment = np.atleast_2d(np.asarray(finance_payment, dtype=float))
+    n_years = finance_payment.shape[1]
+
+    (sc_y1, sur_y1, price, fit, term, contract, deg, om_y,
+     post_pay, share_rate, _) = broadcast_scenarios(
+        self_consumption_y1_kwh, surplus_y1_kwh, ppa_unit_price, fit_price,
+        lease_years, contract_years, degradation, annual_om_cost,
+        post_term_payment, revenue_share_rate, np.zeros(len(finance_payment)),
+    )
+    n = len(sc_y1)
+    finance_payment = np.broadcast_to(finance_payment, (n, n_years))
+
+    years = np.broadcast_to(year_index(n_years), (n, n_years))
+    in_contract = years <= contract[:, None]
+    in_term = (years <= term[:, None]) & in_contract
+    post_term = in_contract & ~in_term
+
+    decay = yield_factors(deg, n_years, yield_profile)
+
+    sc = np.where(in_contract, sc_y1[:, None] * decay, 0.0)
+    if include_surplus:
+        sur = np.where(in_contract, sur_y1[:, None] * decay, 0.0)
+    else:
+        sur = np.zeros((n, n_years))
+
+    ppa_rev = sc * price[:, None]
+    sur_rev = sur * fit[:, None]
+    total_rev = ppa_rev + sur_rev
+
+    zeros = np.zeros((n, n_years))
+    fi_in = zeros if fire_insurance is None else np.broadcast_to(fire_insurance, (n, n_years))
+    dt_in = zeros if depreciation_tax is None else np.broadcast_to(depreciation_tax, (n, n_years))
+
+    lp = np.where(in_term, finance_payment, np.where(post_term, post_pay[:, None], 0.0))
+    om = np.where(in_term, om_y[:, None], 0.0)
+    fi = np.where(in_term, fi_in, 0.0)
+    dt = np.where(in_term, dt_in, 0.0)
+
+    total_cost = lp + om + fi + dt
+
+    share_on = post_term & (share_rate[:, None] > 0)
+    revenue_share = np.where(share_on, (total_rev - om) * share_rate[:, None], 0.0)
+    total_cost = total_cost + revenue_share
+
+    net_cf = total_rev - total_cost
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dscr = np.where(total_cost > 0, total_rev / total_cost, np.nan)
+
+    return {
+        "year": years,
+        "in_contract": in_contract,
+        "in_term": in_term,
+        "self_consumption_kwh": sc,
+        "surplus_kwh": sur,
+        "ppa_revenue": ppa_rev,
+        "surplus_revenue": sur_rev,
+        "total_revenue": total_rev,
+        "lease_payment": lp,
+        "om_cost": om,
+        "fire_insurance": fi,
+        "depreciation_tax": dt,
+        "revenue_share": revenue_share,
+        "total_cost": total_cost,
+        "net_cashflow": net_cf,
+        "dscr": dscr,
+    }
+
+
+def min_price_arrays(
+    self_consumption_y1_kwh,
+    surplus_y1_kwh,
+    finance_payment: np.ndarray,
+    lease_years,
+    degradation,
+    fit_price=0.0,
+    include_surplus: bool = False,
+    target_dscr=1.30,
+    annual_om_cost=0.0,
+    fire_insurance: np.ndarray | None = None,
+    depreciation_tax: np.ndarray | None = None,
+    yield_profile=None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Minimum PPA unit price meeting target_dscr in every finance-term year.
+
+    required_price[year] = (total_cost * target_dscr - surplus_revenue) / self_consumption
+    Years with non-positive required revenue or self-consumption are skipped.
+    yield_profile replaces the degradation as in cashflow_arrays().
+
+    Returns:
+        (raw_price, price) -- both (n_scenarios,); price is rounded UP to the
+        nearest 0.5 yen and is 0.0 when no year needs positive PPA revenue
+    """
+    finance_payment = np.atleast_2d(np.asarray(finance_payment, dtype=float))
+    n_years = finance_payment.shape[1]
+
+    sc_y1, sur_y1, term, deg, fit, dscr_t, om_y, _ = broadcast_scenarios(
+        self_consumption_y1_kwh, surplus_y1_kwh, lease_years, degradation,
+        fit_price, target_dscr, annual_om_cost, np.zeros(len(finance_payment)),
+    )
+    n = len(sc_y1)
+    finance_payment = np.broadcast_to(finance_payment, (n, n_years))
+
+    in_term = term_mask(term, n_years)
+    decay = yield_factors(deg, n_years, yield_profile)
+
+    sc = sc_y1[:, None] * decay
+    sur = sur_y1[:, None] * decay if include_surplus else np.zeros((n, n_years))
+
+    zeros = np.zeros((n, n_years))
+    fi = zeros if fire_insurance is None else np.broadcast_to(fire_insurance, (n, n_years))
+    dt = zeros if depreciation_tax is None else np.broadcast_to(depreciation_tax, (n, n_years))
+
+    total_cost = finance_payment + om_y[:, None] + fi + dt
+    required_ppa_revenue = total_cost * dscr_t[:, None] - sur * fit[:, None]
+
+    ok = in_term & (required_ppa_revenue > 0) & (sc > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        price_by_year = np.where(ok, required_ppa_revenue / np.where(sc > 0, sc, 1.0), 0.0)
+    raw = price_by_year.max(axis=1) if n_years else np.zeros(n)
+    price = np.where(raw > 0, np.ceil(raw * 2) / 2, 0.0)
+    return raw, price
+
+
+# ---------------------------------------------------------------------------
+# Monthly engine
+# ---------------------------------------------------------------------------
+
+def monthly_shape(monthly_kwh) -> np.ndarray:
+    """Seasonal weights (12 months, Jan..Dec) summing to 1 per scenario.
+
+    Args:
+        monthly_kwh: (12,) or (n_scenarios, 12) monthly energy, e.g. iPals
+                     monthly_gen_kwh; rows that are missing or sum to 0 fall
+                     back to a flat 1/12 profile
+
+    Returns:
+        (n_scenarios or 1, 12) weights
+    """
+    if monthly_kwh is None:
+        return np.full((1, 12), 1 / 12)
+    kwh = np.atleast_2d(np.asarray(monthly_kwh, dtype=float))
+    if kwh.shape[1] != 12:
+        raise ValueError(f"monthly profile needs 12 values, got {kwh.shape[1]}")
+    kwh = np.maximum(kwh, 0.0)
+    total = kwh.sum(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(total > 0, kwh / total, 1 / 12)
+
+
+def loan_schedule_monthly_arrays(principal, annual_rate, term_years, n_months: int) -> dict[str, np.ndarray]:
+    """Month-by-month 元金均等返済 schedule (unrounded), (n_scenarios, n_months).
+
+    Month m (0-based) repays P / (12 * term) and pays interest on the balance
+    before that repayment; the 12 months of year y sum to
+    loan_schedule_arrays() year y before rounding.
+    """
+    principal, annual_rate, term = broadcast_scenarios(principal, annual_rate, term_years)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        monthly_principal = np.where(term > 0, principal / (term * 12), 0.0)[:, None]
+    m = np.arange(n_months)[None, :]
+    in_term = m < (term * 12)[:, None]
+    interest = (principal[:, None] - monthly_principal * m) * (annual_rate / 12)[:, None]
+    return {
+        "principal": np.where(in_term, monthly_principal, 0.0),
+        "interest": np.where(in_term, interest, 0.0),
+        "total": np.where(in_term, monthly_principal + interest, 0.0),
+    }
+
+
+def rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing window sums along axis 1: (n, m) -> (n, m - window + 1)."""
+    csum = np.concatenate([np.zeros((len(values), 1)), np.cumsum(values, axis=1)], axis=1)
+    return csum[:, window:] - csum[:, :-window]
+
+
+def monthly_cashflow_arrays(
+    self_consumption_y1_kwh,
+    surplus_y1_kwh,
+    ppa_unit_price,
+    fit_price,
+    monthly_payment: np.ndarray,
+    lease_years,
+    contract_years,
+    degradation,
+    monthly_profile=None,
+    include_surplus: bool = False,
+    annual_om_cost=0.0,
+    fire_insurance=None,
+    depreciation_tax: np.ndarray | None = None,
+    post_term_payment=0.0,
+    revenue_share_rate=0.0,
+    start_month: int = 1,
+    yield_profile=None,
+) -> dict[str, np.ndarray]:
+    """Month-by-month cashflow for many scenarios, (n_scenarios, 12 * n_years).
+
+    Annual energy follows the annual engine (year-1 energy degraded per contract
+    year) and is split over calendar months with monthly_profile, so the 12
+    months of a year add up to the annual model. Annual costs (O&M, fire
+    insurance, depreciation tax, re-lease) are spread evenly over 12 months;
+    the finance payment is given per month.
+
+    Args:
+        monthly_payment:  (n_scenarios, n_months) lease (annual / 12) or loan
+                          payment per month; n_months sets the horizon
+        monthly_profile:  (12,) or (n_scenarios, 12) energy by calendar month
+                          (e.g. iPals monthly_gen_kwh), normalised with
+                          monthly_shape(); None = flat
+        fire_insurance:   annual fire insurance per scenario, or None
+        depreciation_tax: (n_scenarios, n_years) annual 償却資産税, or None
+        start_month:      calendar month (1-12) of the first contract month
+        yield_profile:    per-year generation multipliers (see yield_factors)
+        (others as in cashflow_arrays)
+
+    Returns:
+        dict of (n_scenarios, n_months) arrays:
+            period, year, calendar_month, in_contract, in_term,
+            self_consumption_kwh, surplus_kwh, ppa_revenue, surplus_revenue,
+            total_revenue, lease_payment, om_cost, fire_insurance,
+            depreciation_tax, revenue_share, total_cost, net_cashflow,
+            dscr (NaN where total_cost <= 0)
+        plus
+            rolling_dscr     (n_scenarios, n_months - 11) trailing 12-month
+                             revenue / cost, NaN unless all 12 months are in
+                             the finance term
+            min_rolling_dscr (n_scenarios,)
+    """
+    monthly_payment = np.atleast_2d(np.asarray(monthly_payment, dtype=float))
+    n_months = monthly_payment.shape[1]
+    n_years = -(-n_months // 12)
+
+    (sc_y1, sur_y1, price, fit, term, contract, deg, om_y, fire_y,
+     post_pay, share_rate, _) = broadcast_scenarios(
+        self_consumption_y1_kwh, surplus_y1_kwh, ppa_unit_price, fit_price,
+        lease_years, contract_years, degradation, annual_om_cost,
+        0.0 if fire_insurance is None else fire_insurance,
+        post_term_payment, revenue_share_rate, np.zeros(len(monthly_payment)),
+    )
+    n = len(sc_y1)
+    monthly_payment = np.broadcast_to(monthly_payment, (n, n_months))
+
+    period = np.arange(n_months)
+    year0 = period // 12                                   # 0-based contract year
+    calendar_month = (start_month - 1 + period) % 12       # 0-based calendar month
+    years = np.broadcast_to(year0 + 1, (n, n_months))
+    in_contract = years <= contract[:, None]
+    in_term = (years <= term[:, None]) & in_contract
+    post_term = in_contract & ~in_term
+
+    weight = np.broadcast_to(monthly_shape(monthly_profile), (n, 12))[:, calendar_month]
+    decay = yield_factors(deg, n_years, yield_profile)[:, year0]
+
+    sc = np.where(in_contract, sc_y1[:, None] * decay * weight, 0.0)
+    if include_surplus:
+        sur = np.where(in_contract, sur_y1[:, None] * decay * weight, 0.0)
+    else:
+        sur = np.zeros((n, n_months))
+
+    ppa_rev = sc * price[:, None]
+    sur_rev = sur * fit[:, None]
+    total_rev = ppa_rev + sur_rev
+
+    dep = (
+        np.zeros((n, n_months)) if depreciation_tax is None
+        else np.broadcast_to(depreciation_tax, (n, np.shape(depreciation_tax)[1]))[:, year0] / 12
+    )
+    lp = np.where(in_term, monthly_payment, np.where(post_term, post_pay[:, None] / 12, 0.0))
+    om = np.where(in_term, om_y[:, None] / 12, 0.0)
+    fi = np.where(in_term, fire_y[:, None] / 12, 0.0)
+    dt = np.where(in_term, dep, 0.0)
+    total_cost = lp + om + fi + dt
+
+    share_on = post_term & (share_rate[:, None] > 0)
+    revenue_share = np.where(share_on, (total_rev - om) * share_rate[:, None], 0.0)
+    total_cost = total_cost + revenue_share
+
+    net_cf = total_rev - total_cost
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dscr = np.where(total_cost > 0, total_rev / total_cost, np.nan)
+
+        if n_months >= 12:
+            roll_rev = rolling_sum(total_rev, 12)
+            roll_cost = rolling_sum(total_cost, 12)
+            full_term = rolling_sum(in_term.astype(float), 12) == 12
+            rolling_dscr = np.where(full_term & (roll_cost > 0), roll_rev / roll_cost, np.nan)
+        else:
+            rolling_dscr = np.full((n, 0), np.nan)
+    has_window = ~np.isnan(rolling_dscr).all(axis=1) if rolling_dscr.shape[1] else np.zeros(n, bool)
+    min_rolling = np.full(n, np.nan)
+    if has_window.any():
+        min_rolling[has_window] = np.nanmin(rolling_dscr[has_window], axis=1)
+
+    return {
+        "period": np.broadcast_to(period + 1, (n, n_months)),
+        "year": years,
+        "calendar_month": np.broadcast_to(calendar_month + 1, (n, n_months)),
+        "in_contract": in_contract,
+        "in_term": in_term,
+        "self_consumption_kwh": sc,
+        "surplus_kwh": sur,
+        "ppa_revenue": ppa_rev,
+        "surplus_revenue": sur_rev,
+        "total_revenue": total_rev,
+        "lease_payment": lp,
+        "om_cost": om,
+        "fire_insurance": fi,
+        "depreciation_tax": dt,
+        "revenue_share": revenue_share,
+        "total_cost": total_cost,
+        "net_cashflow": net_cf,
+        "dscr": dscr,
+        "rolling_dscr": rolling_dscr,
+        "min_rolling_dscr": min_rolling,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Discounting
+# ---------------------------------------------------------------------------
+
+def npv_arrays(rate, cashflows: np.ndarray) -> np.ndarray:
+    """Vectorised ppa_calc.npv(): cashflows[:, 0] is at t=1."""
+    cashflows = np.atleast_2d(np.asarray(cashflows, dtype=float))
+    rate, _ = broadcast_scenarios(rate, np.zeros(len(cashflows)))
+    t = np.arange(1, cashflows.shape[1] + 1)[None, :]
+    return (cashflows / (1 + rate[:, None]) ** t).sum(axis=1)
+
+
+# IRR solver status codes
+IRR_CONVERGED = 0
+IRR_NO_SIGN_CHANGE = 1   # NPV has the same sign at both ends of the bracket
+IRR_MAX_ITER = 2         # bracket still wider than tol after max_iter steps
+IRR_INVALID = 3          # non-finite cashflows
+
+IRR_STATUS_LABELS = {
+    IRR_CONVERGED: "converged",
+    IRR_NO_SIGN_CHANGE: "no_sign_change",
+    IRR_MAX_ITER: "max_iter",
+    IRR_INVALID: "invalid",
+}
+
+IRR_SCAN_POINTS = 200  # coarse rate grid (~1% steps) over [lower, upper] searched when the bracket ends agree
+IRR_WIDEN = (3.0, 10.0)  # upper bounds tried when NPV is still positive at upper
+
+
+def _npv_and_slope(cashflows: np.ndarray, rate: np.ndarray, t: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """NPV at t=0 and its derivative d(NPV)/dr for each row (one pass over the series)."""
+    discount = np.exp(-t * np.log1p(rate)[:, None])
+    pv = cashflows * discount
+    return pv.sum(axis=1), (-t * pv).sum(axis=1) / (1 + rate)
+
+
+def _scan_bracket(
+    cashflows: np.ndarray, t: np.ndarray, grid: np.ndarray, guess: float,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Grid interval with a sign change of NPV nearest the guess, per row.
+
+    Intervals are ranked by the distance of their secant root to the guess.
+
+    Returns:
+        found (bool), a, b, NPV(a), NPV(b) - a / b are adjacent grid rates
+    """
+    npv = cashflows @ np.exp(-t.T * np.log1p(grid)[None, :])    # (rows, grid)
+    lo, hi = grid[:-1], grid[1:]
+    f_lo, f_hi = npv[:, :-1], npv[:, 1:]
+    change = (np.sign(f_lo) != np.sign(f_hi)) | (f_lo == 0)
+    secant = lo - f_lo * (hi - lo) / np.where(f_hi != f_lo, f_hi - f_lo, 1.0)
+    dist = np.where(change, np.abs(secant - guess), np.inf)
+    j = dist.argmin(axis=1)
+    rows = np.arange(len(cashflows))
+    return np.isfinite(dist[rows, j]), lo[j], hi[j], npv[rows, j], npv[rows, j + 1]
+
+
+def solve_irr_arrays(
+    cashflows: np.ndarray,
+    guess: float = 0.05,
+    lower: float = -0.99,
+    upper: float = 1.0,
+    tol: float = 1e-10,
+    max_iter: int = 100,
+) -> dict[str, np.ndarray]:
+    """Bracketed IRR solver (safeguarded Newton) over rows of cashflows.
+
+    cashflows[:, 0] = initial investment (t=0), cashflows[:, t] at year t.
+    Each row keeps a bracket [a, b] with a sign change of NPV. A Newton step
+    is taken when it stays inside the bracket, otherwise the bracket is
+    bisected, so every iteration shrinks the bracket and convergence is
+    guaranteed once a sign change exists. The upper bound is widened (up to
+    1000%) for rows with no sign change in [lower, upper]. Rows whose NPV
+    still has the same sign at both ends (negative tail cashflows, e.g.
+    contract years after the lease, can put two roots inside) are scanned on
+    an IRR_SCAN_POINTS rate grid and bracketed by the sign change nearest
+    the guess - the root Newton from the guess would find.
+
+    Args:
+        cashflows: (n_scenarios, n_periods) cashflow series
+        guess:     Starting rate (clipped into the bracket)
+        lower:     Lower bracket bound (> -1)
+        upper:     Initial upper bracket bound
+        tol:       Convergence tolerance on the rate
+        max_iter:  Maximum iterations per row
+
+    Returns:
+        dict of (n_scenarios,) arrays:
+            rate (NaN unless converged), converged (bool),
+            iterations (int), status (IRR_* code)
+    """
+    cashflows = np.atleast_2d(np.asarray(cashflows, dtype=float))
+    n = len(cashflows)
+    t = np.arange(cashflows.shape[1], dtype=float)[None, :]
+
+    rate = np.full(n, np.nan)
+    iterations = np.zeros(n, dtype=int)
+    status = np.full(n, IRR_MAX_ITER, dtype=int)
+
+    finite = np.isfinite(cashflows).all(axis=1)
+    status[~finite] = IRR_INVALID
+
+    with np.errstate(all="ignore"):
+        a = np.full(n, float(lower))
+        b = np.full(n, float(upper))
+        fa, _ = _npv_and_slope(cashflows, a, t)
+        fb, _ = _npv_and_slope(cashflows, b, t)
+        for wider in IRR_WIDEN:
+            widen = finite & (np.sign(fa) == np.sign(fb)) & (fa != 0)
+            if not widen.any():
+                break
+            b[widen] = wider
+            fb[widen] = _npv_and_slope(cashflows[widen], b[widen], t)[0]
+
+        agree = np.flatnonzero(finite & (np.sign(fa) == np.sign(fb)) & (fa != 0) & (fb != 0))
+        if len(agree):
+            grid = np.unique(np.append(np.linspace(lower, upper, IRR_SCAN_POINTS), IRR_WIDEN))
+            found, ga, gb, gfa, gfb = _scan_bracket(cashflows[agree], t, grid, float(guess))
+            hit = agree[found]
+            a[hit], b[hit], fa[hit], fb[hit] = ga[found], gb[found], gfa[found], gfb[found]
+
+        exact_a = finite & (fa == 0)
+        exact_b = finite & (fb == 0) & ~exact_a
+        rate[exact_a], rate[exact_b] = a[exact_a], b[exact_b]
+        status[exact_a | exact_b] = IRR_CONVERGED
+
+        no_root = finite & ~(exact_a | exact_b) & (np.sign(fa) == np.sign(fb))
+        status[no_root] = IRR_NO_SIGN_CHANGE
+
+        active = np.flatnonzero(finite & ~(exact_a | exact_b) & ~no_root)
+        cf = cashflows[active]
+        a, b, fa = a[active], b[active], fa[active]
+        r = np.clip(np.full(len(active), float(guess)), a, b)
+
+        for _ in range(max_iter):
+            if not len(active):
+                break
+            iterations[active] += 1
+            f, df = _npv_and_slope(cf, r, t)
+
+            # Shrink the bracket around the sign change
+            same_as_a = np.sign(f) == np.sign(fa)
+            a = np.where(same_as_a, r, a)
+            fa = np.where(same_as_a, f, fa)
+            b = np.where(same_as_a, b, r)
+
+            newton = r - f / np.where(df != 0, df, np.nan)
+            inside = np.isfinite(newton) & (newton > a) & (newton < b)
+            r_next = np.where(inside, newton, 0.5 * (a + b))
+
+            done = (f == 0) | (np.abs(r_next - r) < tol) | ((b - a) < tol)
+            r_final = np.where(f == 0, r, r_next)
+            rate[active[done]] = r_final[done]
+            status[active[done]] = IRR_CONVERGED
+
+            keep = ~done
+            active, cf = active[keep], cf[keep]
+            a, b, fa, r = a[keep], b[keep], fa[keep], r_next[keep]
+
+    return {
+        "rate": rate,
+        "converged": status == IRR_CONVERGED,
+        "iterations": iterations,
+        "status": status,
+    }
+
+
+def irr_arrays(cashflows: np.ndarray, **kwargs) -> np.ndarray:
+    """IRR per row of cashflows (NaN where solve_irr_arrays() did not converge)."""
+    return solve_irr_arrays(cashflows, **kwargs)["rate"]
@@ -0,0 +1,348 @@
+"""
+ppa_reprice.py - Parallel batch re-pricing of PPA deals from the command line
+
+Reads deals from a CSV file or from saved_cases JSON files (one file, or a
+directory of them), prices each deal with auto_calc_ppa() in a process pool
+and streams one result row per deal to CSV or Parquet as deals finish:
+
+    python -m proposal_generator.ppa_reprice deals.csv -o repriced.csv
+    python -m proposal_generator.ppa_reprice saved_cases/ -o repriced.parquet --workers 8
+
+CSV columns are auto_calc_ppa() argument names; the saved_cases field names
+(self_consumption_kwh, lease_rate, system_capacity_kw, yield_profile, ...)
+and a few short aliases (company, term, kwh) are accepted too. A deal_id
+column is optional. A yield_profile cell is a JSON list or ";"-separated
+per-year factors.
+
+lease_rate_pct is required unless the finance product has a fixed rate in
+finance_products.yaml (or --lease-rate-pct is given); a deal without one is
+reported as an error rather than priced at 0%.
+
+Each output row carries the deal id, the inputs used, the pricing result,
+the per-deal wall time (ms) and auto_calc_ppa() warnings; a deal that raises
+is reported in the error column instead of stopping the run.
+Parquet output needs pyarrow (imported only for .parquet).
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from proposal_generator.finance_products import get_finance_product
+from proposal_generator.ppa_calc import auto_calc_ppa
+
+# Input column -> auto_calc_ppa() argument
+COLUMN_ALIASES: dict[str, str] = {
+    # saved_cases (app.py customer_data)
+    "self_consumption_kwh": "self_consumption_y1_kwh",
+    "surplus_kwh": "surplus_y1_kwh",
+    "lease_rate": "lease_rate_pct",
+    "system_capacity_kw": "system_kw",
+    "surplus_price": "fit_price",
+    # short CSV headers
+    "kwh": "self_consumption_y1_kwh",
+    "company": "lease_company",
+    "term": "lease_years",
+    "subsidy": "subsidy_amount",
+}
+
+FLOAT_ARGS = (
+    "self_consumption_y1_kwh", "surplus_y1_kwh", "selling_price", "subsidy_amount",
+    "lease_rate_pct", "system_kw", "fit_price", "target_dscr",
+    "maintenance_yen_per_kw", "insurance_yen_fixed",
+)
+INT_ARGS = ("lease_years", "contract_years")
+BOOL_ARGS = ("include_surplus",)
+STR_ARGS = ("lease_company", "finance_company")
+LIST_ARGS = ("yield_profile",)
+DEAL_ARGS = FLOAT_ARGS + INT_ARGS + BOOL_ARGS + STR_ARGS + LIST_ARGS
+REQUIRED_ARGS = ("self_consumption_y1_kwh", "selling_price", "lease_company", "lease_years")
+
+RESULT_FIELDS = (
+    "finance_type", "principal", "effective_rate_pct", "annual_lease_payment",
+    "annual_om_cost", "total_annual_cost", "min_ppa_price", "min_dscr",
+    "irr_pct", "npv_yen", "re_lease_annual",
+)
+OUTPUT_COLUMNS = ("deal_id",) + DEAL_ARGS + RESULT_FIELDS + ("elapsed_ms", "warnings", "error")
+
+DEFAULT_CHUNK_SIZE = 8          # deals per pool task (amortises process round-trips)
+PARQUET_ROW_GROUP = 64
+
+
+# ---------------------------------------------------------------------------
+# Reading deals
+# ---------------------------------------------------------------------------
+
+def _to_bool(value) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "y", "on", "○")
+    return bool(value)
+
+
+def _to_floats(value) -> list[float]:
+    """Per-year factors from a JSON list, a "[...]" cell or a ";"-separated cell."""
+    if isinstance(value, str):
+        text = value.strip()
+        value = json.loads(text) if text.startswith("[") else [v for v in text.split(";") if v.strip()]
+    return [float(v) for v in value]
+
+
+def normalize_deal(record: dict, deal_id: str, lease_rate_pct: float | None = None) -> dict:
+    """Map one input record to auto_calc_ppa() kwargs (+ deal_id).
+
+    Unknown columns are ignored; blank cells fall back to auto_calc_ppa()
+    defaults. contract_years defaults to lease_years, surplus to 0.
+
+    Args:
+        record:         one CSV row / saved_cases dict
+        deal_id:        id for the output row and error messages
+        lease_rate_pct: rate override for every deal (--lease-rate-pct)
+
+    Raises:
+        ValueError: when a required column is missing, a value does not parse,
+            or there is no rate for a product without a fixed registry rate
+    """
+    deal = {}
+    for key, value in record.items():
+        arg = COLUMN_ALIASES.get(key, key)
+        if arg not in DEAL_ARGS or value is None or (isinstance(value, str) and not value.strip()):
+            continue
+        if arg in deal and key != arg:
+            continue  # the canonical column wins over its alias
+        if arg in FLOAT_ARGS:
+            deal[arg] = float(str(value).replace(",", "")) if isinstance(value, str) else float(value)
+        elif arg in INT_ARGS:
+            deal[arg] = int(float(value))
+        elif arg in BOOL_ARGS:
+            deal[arg] = _to_bool(value)
+        elif arg in LIST_ARGS:
+            deal[arg] = _to_floats(value)
+        else:
+            deal[arg] = str(value)
+    missing = [arg for arg in REQUIRED_ARGS if arg not in deal]
+    if missing:
+        raise ValueError(f"deal {deal_id}: missing {', '.join(missing)}")
+    if lease_rate_pct is not None:
+        deal["lease_rate_pct"] = lease_rate_pct
+    if "lease_rate_pct" not in deal:
+        product = get_finance_product(deal.get("finance_company") or deal["lease_company"])
+        if product.rate is None:
+            raise ValueError(
+                f"deal {deal_id}: missing lease_rate_pct "
+                f"({product.name} has no fixed rate; pass the column or --lease-rate-pct)"
+            )
+        deal["lease_rate_pct"] = 0.0  # unused: the registry rate applies
+    deal.setdefault("surplus_y1_kwh", 0.0)
+    deal.setdefault("subsidy_amount", 0.0)
+    deal.setdefault("contract_years", deal["lease_years"])
+    deal["deal_id"] = deal_id
+    return deal
+
+
+def _read_record(record: dict, deal_id: str, lease_rate_pct: float | None = None) -> dict:
+    """normalize_deal(), turning a bad record into an error row instead of aborting the run."""
+    try:
+        return normalize_deal(record, deal_id, lease_rate_pct)
+    except (TypeError, ValueError) as exc:
+        return {"deal_id": deal_id, "error": str(exc)}
+
+
+def read_deals(path: Path, lease_rate_pct: float | None = None) -> list[dict]:
+    """Deals from a CSV file, a saved_cases JSON file or a directory of JSON files.
+
+    Records that cannot be read (e.g. EPC cases without iPals data, or no
+    rate for a product without a fixed one) come back as {"deal_id", "error"}
+    and are reported, not priced. lease_rate_pct overrides every deal's rate.
+    """
+    path = Path(path)
+    if path.is_dir():
+        deals = []
+        for file in sorted(path.glob("*.json")):
+            deals.extend(read_deals(file, lease_rate_pct))
+        return deals
+    if path.suffix.lower() == ".json":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        records = data if isinstance(data, list) else [data]
+        return [
+            _read_record(r, str(r.get("deal_id") or r.get("opp_id") or r.get("company_name") or f"{path.stem}#{i}"),
+                         lease_rate_pct)
+            for i, r in enumerate(records, start=1)
+        ]
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        return [
+            _read_record(row, str(row.get("deal_id") or i), lease_rate_pct)
+            for i, row in enumerate(csv.DictReader(f), start=1)
+        ]
+
+
+# ---------------------------------------------------------------------------
+# Pricing (runs in the worker processes)
+# ---------------------------------------------------------------------------
+
+def price_deal(deal: dict) -> dict:
+    """Price one deal; returns a flat output row (never raises)."""
+    kwargs = {k: v for k, v in deal.items() if k != "deal_id"}
+    row = {col: None for col in OUTPUT_COLUMNS}
+    row.update(deal)
+    if deal.get("error"):
+        return row
+    start = time.perf_counter()
+    try:
+        result = auto_calc_ppa(**kwargs)
+    except Exception as exc:  # report and keep going
+        row["error"] = f"{type(exc).__name__}: {exc}"
+    else:
+        row.update({k: result.get(k) for k in RESULT_FIELDS})
+        warnings = list(result["warnings"])
+        company = deal.get("finance_company") or deal.get("lease_company")
+        if not deal.get("lease_rate_pct") and get_finance_product(company).rate is None:
+            warnings.insert(0, f"{company}: 金利0%で試算（lease_rate_pct未設定の可能性）")
+        row["warnings"] = " / ".join(warnings)
+    row["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return row
+
+
+def price_chunk(deals: list[dict]) -> list[dict]:
+    """Pool task: price several deals in one round-trip."""
+    return [price_deal(deal) for deal in deals]
+
+
+def iter_priced(deals: list[dict], workers: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Yield output rows as deals finish (completion order, not input order).
+
+    Args:
+        deals:      normalized deals (read_deals())
+        workers:    process count; 0 = os.cpu_count(), 1 = in-process
+        chunk_size: deals per pool task
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(deals) <= chunk_size:
+        for deal in deals:
+            yield price_deal(deal)
+        return
+    chunks = [deals[i:i + chunk_size] for i in range(0, len(deals), chunk_size)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        futures = [pool.submit(price_chunk, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+# ---------------------------------------------------------------------------
+# Writing results
+# ---------------------------------------------------------------------------
+
+class _CsvSink:
+    def __init__(self, path: Path):
+        self._file = open(path, "w", encoding="utf-8-sig", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=OUTPUT_COLUMNS)
+        self._writer.writeheader()
+
+    def write(self, row: dict) -> None:
+        self._writer.writerow(row)
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _ParquetSink:
+    """Buffers rows into row groups so partial results are on disk during the run."""
+
+    def __init__(self, path: Path, row_group: int = PARQUET_ROW_GROUP):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise SystemExit("Parquet output needs pyarrow (pip install pyarrow); use .csv instead") from exc
+        self._pa = pa
+        string, f64, i64 = pa.string(), pa.float64(), pa.int64()
+        types = {
+            **{c: f64 for c in FLOAT_ARGS}, **{c: i64 for c in INT_ARGS},
+            **{c: pa.bool_() for c in BOOL_ARGS}, **{c: pa.list_(f64) for c in LIST_ARGS},
+            "principal": f64, "effective_rate_pct": f64, "annual_lease_payment": f64,
+            "annual_om_cost": f64, "total_annual_cost": f64, "min_ppa_price": f64,
+            "min_dscr": f64, "irr_pct": f64, "npv_yen": f64, "re_lease_annual": f64,
+            "elapsed_ms": f64,
+        }
+        self._schema = pa.schema([(c, types.get(c, string)) for c in OUTPUT_COLUMNS])
+        self._writer = pq.ParquetWriter(str(path), self._schema)
+        self._rows: list[dict] = []
+        self._row_group = row_group
+
+    def write(self, row: dict) -> None:
+        self._rows.append(row)
+        if len(self._rows) >= self._row_group:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._rows:
+            self._writer.write_table(self._pa.Table.from_pylist(self._rows, schema=self._schema))
+            self._rows = []
+
+    def close(self) -> None:
+        self._flush()
+        self._writer.close()
+
+
+def open_sink(path: Path):
+    """CSV or Parquet writer chosen by the output suffix."""
+    return _ParquetSink(path) if Path(path).suffix.lower() == ".parquet" else _CsvSink(path)
+
+
+# ---------------------------------------------------------------------------
+# Command line
+# ---------------------------------------------------------------------------
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Re-price PPA deals with auto_calc_ppa() in parallel.")
+    parser.add_argument("input", type=Path, help="deals CSV, saved_cases JSON file or directory")
+    parser.add_argument("-o", "--output", type=Path, required=True, help="result .csv or .parquet")
+    parser.add_argument("--workers", type=int, default=0, help="processes (0 = CPU count, 1 = no pool)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="deals per pool task")
+    parser.add_argument("--lease-rate-pct", type=float, default=None,
+                        help="override the on-screen rate (%%) for every deal, e.g. after a rate change")
+    parser.add_argument("--quiet", action="store_true", help="no per-deal progress lines")
+    args = parser.parse_args(argv)
+
+    deals = read_deals(args.input, lease_rate_pct=args.lease_rate_pct)
+    if not deals:
+        print(f"no deals found in {args.input}")
+        return 1
+
+    start = time.perf_counter()
+    sink = open_sink(args.output)
+    n_done = n_errors = n_warned = 0
+    slowest: list[tuple[float, str]] = []
+    try:
+        for row in iter_priced(deals, workers=args.workers, chunk_size=args.chunk_size):
+            sink.write(row)
+            n_done += 1
+            n_errors += bool(row["error"])
+            n_warned += bool(row["warnings"])
+            if row["elapsed_ms"] is not None:
+                slowest = sorted(slowest + [(row["elapsed_ms"], row["deal_id"])], reverse=True)[:5]
+            if not args.quiet:
+                status = row["error"] or row["warnings"] or "ok"
+                price = "—" if row["min_ppa_price"] is None else f"{row['min_ppa_price']:.1f}"
+                ms = "—" if row["elapsed_ms"] is None else f"{row['elapsed_ms']:.1f}"
+                print(f"[{n_done}/{len(deals)}] {row['deal_id']}: {price} 円/kWh ({ms} ms) {status}")
+    finally:
+        sink.close()
+
+    wall = time.perf_counter() - start
+    print(f"{n_done} deals in {wall:.2f} s -> {args.output} "
+          f"({n_errors} errors, {n_warned} with warnings)")
+    print("slowest: " + ", ".join(f"{deal_id} {ms:.1f} ms" for ms, deal_id in slowest))
+    return 1 if n_errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""
+ppa_risk.py - Monte Carlo risk engine for PPA DSCR / IRR distributions
+
+auto_calc_ppa() is deterministic: 0.5%/yr degradation, the iPals
+self-consumption estimate and flat O&M. Lenders ask for P50/P90 DSCR, so
+this module draws those three inputs per path and evaluates all paths in
+one set of (n_paths, n_years) array operations.
+
+Stochastic inputs (per path):
+  - Degradation rate:        normal(degradation_mean, degradation_sd), clipped to [0, 5%];
+                             with a deal yield_profile (generation_profile.py) the
+                             profile is the mean path and the draw is a deviation
+                             (rate - degradation_mean) compounded around it
+  - Self-consumption level:  shortfall ~ normal(shortfall_mean_pct, shortfall_sd_pct)
+                             applied to every year, times an annual weather
+                             factor ~ normal(1, annual_variation_sd_pct)
+  - O&M inflation:           normal(om_inflation_mean_pct, om_inflation_sd_pct),
+                             compounded from year 2
+
+Finance rows (lease / loan payment, fire insurance, depreciation tax,
+re-lease, revenue share rate) are deterministic and come from the batch
+pipeline, so lessor-specific rules stay in one place.
+
+Percentiles use the lender (exceedance) convention: P90 is the value
+exceeded on 90% of paths, i.e. the 10th percentile.
+"""
+
+from __future__ import annotations
+
+import warnings
+
+import numpy as np
+
+from proposal_generator.ppa_batch import (
+    batch_cashflow,
+    batch_metrics,
+    batch_min_price,
+    prepare_scenarios,
+)
+from proposal_generator.ppa_calc import DEGRADATION_RATE
+from proposal_generator.ppa_engine import solve_irr_arrays, yield_factors
+
+# Default distributions
+DEFAULT_N_PATHS = 20_000
+DEFAULT_DEGRADATION_SD = 0.002         # ±0.2%/yr around DEGRADATION_RATE
+MAX_DEGRADATION_RATE = 0.05
+DEFAULT_SHORTFALL_MEAN_PCT = 0.0
+DEFAULT_SHORTFALL_SD_PCT = 5.0         # uncertainty of the iPals self-consumption estimate
+DEFAULT_ANNUAL_VARIATION_SD_PCT = 3.0  # year-to-year irradiation
+DEFAULT_OM_INFLATION_MEAN_PCT = 1.0
+DEFAULT_OM_INFLATION_SD_PCT = 1.0
+
+DEFAULT_BREACH_DSCR = 1.30
+DEFAULT_PERCENTILES = (50, 75, 90, 95)
+
+
+# ---------------------------------------------------------------------------
+# Path generation
+# ---------------------------------------------------------------------------
+
+def draw_paths(
+    n_paths: int,
+    n_years: int,
+    rng: np.random.Generator,
+    degradation_mean: float = DEGRADATION_RATE,
+    degradation_sd: float = DEFAULT_DEGRADATION_SD,
+    shortfall_mean_pct: float = DEFAULT_SHORTFALL_MEAN_PCT,
+    shortfall_sd_pct: float = DEFAULT_SHORTFALL_SD_PCT,
+    annual_variation_sd_pct: float = DEFAULT_ANNUAL_VARIATION_SD_PCT,
+    om_inflation_mean_pct: float = DEFAULT_OM_INFLATION_MEAN_PCT,
+    om_inflation_sd_pct: float = DEFAULT_OM_INFLATION_SD_PCT,
+    yield_profile=None,
+) -> dict[str, np.ndarray]:
+    """Draw the stochastic multipliers for every path and year.
+
+    Without a yield_profile the energy path is (1 - degradation) ** t; with
+    one it is profile[t] * (1 - (degradation - degradation_mean)) ** t, so LID,
+    warranty curves and curtailment stay in every path.
+
+    Returns:
+        dict with
+            degradation   (n_paths,)         annual degradation rate
+            shortfall_pct (n_paths,)         self-consumption shortfall (%)
+            om_inflation  (n_paths,)         annual O&M inflation (fraction)
+            energy_factor (n_paths, n_years) multiplier on year-1 energy
+                                             (degradation x shortfall x weather)
+            om_factor     (n_paths, n_years) multiplier on year-1 O&M
+    """
+    t = np.arange(n_years)[None, :]
+
+    degradation = np.clip(
+        rng.normal(degradation_mean, degradation_sd, n_paths), 0.0, MAX_DEGRADATION_RATE,
+    )
+    shortfall_pct = rng.normal(shortfall_mean_pct, shortfall_sd_pct, n_paths)
+    weather = rng.normal(1.0, annual_variation_sd_pct / 100, (n_paths, n_years))
+    om_inflation = rng.normal(om_inflation_mean_pct, om_inflation_sd_pct, n_paths) / 100
+
+    if yield_profile is None:
+        trend = (1 - degradation[:, None]) ** t
+    else:
+        profile = yield_factors(degradation_mean, n_years, yield_profile)[:1]
+        trend = profile * (1 - (degradation[:, None] - degradation_mean)) ** t
+    energy_factor = trend * (1 - shortfall_pct[:, None] / 100) * weather
+    return {
+        "degradation": degradation,
+        "shortfall_pct": shortfall_pct,
+        "om_inflation": om_inflation,
+        "energy_factor": np.maximum(energy_factor, 0.0),
+        "om_factor": (1 + om_inflation[:, None]) ** t,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Simulation
+# ---------------------------------------------------------------------------
+
+def _exceedance(values: np.ndarray, levels, axis: int = 0) -> dict[str, np.ndarray]:
+    """P<level> = value exceeded with <level>% probability (NaN-aware)."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns
+        return {
+            f"P{level}": np.nanpercentile(values, 100 - level, axis=axis)
+            for level in levels
+        }
+
+
+def simulate_ppa_risk(
+    ppa_unit_price: float | None = None,
+    n_paths: int = DEFAULT_N_PATHS,
+    seed: int | None = None,
+    breach_dscr: float = DEFAULT_BREACH_DSCR,
+    percentiles=DEFAULT_PERCENTILES,
+    degradation_mean: float = DEGRADATION_RATE,
+    degradation_sd: float = DEFAULT_DEGRADATION_SD,
+    shortfall_mean_pct: float = DEFAULT_SHORTFALL_MEAN_PCT,
+    shortfall_sd_pct: float = DEFAULT_SHORTFALL_SD_PCT,
+    annual_variation_sd_pct: float = DEFAULT_ANNUAL_VARIATION_SD_PCT,
+    om_inflation_mean_pct: float = DEFAULT_OM_INFLATION_MEAN_PCT,
+    om_inflation_sd_pct: float = DEFAULT_OM_INFLATION_SD_PCT,
+    **deal,
+) -> dict:
+    """Monte Carlo DSCR / IRR distribution for one PPA deal.
+
+    Args:
+        ppa_unit_price: price to test (円/kWh); defaults to the deterministic
+                        DSCR minimum price of the deal
+        n_paths:        number of simulated paths
+        seed:           seed for numpy.random.default_rng (same seed, same result)
+        breach_dscr:    DSCR covenant used for the breach probability
+        percentiles:    exceedance levels to report (e.g. 50, 90)
+        degradation_* / shortfall_* / annual_variation_sd_pct / om_inflation_*:
+                        distribution parameters, see draw_paths()
+        **deal:         auto_calc_ppa() arguments for a single deal (scalars)
+
+    Returns dict with:
+        ppa_unit_price, n_paths, seed, years (list),
+        dscr_percentiles   {"P50": [...per year], ...} (None where no cost),
+        dscr_mean          per year,
+        breach_prob_by_year per year (share of paths below breach_dscr),
+        breach_prob        share of paths breaching in any year,
+        min_dscr_percentiles {"P50": x, ...},
+        irr_percentiles    {"P50": x, ...} (%), irr_mean_pct,
+        irr_converged_share, irr_pct (np.ndarray, NaN where not solved),
+        deterministic      {"min_dscr", "irr_pct"} at the same price
+    """
+    prep = prepare_scenarios(**deal)
+    if not prep["valid"][0]:
+        raise ValueError("deal has no principal or no self-consumption to simulate")
+    if ppa_unit_price is None:
+        ppa_unit_price = float(batch_min_price(prep)[0])
+
+    base = batch_cashflow(prep, ppa_unit_price)
+    base_metrics = batch_metrics(prep, base)
+    in_contract = base["in_contract"][0]
+    in_term = base["in_term"][0]
+    years = base["year"][0][in_contract]
+    n_years = len(years)
+
+    rng = np.random.default_rng(seed)
+    paths = draw_paths(
+        n_paths, n_years, rng,
+        degradation_mean=degradation_mean,
+        degradation_sd=degradation_sd,
+        shortfall_mean_pct=shortfall_mean_pct,
+        shortfall_sd_pct=shortfall_sd_pct,
+        annual_variation_sd_pct=annual_variation_sd_pct,
+        om_inflation_mean_pct=om_inflation_mean_pct,
+        om_inflation_sd_pct=om_inflation_sd_pct,
+        yield_profile=prep["yield_profile"],
+    )
+
+    # Revenue: year-1 energy x stochastic energy factor
+    energy = paths["energy_factor"]
+    revenue = prep["self_consumption_y1_kwh"][0] * energy * ppa_unit_price
+    if prep["include_surplus"]:
+        revenue = revenue + prep["surplus_y1_kwh"][0] * energy * prep["fit_price"][0]
+
+    # Cost: deterministic finance rows + inflated O&M + post-term revenue share
+    fixed_cost = (
+        base["lease_payment"][0] + base["fire_insurance"][0] + base["depreciation_tax"][0]
+    )[in_contract]
+    om = np.where(in_term[in_contract], prep["om_cost"][0], 0.0) * paths["om_factor"]
+    post_term = ~in_term[in_contract]
+    share = np.where(post_term, revenue * prep["revenue_share_rate"][0], 0.0)
+    cost = fixed_cost + om + share
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dscr = np.where(cost > 0, revenue / cost, np.nan)
+    net_cf = revenue - cost
+
+    breach = dscr < breach_dscr   # NaN compares False
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        min_dscr = np.nanmin(dscr, axis=1)
+        dscr_mean = np.nanmean(dscr, axis=0)
+
+    irr_res = solve_irr_arrays(
+        np.concatenate([np.full((n_paths, 1), -prep["principal"][0]), net_cf], axis=1)
+    )
+    irr_pct = np.where(irr_res["converged"], irr_res["rate"] * 100, np.nan)
+
+    def _clean(values) -> list:
+        return [None if np.isnan(v) else round(float(v), 3) for v in values]
+
+    return {
+        "ppa_unit_price": float(ppa_unit_price),
+        "n_paths": int(n_paths),
+        "seed": seed,
+        "years": years.tolist(),
+        "dscr_percentiles": {k: _clean(v) for k, v in _exceedance(dscr, percentiles).items()},
+        "dscr_mean": _clean(dscr_mean),
+        "breach_prob_by_year": _clean(breach.mean(axis=0)),
+        "breach_prob": round(float(breach.any(axis=1).mean()), 4),
+        "min_dscr_percentiles": {
+            k: round(float(v), 3) for k, v in _exceedance(min_dscr, percentiles).items()
+        },
+        "irr_percentiles": {
+            k: round(float(v), 2) for k, v in _exceedance(irr_pct, percentiles).items()
+        },
+        "irr_mean_pct": round(float(np.nanmean(irr_pct)), 2) if irr_res["converged"].any() else None,
+        "irr_converged_share": round(float(irr_res["converged"].mean()), 4),
+        "irr_pct": irr_pct,
+        "deterministic": {
+            "min_dscr": float(base_metrics["min_dscr"][0]),
+            "irr_pct": float(base_metrics["irr_pct"][0]),
+        },
+    }
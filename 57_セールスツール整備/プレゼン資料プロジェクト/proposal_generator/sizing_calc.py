@@ -0,0 +1,146 @@
+"""
+sizing_calc.py - PV capacity sizing sweep from one iPals profile
+
+iPals is run once for the quoted capacity; other capacities are obtained by
+scaling its hourly generation column. Self-consumption is min(demand, gen),
+so every size is one row of a (sizes x hours) array computation:
+
+    gen[s, h]     = gen_kw[h] * size_kw[s] / base_kw
+    self[s, h]    = min(demand_kw[h], gen[s, h])
+    surplus[s, h] = gen[s, h] - self[s, h]
+
+Per size the sweep returns annual self-consumption / surplus, the peak cut
+(demand_calc convention) and PPA economics from one ppa_batch pass (price
+and subsidy scale with kW), so the UI can plot savings against capacity:
+
+    sweep = sizing_sweep(hourly, sizes_kw=np.arange(100, 801, 50), base_kw=400,
+                         current_tariff=24.0, basic_rate_kw=1800,
+                         selling_price=80e6, subsidy_amount=1e7,
+                         lease_company="シーエナジー", lease_rate_pct=6.0,
+                         lease_years=20, contract_years=20)
+    sweep["customer_saving"], sweep["optimum_kw"]
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+from proposal_generator.demand_calc import hourly_arrays
+from proposal_generator.ppa_batch import batch_min_price, prepare_scenarios
+
+SIZING_COLUMNS = ("demand_kw", "gen_kw")
+
+
+def scaled_energy(hourly_rows, sizes_kw, base_kw: float) -> dict[str, np.ndarray]:
+    """Hourly generation, self-consumption and surplus for each PV size.
+
+    Args:
+        hourly_rows: hourly dicts or hourly_arrays() columns (iPals at base_kw)
+        sizes_kw:    (n_sizes,) PV capacities to evaluate
+        base_kw:     capacity the iPals run was made for
+
+    Returns:
+        dict of (n_sizes, n_hours) arrays: gen_kw, self_consumption_kw,
+        surplus_kw, net_demand_kw (demand left after PV)
+    """
+    if base_kw <= 0:
+        raise ValueError("base_kw must be positive")
+    arrays = hourly_arrays(hourly_rows, SIZING_COLUMNS)
+    scale = np.atleast_1d(np.asarray(sizes_kw, dtype=float)) / base_kw
+    demand = arrays["demand_kw"][None, :]
+    gen = scale[:, None] * arrays["gen_kw"][None, :]
+    self_c = np.minimum(demand, gen)
+    return {
+        "gen_kw": gen,
+        "self_consumption_kw": self_c,
+        "surplus_kw": gen - self_c,
+        "net_demand_kw": demand - self_c,
+    }
+
+
+def sizing_sweep(
+    hourly_rows,
+    sizes_kw,
+    base_kw: float,
+    current_tariff: float | None = None,
+    basic_rate_kw: float = 0.0,
+    power_factor_pct: int = 85,
+    **deal,
+) -> dict:
+    """Energy, demand and PPA economics over a range of PV capacities.
+
+    Args:
+        hourly_rows:      hourly dicts or hourly_arrays() columns (iPals at base_kw)
+        sizes_kw:         (n_sizes,) PV capacities
+        base_kw:          capacity of the iPals run (and of deal's selling_price)
+        current_tariff:   customer's current energy charge (yen/kWh, basic
+                          charge excluded - that saving comes from the demand
+                          cut); None skips the customer-savings columns and
+                          the optimum
+        basic_rate_kw:    basic charge unit price (yen/kW/month)
+        power_factor_pct: power factor percentage (default 85)
+        **deal:           prepare_scenarios() arguments at base_kw (selling_price,
+                          subsidy_amount, lease_company, lease_rate_pct,
+                          lease_years, contract_years, ...). selling_price and
+                          subsidy_amount are scaled by size / base_kw. Without
+                          lease_company the PPA columns are skipped.
+
+    Returns:
+        dict of (n_sizes,) arrays: size_kw, annual_gen_kwh,
+        self_consumption_kwh, surplus_kwh, self_consumption_pct, peak_after_kw,
+        demand_cut_kw, annual_basic_saving; with a deal also selling_price,
+        min_ppa_price, valid; with a tariff also customer_saving (year 1 at the
+        minimum PPA price, incl. basic charge) and saving_per_kw. optimum_kw
+        is the size with the largest customer_saving (None without one).
+    """
+    sizes = np.atleast_1d(np.asarray(sizes_kw, dtype=float))
+    energy = scaled_energy(hourly_rows, sizes, base_kw)
+    arrays = hourly_arrays(hourly_rows, SIZING_COLUMNS)
+
+    gen_kwh = energy["gen_kw"].sum(axis=1)
+    self_kwh = energy["self_consumption_kw"].sum(axis=1)
+    surplus_kwh = energy["surplus_kw"].sum(axis=1)
+
+    # Peak cut: same definition as calc_demand_cut (annual peak x 12)
+    peak_before = max(float(arrays["demand_kw"].max(initial=0.0)), 0.0)
+    peak_after = np.maximum(energy["net_demand_kw"].max(axis=1, initial=0.0), 0.0)
+    demand_cut = peak_before - peak_after
+    pf_factor = (185 - power_factor_pct) / 100
+    annual_basic_saving = np.rint(basic_rate_kw * demand_cut * pf_factor * 12)
+
+    result = {
+        "size_kw": sizes,
+        "annual_gen_kwh": gen_kwh,
+        "self_consumption_kwh": self_kwh,
+        "surplus_kwh": surplus_kwh,
+        "self_consumption_pct": np.divide(self_kwh, gen_kwh, out=np.zeros_like(gen_kwh), where=gen_kwh > 0),
+        "peak_after_kw": peak_after,
+        "demand_cut_kw": demand_cut,
+        "annual_basic_saving": annual_basic_saving,
+        "optimum_kw": None,
+    }
+
+    if "lease_company" in deal:
+        scale = sizes / base_kw
+        deal = dict(deal)
+        deal["selling_price"] = np.asarray(deal.get("selling_price", 0.0), dtype=float) * scale
+        deal["subsidy_amount"] = np.asarray(deal.get("subsidy_amount", 0.0), dtype=float) * scale
+        deal["system_kw"] = sizes
+        prep = prepare_scenarios(self_kwh, surplus_kwh, **deal)
+        min_price = batch_min_price(prep)
+        valid = prep["valid"] & np.isfinite(min_price)
+        result.update({
+            "selling_price": prep["selling_price"],
+            "min_ppa_price": np.where(valid, min_price, np.nan),
+            "valid": valid,
+        })
+        if current_tariff is not None:
+            saving = prep["self_consumption_y1_kwh"] * (current_tariff - min_price) + annual_basic_saving
+            saving = np.where(valid, np.rint(saving), np.nan)
+            result.update({
+                "customer_saving": saving,
+                "saving_per_kw": np.divide(saving, sizes, out=np.full_like(saving, np.nan), where=sizes > 0),
+            })
+            if np.isfinite(saving).any():
+                result["optimum_kw"] = float(sizes[int(np.nanargmax(saving))])
+    return result
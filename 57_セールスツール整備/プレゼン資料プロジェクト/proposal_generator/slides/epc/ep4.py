@@ -6,11 +6,16 @@ Reproduces the PP8 20-year simulation table format, adapted for EPC economics:
 - Initial-year KPI cards (従量料金削減, 基本料金削減, 初期費用, 保守費用, 償却資産税)
 - 20-year simulation table split into two halves (1-10, 11-20)
   Rows: (A)自家消費電力量, (B)平均従量単価, 従量料金削減額, 基本料金削減額, 年間削減合計, 累積削減額
+- After-tax returns (税制, IRR, 投資回収年) in the conditions box
+
+All figures come from epc_calc (the same cached result the app shows).
 """
 from __future__ import annotations
 from pathlib import Path
 from pptx.enum.text import PP_ALIGN
 from pptx.util import Inches, Pt
+from proposal_generator.epc_calc import calc_epc_economics, epc_inputs
+from proposal_generator.generation_profile import profile_note
 from proposal_generator.utils import (
     CONTENT_TOP, C_DARK, C_LIGHT_ORANGE, C_ORANGE, C_SUB, C_WHITE,
     C_LIGHT_GRAY, C_NAVY, C_LIGHT_CYAN, C_RED,
@@ -20,7 +25,6 @@ from proposal_generator.utils import (
 )
 
 TITLE = "経済効果試算"
-DEGRADATION = 0.005  # 0.5% annual degradation
 SURCHARGE_DEFAULT = 3.60  # 賦課金+燃料費等調整 (円/kWh)
 
 
@@ -34,45 +38,16 @@ def generate(slide, data: dict, logo_path: Path = None) -> None:
     elec_company = data.get("elec_company", "")
     elec_contract = data.get("elec_contract", "")
     contract_kw = float(data.get("contract_kw", 0) or 0)
-    self_kwh = float(data.get("self_consumption_kwh", 0) or 0)
-    demand_kw = float(data.get("demand_reduction_kw", 0) or 0)
-    years = int(data.get("contract_years", 20) or 20)
     tax_display = data.get("tax_display", "税抜")
 
-    # Investment costs
-    selling_price = float(data.get("selling_price", 0) or 0)
-    subsidy_amount = float(data.get("subsidy_amount", 0) or 0)
-    system_kw = float(data.get("system_capacity_kw", 0) or 0)
-    initial_cost = selling_price - subsidy_amount
-
-    # Maintenance cost: prefer explicit value, fallback to system_kw * 1200
-    annual_om_cost = float(data.get("annual_om_cost", 0) or 0)
-    if annual_om_cost <= 0 and system_kw > 0:
-        annual_om_cost = system_kw * 1200
-
-    # Depreciation tax (from data if available)
-    depreciation_tax = float(data.get("depreciation_tax_y1", 0) or 0)
-
-    # Electricity rate calculation
-    annual_cost = data.get("annual_cost")
-    annual_kwh = float(data.get("annual_kwh", 0) or 0)
-
-    # Calculate average unit price from annual cost
-    if annual_cost and annual_kwh > 0:
-        avg_unit_price = float(annual_cost) / annual_kwh
-    else:
-        avg_unit_price = 0
-
-    # Basic charge for demand reduction - prefer explicit value from electricity master
-    basic_rate_kw = float(data.get("basic_rate_kw", 0) or 0)
-    if basic_rate_kw <= 0 and annual_cost and contract_kw > 0 and annual_kwh > 0:
-        # Fallback: estimate from total cost
-        usage_cost = avg_unit_price * annual_kwh
-        basic_annual = float(annual_cost) - usage_cost
-        if basic_annual > 0:
-            basic_rate_kw = basic_annual / contract_kw / 12
-    if basic_rate_kw <= 0:
-        basic_rate_kw = 1500.0  # last resort typical high-voltage basic rate
+    # Economics (unit price, demand saving, O&M, 償却資産税, after-tax returns)
+    inputs = epc_inputs(data)
+    econ = calc_epc_economics(**inputs)
+    years = econ["n_years"]
+    avg_unit_price = inputs["unit_price"]
+    initial_cost = econ["investment"]
+    annual_om_cost = float(econ["om_cost"][0])
+    depreciation_tax = float(econ["property_tax"][0])
 
     # ---- Trial conditions box ----
     cond_h = Inches(0.55)
@@ -91,6 +66,15 @@ def generate(slide, data: dict, logo_path: Path = None) -> None:
                 cond_text, font_name=FONT_BODY, font_size_pt=8, font_color=C_DARK)
 
     cond2 = f"従量単価: {avg_unit_price:.2f}円/kWh" if avg_unit_price > 0 else "従量単価: 未設定"
+    if avg_unit_price > 0 and data.get("pv_unit_price"):
+        cond2 += "（時間帯別・自家消費加重）"
+    if initial_cost > 0 and econ["irr"] is not None:
+        cond2 += (
+            f"　｜　{econ['tax_regime']}・法人実効税率{econ['corporate_tax_rate'] * 100:.2f}%"
+            f"　税引後IRR {econ['irr'] * 100:.1f}%"
+        )
+        if econ["payback_years"] is not None:
+            cond2 += f"　投資回収 {econ['payback_years']:.1f}年"
     add_textbox(slide, MARGIN + Inches(0.1), y + Inches(0.35),
                 SLIDE_W - MARGIN * 2 - Inches(0.2), Inches(0.18),
                 cond2, font_name=FONT_BODY, font_size_pt=8, font_color=C_DARK)
@@ -98,8 +82,8 @@ def generate(slide, data: dict, logo_path: Path = None) -> None:
     y += cond_h + Inches(0.08)
 
     # ---- Initial year KPIs ----
-    y1_usage_saving = self_kwh * avg_unit_price if (self_kwh > 0 and avg_unit_price > 0) else 0
-    y1_demand_saving = demand_kw * basic_rate_kw * 12 if demand_kw > 0 else 0
+    y1_usage_saving = float(econ["usage_saving"][0]) if avg_unit_price > 0 else 0
+    y1_demand_saving = inputs["demand_saving"]
 
     kpi_data = [
         (fmt_yen(y1_usage_saving) if y1_usage_saving else "—", "従量料金削減"),
@@ -144,26 +128,21 @@ def generate(slide, data: dict, logo_path: Path = None) -> None:
         row_d3 = ["年間削減合計(円)"]
         row_cum = ["累積削減額(円)"]
 
-        # Calculate cumulative up to start_yr - 1
-        cumulative = 0
-        for yr in range(1, start_yr):
-            supply = self_kwh * (1 - DEGRADATION) ** (yr - 1) if self_kwh > 0 else 0
-            usage_s = supply * avg_unit_price if avg_unit_price > 0 else 0
-            demand_s = y1_demand_saving
-            cumulative += usage_s + demand_s
+        # Cumulative savings up to start_yr - 1
+        cumulative = float(econ["saving"][:start_yr - 1].sum())
 
         for yr in yr_range:
-            # (A) self-consumption with degradation
-            supply = self_kwh * (1 - DEGRADATION) ** (yr - 1) if self_kwh > 0 else 0
+            # (A) self-consumption with the deal's yield profile
+            supply = float(econ["self_consumption_kwh"][yr - 1])
             row_a.append(f"{supply:,.0f}")
 
             # (B) average unit price (constant)
             row_b.append(f"{avg_unit_price:.2f}" if avg_unit_price > 0 else "—")
 
             # Savings
-            usage_saving = supply * avg_unit_price if avg_unit_price > 0 else 0
-            demand_saving = y1_demand_saving  # constant
-            total_s = usage_saving + demand_saving
+            usage_saving = float(econ["usage_saving"][yr - 1])
+            demand_saving = float(econ["demand_saving"][yr - 1])  # constant
+            total_s = float(econ["saving"][yr - 1])
             cumulative += total_s
 
             row_d1.append(f"{usage_saving:,.0f}" if avg_unit_price > 0 else "—")
@@ -197,7 +176,7 @@ def generate(slide, data: dict, logo_path: Path = None) -> None:
     # ---- Note ----
     note_y = SLIDE_H - Inches(0.55)
     add_textbox(slide, MARGIN, note_y, SLIDE_W - MARGIN * 2, Inches(0.20),
-                f"金額は全て{tax_display}表記　発電量は年▲0.5%低減で試算",
+                f"金額は全て{tax_display}表記　{profile_note(data)}",
                 font_name=FONT_BODY, font_size_pt=7, font_color=C_SUB)
 
     add_footer(slide)
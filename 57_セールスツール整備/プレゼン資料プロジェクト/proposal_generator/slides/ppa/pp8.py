@@ -11,6 +11,7 @@ from __future__ import annotations
 from pathlib import Path
 from pptx.enum.text import PP_ALIGN
 from pptx.util import Inches, Pt
+from proposal_generator.generation_profile import deal_profile, profile_note
 from proposal_generator.utils import (
     CONTENT_TOP, C_DARK, C_LIGHT_ORANGE, C_ORANGE, C_SUB, C_WHITE,
     C_LIGHT_GRAY, C_NAVY, C_LIGHT_CYAN, C_RED,
@@ -20,7 +21,6 @@ from proposal_generator.utils import (
 )
 
 TITLE = "経済効果試算"
-DEGRADATION = 0.005  # 0.5% annual degradation
 SURCHARGE_DEFAULT = 3.60  # 賦課金+燃料費等調整 (円/kWh)
 
 
@@ -50,11 +50,13 @@ def generate(slide, data: dict, logo_path: Path = None) -> None:
         avg_unit_price = float(annual_cost) / annual_kwh
     else:
         avg_unit_price = 0
+    # Time-of-use value of a self-consumed kWh (iPals load x band rates), if computed
+    pv_unit_price = float(data.get("pv_unit_price") or 0) or avg_unit_price
 
     # Separate into 電力量料金 and 賦課金+燃調
     surcharge = SURCHARGE_DEFAULT
-    elec_rate = max(avg_unit_price - surcharge, 0) if avg_unit_price > 0 else 0
-    total_unit = elec_rate + surcharge if avg_unit_price > 0 else 0
+    elec_rate = max(pv_unit_price - surcharge, 0) if pv_unit_price > 0 else 0
+    total_unit = elec_rate + surcharge if pv_unit_price > 0 else 0
 
     # Basic charge for demand reduction - prefer explicit value from electricity master
     basic_rate_kw = float(data.get("basic_rate_kw", 0) or 0)
@@ -82,7 +84,8 @@ def generate(slide, data: dict, logo_path: Path = None) -> None:
 
     cond2 = (
         f"従量単価: {total_unit:.2f}円/kWh "
-        f"(電力量料金{elec_rate:.2f} + 賦課金等{surcharge:.2f})　"
+        f"(電力量料金{elec_rate:.2f} + 賦課金等{surcharge:.2f}"
+        f"{'・時間帯別自家消費加重' if data.get('pv_unit_price') else ''})　"
         f"PPA単価: {ppa_price:.2f}円/kWh"
     )
     add_textbox(slide, MARGIN + Inches(0.1), y + Inches(0.40),
@@ -131,6 +134,7 @@ def generate(slide, data: dict, logo_path: Path = None) -> None:
     # Build simulation data
     sim_years = min(years, 20)
     half = (sim_years + 1) // 2  # split point
+    profile = deal_profile(data, sim_years)  # same per-year yield as the finance calc
 
     def _build_half_table(start_yr: int, end_yr: int) -> list[list[str]]:
         """Build table rows for a range of years."""
@@ -148,8 +152,8 @@ def generate(slide, data: dict, logo_path: Path = None) -> None:
         row_d3 = ["合計(円)"]
 
         for yr in yr_range:
-            # (A) supply with degradation
-            supply = self_kwh * (1 - DEGRADATION) ** (yr - 1) if self_kwh > 0 else 0
+            # (A) supply with the deal's yield profile
+            supply = self_kwh * profile[yr - 1] if self_kwh > 0 else 0
             row_a.append(f"{supply:,.0f}")
 
             # (B) unit price
@@ -195,7 +199,7 @@ def generate(slide, data: dict, logo_path: Path = None) -> None:
     # ---- Note ----
     note_y = SLIDE_H - Inches(0.55)
     add_textbox(slide, MARGIN, note_y, SLIDE_W - MARGIN * 2, Inches(0.20),
-                f"金額は全て{tax_display}表記　発電量は年▲0.5%低減で試算",
+                f"金額は全て{tax_display}表記　{profile_note(data)}",
                 font_name=FONT_BODY, font_size_pt=7, font_color=C_SUB)
 
     add_footer(slide)
@@ -18,7 +18,9 @@ from pptx.enum.chart import XL_CHART_TYPE, XL_LEGEND_POSITION
 from pptx.enum.text import PP_ALIGN
 from pptx.util import Inches, Pt
 
-from proposal_generator.demand_calc import calc_demand_cut
+from proposal_generator.battery_calc import with_battery
+from proposal_generator.demand_calc import DemandSeries, calc_demand_cut
+from proposal_generator.peak_calc import event_summary, peak_analytics
 from proposal_generator.utils import (
     CONTENT_H, CONTENT_TOP, C_DARK, C_LIGHT_GRAY, C_LIGHT_ORANGE, C_NAVY,
     C_ORANGE, C_RED, C_SUB, C_WHITE, FONT_BLACK, FONT_BODY, HEADER_H,
@@ -45,9 +47,16 @@ def generate(slide, data: dict, logo_path: Path = None) -> None:
         basic_rate = DEMAND_UNIT_PRICE_FALLBACK
 
     has_ipals = hourly_rows and len(hourly_rows) > 0
+    battery_kwh = float(data.get("battery_total_kwh", 0) or 0)
+    peak_label = "①導入前ピークデマンド"
+    title_before, title_after = "PV導入前 デマンド推移", "PV導入後 デマンド推移"
 
     if has_ipals:
-        result = calc_demand_cut(hourly_rows, basic_rate, pf_pct)
+        if battery_kwh > 0:
+            # PV-charged battery shaves the remaining peak (threshold dispatch)
+            hourly_rows = with_battery(hourly_rows, battery_kwh)
+        # Laid on the proposal year: chart days show the weekday (土日祝 aware)
+        result = calc_demand_cut(hourly_rows, basic_rate, pf_pct, year=data.get("calendar_year"))
         peak_before = result["peak_before_kw"]
         peak_after = result["peak_after_kw"]
         demand_cut = result["demand_cut_kw"]
@@ -56,6 +65,12 @@ def generate(slide, data: dict, logo_path: Path = None) -> None:
         pf_factor = result["pf_factor"]
         chart_before = result["peak_week_before"]
         chart_after = result["peak_week_after"]
+        if "peak_before_date" in result:
+            peak_label += f"（{result['peak_before_date']}）"
+        # Top daily peaks (cached per upload, shared with the app)
+        peaks = peak_analytics(hourly_rows, year=data.get("calendar_year"))
+        title_before += f"　上位ピーク日: {event_summary(peaks['events_before'])}"
+        title_after += f"　上位ピーク日: {event_summary(peaks['events_after'])}"
     else:
         # Fallback to manual input
         reduction_kw = float(data.get("demand_reduction_kw", 0) or 0)
@@ -82,7 +97,7 @@ def generate(slide, data: dict, logo_path: Path = None) -> None:
 
     add_kpi_card(slide, MARGIN, y, card_w, card_h,
                  f"{fmt_num(peak_before, 0)}", "kW",
-                 "①導入前ピークデマンド",
+                 peak_label,
                  bg_color=C_LIGHT_GRAY, number_size_pt=30)
 
     add_kpi_card(slide, MARGIN + card_w + gap, y, card_w, card_h,
@@ -120,6 +135,8 @@ def generate(slide, data: dict, logo_path: Path = None) -> None:
         f"        = {fmt_yen(monthly_saving)}/月\n"
         f"年間削減: {fmt_yen(monthly_saving)} × 12 = {fmt_yen(annual_saving)}/年"
     )
+    if has_ipals and battery_kwh > 0:
+        calc_text += f"\n※蓄電池 {fmt_num(battery_kwh, 0)}kWh のピークカット運転を含む"
     add_textbox(slide, MARGIN + Inches(5.2), y + Inches(0.12),
                 Inches(5.5), Inches(1.0),
                 calc_text,
@@ -133,11 +150,11 @@ def generate(slide, data: dict, logo_path: Path = None) -> None:
         chart_h = (SLIDE_H - y - Inches(0.5)) / 2  # split remaining space
 
         _add_demand_chart(slide, MARGIN, y, chart_w, chart_h,
-                          "PV導入前 デマンド推移", chart_before, peak_before)
+                          title_before, chart_before, peak_before)
         y += chart_h + Inches(0.08)
 
         _add_demand_chart(slide, MARGIN, y, chart_w, chart_h,
-                          "PV導入後 デマンド推移", chart_after, peak_after)
+                          title_after, chart_after, peak_after)
     elif not has_ipals:
         add_textbox(slide, MARGIN, y, savings_w, Inches(0.5),
                     "※ iPals CSVをアップロードすると、2週間のデマンド推移グラフが表示されます。",
@@ -147,11 +164,9 @@ def generate(slide, data: dict, logo_path: Path = None) -> None:
 
 
 def _add_demand_chart(slide, x, y, w, h, title: str,
-                      chart_data_list: list[dict], peak_kw: float) -> None:
+                      series: DemandSeries, peak_kw: float) -> None:
     """Add a line chart showing demand profile with a peak reference line."""
-    # Subsample labels to avoid overcrowding (show every 24th = daily)
-    labels = [d["label"] for d in chart_data_list]
-    values = [d["value"] for d in chart_data_list]
+    values = series.values.tolist()
 
     # Chart title
     add_textbox(slide, x, y, w, Inches(0.22),
@@ -161,15 +176,8 @@ def _add_demand_chart(slide, x, y, w, h, title: str,
     h -= Inches(0.22)
 
     cd = CategoryChartData()
-    # Thin out category labels: show every 24th hour (daily marker)
-    display_labels = []
-    for i, lbl in enumerate(labels):
-        if i % 24 == 0:
-            # Show only month/day portion
-            display_labels.append(lbl.split(" ")[0] if " " in lbl else lbl)
-        else:
-            display_labels.append("")
-    cd.categories = display_labels
+    # Thin out category labels: "m/d" every 24th hour (daily marker)
+    cd.categories = series.day_labels(24)
 
     cd.add_series("使用電力量 (kW)", values)
     cd.add_series("ピークライン", [peak_kw] * len(values))
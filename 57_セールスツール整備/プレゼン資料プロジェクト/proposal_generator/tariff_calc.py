@@ -0,0 +1,182 @@
+"""
+tariff_calc.py - Time-of-use energy charge over the iPals hourly load
+
+Each hour of the year falls in one tariff band of the high-voltage
+seasonal / time-of-use menus (契約電力マスタ columns peak, summer, other,
+night):
+
+    ピーク時間      summer weekdays 13:00-16:00
+    夏季昼間        Jul-Sep, 8:00-22:00
+    その他季昼間    Oct-Jun, 8:00-22:00
+    夏季夜間 / その他季夜間   22:00-8:00, and all day on weekends / holidays
+
+The band of every hour comes from a calendar table - (month x hour), or
+(month x day x hour) with the year's off-days from calendar_index - and the
+rate of every band from the master row, so the energy charge of a load is
+rates[bands] . load - one fancy-indexed lookup over 8,760 hours. Menus
+without a peak or night rate bill those hours at the season rate.
+
+    bill = calc_tou_bill(hourly, master_row, year=2025)
+    bill["energy_saving"], bill["pv_unit_price"]
+
+iPals hours are 1..24 and hour h covers (h-1):00-h:00, so 13:00-16:00 is
+hours 14..16. Without a year weekends are billed as weekdays.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+
+import numpy as np
+
+from proposal_generator.calendar_index import SUMMER_MONTHS, calendar_table
+from proposal_generator.demand_calc import hourly_arrays
+
+BAND_PEAK, BAND_SUMMER, BAND_OTHER, BAND_SUMMER_NIGHT, BAND_OTHER_NIGHT = range(5)
+BAND_LABELS = ("ピーク時間", "夏季昼間", "その他季昼間", "夏季夜間", "その他季夜間")
+N_BANDS = len(BAND_LABELS)
+
+PEAK_HOURS = (14, 15, 16)                 # 13:00-16:00
+DAY_HOURS = tuple(range(9, 23))           # 8:00-22:00
+
+TARIFF_COLUMNS = ("month", "day", "hour", "demand_kw", "self_consumption_kw")
+
+
+# ---------------------------------------------------------------------------
+# Band calendar and rates
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=None)
+def band_table() -> np.ndarray:
+    """(12, 24) weekday band code for [month - 1, hour - 1] (read-only)."""
+    summer = np.isin(np.arange(1, 13), SUMMER_MONTHS)[:, None]
+    hours = np.arange(1, 25)[None, :]
+    day = np.isin(hours, DAY_HOURS)
+    table = np.where(
+        day,
+        np.where(summer, BAND_SUMMER, BAND_OTHER),
+        np.where(summer, BAND_SUMMER_NIGHT, BAND_OTHER_NIGHT),
+    )
+    table = np.where(summer & np.isin(hours, PEAK_HOURS), BAND_PEAK, table).astype(np.int8)
+    table.setflags(write=False)
+    return table
+
+
+def tariff_bands(month, hour, offday=None) -> np.ndarray:
+    """Band code of each hour.
+
+    Args:
+        month:  (n_hours,) month 1..12
+        hour:   (n_hours,) iPals hour 1..24
+        offday: optional (n_hours,) bool, True on weekends / holidays; those
+                hours are billed in the night band of their season
+
+    Returns:
+        (n_hours,) int8 band codes (BAND_*)
+    """
+    m = np.asarray(month, dtype=np.intp) - 1
+    h = np.asarray(hour, dtype=np.intp) - 1
+    bands = band_table()[m, h]
+    if offday is not None:
+        summer = np.isin(m + 1, SUMMER_MONTHS)
+        night = np.where(summer, BAND_SUMMER_NIGHT, BAND_OTHER_NIGHT).astype(np.int8)
+        bands = np.where(np.asarray(offday, dtype=bool), night, bands)
+    return bands
+
+
+@lru_cache(maxsize=None)
+def band_calendar(year: int) -> np.ndarray:
+    """(12, 31, 24) band code for [month - 1, day - 1, hour - 1] of a year (read-only).
+
+    Weekends and national holidays (calendar_index) are night band all day.
+    """
+    offday = calendar_table(year)["offday"][:, :, None]
+    summer = np.isin(np.arange(1, 13), SUMMER_MONTHS)[:, None, None]
+    night = np.where(summer, BAND_SUMMER_NIGHT, BAND_OTHER_NIGHT)
+    table = np.where(offday, night, band_table()[:, None, :]).astype(np.int8)
+    table.setflags(write=False)
+    return table
+
+
+def band_rates(tariff_row: dict) -> np.ndarray:
+    """(N_BANDS,) energy rate (yen/kWh) per band from a 契約電力マスタ row.
+
+    Missing season rates fall back to the other season; a missing peak rate
+    to the summer rate; a missing night rate to the season rate.
+    """
+    summer = float(tariff_row.get("summer") or tariff_row.get("other") or 0)
+    other = float(tariff_row.get("other") or tariff_row.get("summer") or 0)
+    peak = float(tariff_row.get("peak") or summer)
+    night = tariff_row.get("night")
+    summer_night = float(night) if night else summer
+    other_night = float(night) if night else other
+    return np.array([peak, summer, other, summer_night, other_night])
+
+
+# ---------------------------------------------------------------------------
+# Billing
+# ---------------------------------------------------------------------------
+
+def energy_charge(load_kw, bands, rates) -> np.ndarray:
+    """Hourly energy charge (yen) of a load: rates[bands] * load."""
+    return np.asarray(rates, dtype=float)[bands] * np.asarray(load_kw, dtype=float)
+
+
+def calc_tou_bill(hourly_rows, tariff_row: dict, year: int | None = None) -> dict:
+    """Annual time-of-use energy charge before and after PV.
+
+    Before PV the load is demand_kw; after PV it is demand_kw minus
+    self_consumption_kw (1h kWh = average kW, as elsewhere).
+
+    Args:
+        hourly_rows: hourly dicts or hourly_arrays() columns
+        tariff_row:  契約電力マスタ row (keys peak, summer, other, night)
+        year:        calendar year for weekends / holidays (band_calendar);
+                     None bills every day as a weekday
+
+    Returns:
+        dict with (N_BANDS,) arrays band_rates, kwh_before, kwh_after,
+        charge_before, charge_after; (12,) arrays monthly_before,
+        monthly_after (Jan..Dec); scalars energy_charge_before,
+        energy_charge_after, energy_saving, demand_kwh, self_consumption_kwh,
+        avg_unit_price (charge before / demand kWh) and pv_unit_price
+        (saving / self-consumption kWh, the band-weighted value of a PV kWh)
+    """
+    arrays = hourly_arrays(hourly_rows, TARIFF_COLUMNS)
+    if year is None:
+        bands = tariff_bands(arrays["month"], arrays["hour"])
+    else:
+        month, day, hour = (np.asarray(arrays[k], dtype=np.intp) - 1 for k in ("month", "day", "hour"))
+        bands = band_calendar(year)[month, day, hour]
+    rates = band_rates(tariff_row)
+    before = np.maximum(arrays["demand_kw"], 0.0)
+    after = np.maximum(before - arrays["self_consumption_kw"], 0.0)
+
+    kwh_before = np.bincount(bands, weights=before, minlength=N_BANDS)
+    kwh_after = np.bincount(bands, weights=after, minlength=N_BANDS)
+    charge_before, charge_after = kwh_before * rates, kwh_after * rates
+    month_idx = np.asarray(arrays["month"], dtype=np.intp) - 1
+    monthly_before = np.bincount(month_idx, weights=energy_charge(before, bands, rates), minlength=12)
+    monthly_after = np.bincount(month_idx, weights=energy_charge(after, bands, rates), minlength=12)
+
+    total_before = float(charge_before.sum())
+    total_after = float(charge_after.sum())
+    demand_kwh = float(before.sum())
+    self_kwh = demand_kwh - float(after.sum())
+    saving = total_before - total_after
+    return {
+        "band_rates": rates,
+        "kwh_before": kwh_before,
+        "kwh_after": kwh_after,
+        "charge_before": charge_before,
+        "charge_after": charge_after,
+        "monthly_before": monthly_before,
+        "monthly_after": monthly_after,
+        "energy_charge_before": round(total_before),
+        "energy_charge_after": round(total_after),
+        "energy_saving": round(saving),
+        "demand_kwh": demand_kwh,
+        "self_consumption_kwh": self_kwh,
+        "avg_unit_price": total_before / demand_kwh if demand_kwh > 0 else 0.0,
+        "pv_unit_price": saving / self_kwh if self_kwh > 0 else 0.0,
+    }